@@ -1,14 +1,13 @@
-from tinydb import TinyDB, Query
+from tinydb import Query
+from Module.datenbank import open_table
 
 # Datenbankpfade (könnten auch als Argumente an Methoden übergeben werden)
 PERSON_DB_PATH = 'dbperson.json'
 EKG_TESTS_DB_PATH = 'dbtests.json'
 
-# TinyDB-Verbindungen (am besten einmalig initialisieren)
-# Für dieses Beispiel initialisieren wir sie global.
-# In größeren Anwendungen könntest du einen DB-Manager verwenden oder die DB-Objekte übergeben.
-person_db = TinyDB(PERSON_DB_PATH)
-ekg_tests_db = TinyDB(EKG_TESTS_DB_PATH)
+# Datenbank-Verbindungen (SQLite mit TinyDB-kompatibler Schnittstelle, siehe Module/datenbank.py)
+person_db = open_table(PERSON_DB_PATH)
+ekg_tests_db = open_table(EKG_TESTS_DB_PATH)
 
 # --- Person Klasse Definition ---
 class Person:
@@ -50,20 +49,18 @@ class Person:
         """
         Retrieves all EKG test data documents associated with this person from the database.
 
-        It iterates through the `ekg_test_ids` linked to this person and fetches
-        each corresponding test record from the `ekg_tests_db`. If a referenced
-        test ID is not found in the database, a warning is printed to the console.
+        All `ekg_test_ids` linked to this person are fetched from the `ekg_tests_db`
+        in one batched lookup. If a referenced test ID is not found in the database,
+        a warning is printed to the console.
 
         Returns:
             list: A list of dictionary-like objects (TinyDB Documents), each representing
                   an EKG test record. Returns an empty list if no tests are linked or found.
         """
-        tests = []
+        tests = ekg_tests_db.get(doc_ids=self.ekg_test_ids)
+        found_ids = {test.doc_id for test in tests}
         for test_id in self.ekg_test_ids:
-            ekg_test_data = ekg_tests_db.get(doc_id=test_id)
-            if ekg_test_data:
-                tests.append(ekg_test_data)
-            else:
+            if test_id not in found_ids:
                 print(f"Warnung: EKG-Test mit ID {test_id} (referenziert von Person {self.doc_id}) nicht gefunden in {EKG_TESTS_DB_PATH}")
         return tests
 
@@ -0,0 +1,177 @@
+import os
+import sys
+import inspect
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.utils import normalize_path_slashes, lazy_import
+from Module.datenbank import open_table, DB_PATH
+from Module.dateiablage import content_hash
+
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+# --- Konfiguration & Konstanten ---
+RENDITION_DIR = "image_renditions"
+# Varianten: Name -> maximale Kantenlänge in Pixeln (kleinere Bilder werden nicht vergrößert)
+RENDITIONS = {'thumb': 160, 'card': 640, 'full': 1600}
+RENDITION_FORMAT = "WEBP"
+RENDITION_QUALITY = 80
+DEFAULT_PICTURE = "data/pictures/default.jpg"
+
+
+def rendition_file(digest, name):
+    """
+    Liefert den Ablagepfad einer Variante. Wie die Dateiablage nach Inhalt: Schlüssel ist der SHA-256
+    des Originals, gleiche Bilder teilen sich ihre Varianten.
+
+    Args:
+        digest (str): SHA-256 des Originalbildes.
+        name (str): Name der Variante aus `RENDITIONS`.
+
+    Returns:
+        str: Pfad, z.B. 'image_renditions/3f/3f…a9_card.webp'.
+    """
+    return normalize_path_slashes(os.path.join(RENDITION_DIR, digest[:2], f"{digest}_{name}.{RENDITION_FORMAT.lower()}"))
+
+
+def create_renditions(image_path, digest=None):
+    """
+    Erzeugt alle noch fehlenden Varianten eines Bildes: EXIF-Ausrichtung anwenden, auf die
+    Kantenlänge aus `RENDITIONS` verkleinern und als WebP speichern (atomar über eine temporäre Datei).
+
+    Args:
+        image_path (str): Pfad zum Originalbild.
+        digest (str, optional): Bereits bekannter SHA-256 des Originals.
+
+    Returns:
+        dict: {Variante: Pfad}; leer, wenn das Bild fehlt oder nicht gelesen werden kann.
+    """
+    digest = digest or content_hash(image_path)
+    if digest is None:
+        return {}
+    paths = {name: rendition_file(digest, name) for name in RENDITIONS}
+    missing = [name for name, path in paths.items() if not os.path.exists(path)]
+    if not missing:
+        return paths
+    try:
+        with Image.open(image_path) as original:
+            image = ImageOps.exif_transpose(original)
+            image = image.convert("RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB")
+    except Exception as e:
+        print(f"Warnung: Bild {image_path} konnte nicht gelesen werden: {e}")
+        return {}
+    os.makedirs(os.path.dirname(paths[missing[0]]), exist_ok=True)
+    for name in missing:
+        rendition = image.copy()
+        rendition.thumbnail((RENDITIONS[name], RENDITIONS[name]), Image.Resampling.LANCZOS)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(paths[name]), prefix=".rendition_")
+        with os.fdopen(fd, 'wb') as tmp:
+            rendition.save(tmp, format=RENDITION_FORMAT, quality=RENDITION_QUALITY, method=4)
+        os.replace(tmp_path, paths[name])
+    return paths
+
+
+def rendition_path(image_path, name):
+    """
+    Liefert die Variante eines Bildes für die Anzeige (z.B. in `st.image`) und erzeugt sie bei Bedarf.
+    Kann keine Variante erstellt werden, wird das Original zurückgegeben.
+
+    Args:
+        image_path (str): Pfad zum Originalbild.
+        name (str): Name der Variante aus `RENDITIONS`.
+
+    Returns:
+        str or None: Pfad der Variante bzw. des Originals; None, wenn das Bild nicht existiert.
+    """
+    if not image_path or not os.path.exists(image_path):
+        return None
+    digest = content_hash(image_path)
+    path = rendition_file(digest, name)
+    if os.path.exists(path):
+        return path
+    return create_renditions(image_path, digest).get(name, image_path)
+
+
+def referenced_images(db_path=DB_PATH):
+    """
+    Alle Bilder, auf die Trainings oder Personen verweisen, sowie das Standardbild.
+
+    Args:
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        list: Vorhandene Bildpfade (ohne Duplikate).
+    """
+    paths = {training.get('image') for training in open_table('trainings', db_path=db_path).all()}
+    paths |= {person.get('picture_path') for person in open_table('persons', db_path=db_path).all()}
+    paths.add(DEFAULT_PICTURE)
+    return sorted(normalize_path_slashes(path) for path in paths if path and path != "-" and os.path.exists(path))
+
+
+def backfill_renditions(workers=None, db_path=DB_PATH):
+    """
+    Erzeugt die Varianten aller vorhandenen Bilder parallel ("spawn"-Prozesspool wie beim Massenimport).
+
+    Args:
+        workers (int, optional): Anzahl Worker-Prozesse (Standard: Anzahl CPU-Kerne).
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        tuple: (Anzahl Bilder, Anzahl Bilder, die nicht gelesen werden konnten).
+    """
+    images = referenced_images(db_path)
+    if not images:
+        return 0, 0
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as pool:
+        results = list(pool.map(create_renditions, images))
+    return len(images), sum(1 for paths in results if not paths)
+
+
+def collect_orphan_renditions(dry_run=False, db_path=DB_PATH):
+    """
+    Entfernt Varianten, deren Original von keinem Training und keiner Person mehr verwendet wird.
+
+    Args:
+        dry_run (bool, optional): Nur auflisten, nichts löschen.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        list: Die (zu) löschenden Pfade.
+    """
+    in_use = {content_hash(path) for path in referenced_images(db_path)}
+    orphans = []
+    for root, _, files in os.walk(RENDITION_DIR):
+        for filename in files:
+            if filename.split("_")[0] not in in_use:
+                orphans.append(normalize_path_slashes(os.path.join(root, filename)))
+    if not dry_run:
+        for path in orphans:
+            os.remove(path)
+    return orphans
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verkleinerte Bildvarianten (Vorschau, Karte, groß) der Trainings- und Profilbilder.")
+    parser.add_argument("--nachtragen", action="store_true", help="Varianten für alle vorhandenen Bilder erzeugen")
+    parser.add_argument("--worker", type=int, default=None, help="Anzahl Worker-Prozesse")
+    parser.add_argument("--aufraeumen", action="store_true", help="Varianten nicht mehr verwendeter Bilder löschen")
+    parser.add_argument("--probelauf", action="store_true", help="Beim Aufräumen nur auflisten")
+    args = parser.parse_args()
+
+    if args.nachtragen or not args.aufraeumen:
+        count, failed = backfill_renditions(workers=args.worker)
+        print(f"{count} Bild(er) verarbeitet, {failed} nicht lesbar.")
+    if args.aufraeumen:
+        orphans = collect_orphan_renditions(dry_run=args.probelauf)
+        action = "Ohne Verwendung" if args.probelauf else "Gelöscht"
+        for path in orphans:
+            print(f"{action}: {path}")
+        print(f"{len(orphans)} Variante(n) ohne Verwendung.")
@@ -0,0 +1,262 @@
+import os
+import re
+import sys
+import time
+import hashlib
+import inspect
+import argparse
+import tempfile
+import threading
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.utils import normalize_path_slashes
+from Module.datenbank import open_table, get_connection, DB_PATH, TABLES
+
+# --- Konfiguration & Konstanten ---
+UPLOAD_DIR = "uploaded_files"
+CHUNK_SIZE = 1 << 20  # Lese-/Schreibblock beim Streamen (1 MiB)
+# Frisch abgelegte oder wiederverwendete Dateien werden so lange nicht gelöscht: zwischen Upload und
+# Speichern des Trainings existiert noch kein Verweis
+GRACE_PERIOD_S = 600
+# Ablage nach Inhalt: uploaded_files/<2 Zeichen>/<SHA-256>.<Endung>
+_STORE_PATH = re.compile(r"(?:^|/)uploaded_files/([0-9a-f]{2})/([0-9a-f]{64})(\.[A-Za-z0-9]+)?$")
+
+_hash_lock = threading.Lock()
+_hash_cache = {}  # Pfad -> ((mtime_ns, size), SHA-256) für Dateien außerhalb der Ablage
+
+
+def store_path(digest, extension):
+    """
+    Liefert den Ablagepfad eines Inhalts.
+
+    Args:
+        digest (str): SHA-256 des Inhalts (hex).
+        extension (str): Dateiendung mit oder ohne Punkt (bestimmt, wie die Datei später gelesen wird).
+
+    Returns:
+        str: Pfad mit Forward-Slashes, z.B. 'uploaded_files/3f/3f…a9.fit'.
+    """
+    extension = extension.lower().lstrip('.')
+    filename = f"{digest}.{extension}" if extension else digest
+    return normalize_path_slashes(os.path.join(UPLOAD_DIR, digest[:2], filename))
+
+
+def store_stream(fileobj, extension):
+    """
+    Speichert einen Datenstrom inhaltsadressiert. Der Hash wird blockweise beim Schreiben in eine
+    temporäre Datei berechnet; existiert der Inhalt bereits, wird die temporäre Datei verworfen,
+    sonst atomar an ihren Ablageort verschoben.
+
+    Args:
+        fileobj (file): Lesbares Binär-Dateiobjekt (z.B. von st.file_uploader oder aus einem ZIP-Archiv).
+        extension (str): Dateiendung.
+
+    Returns:
+        tuple: (Ablagepfad, SHA-256, True wenn der Inhalt bereits vorhanden war).
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload_")
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+                digest.update(chunk)
+                tmp.write(chunk)
+        path = store_path(digest.hexdigest(), extension)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            os.utime(path)
+            return path, digest.hexdigest(), True
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return path, digest.hexdigest(), False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def store_bytes(data, extension):
+    """
+    Wie `store_stream`, für einen bereits geladenen Inhalt.
+
+    Args:
+        data (bytes): Dateiinhalt.
+        extension (str): Dateiendung.
+
+    Returns:
+        tuple: (Ablagepfad, SHA-256, True wenn der Inhalt bereits vorhanden war).
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    path = store_path(digest, extension)
+    if os.path.exists(path):
+        os.utime(path)
+        return path, digest, True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".upload_")
+    with os.fdopen(fd, 'wb') as tmp:
+        tmp.write(data)
+    os.replace(tmp_path, path)
+    return path, digest, False
+
+
+def content_hash(path):
+    """
+    Liefert den SHA-256 einer Datei als gemeinsamen Schlüssel für abgeleitete Caches. Bei Dateien in
+    der Ablage steht er im Namen; ältere Dateien werden einmal gelesen und bis zur nächsten Änderung
+    (mtime/Größe) gemerkt.
+
+    Args:
+        path (str): Dateipfad.
+
+    Returns:
+        str or None: Der Hash oder None, wenn die Datei nicht existiert.
+    """
+    if not path:
+        return None
+    match = _STORE_PATH.search(normalize_path_slashes(path))
+    if match:
+        return match.group(2)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    with _hash_lock:
+        cached = _hash_cache.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    with _hash_lock:
+        _hash_cache[path] = (stamp, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def is_store_path(path):
+    """Prüft, ob ein Pfad in der inhaltsadressierten Ablage liegt."""
+    return bool(path) and _STORE_PATH.search(normalize_path_slashes(path)) is not None
+
+
+def _in_grace_period(path):
+    return time.time() - os.path.getmtime(path) < GRACE_PERIOD_S
+
+
+# --- Referenzzählung ---
+
+def reference_count(path, db_path=DB_PATH):
+    """
+    Zählt, wie oft Trainings auf eine Datei verweisen (über die von der Datenbank gepflegte Tabelle `file_refs`).
+
+    Args:
+        path (str): Dateipfad.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        int: Anzahl der Verweise.
+    """
+    return get_connection(db_path).execute("SELECT COUNT(*) FROM file_refs WHERE path = ?",
+                                           (normalize_path_slashes(path),)).fetchone()[0]
+
+
+def release_files(paths, db_path=DB_PATH):
+    """
+    Löscht Dateien der Ablage, auf die kein Training mehr verweist (z.B. nach dem Löschen eines
+    Trainings oder dem Austausch einer Datei). Muss nach dem Commit aufgerufen werden. Dateien, die
+    innerhalb von `GRACE_PERIOD_S` abgelegt oder wiederverwendet wurden, bleiben für das Aufräumen liegen.
+
+    Args:
+        paths (iterable): Die bisher verwendeten Pfade.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        list: Die gelöschten Pfade.
+    """
+    removed = []
+    for path in set(filter(None, paths)):
+        if is_store_path(path) and os.path.exists(path) and not _in_grace_period(path) \
+                and reference_count(path, db_path) == 0:
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+def collect_garbage(dry_run=False, db_path=DB_PATH):
+    """
+    Entfernt alle Dateien der Ablage ohne Verweis sowie liegengebliebene temporäre Uploads
+    (jeweils erst nach Ablauf von `GRACE_PERIOD_S`).
+
+    Args:
+        dry_run (bool, optional): Nur auflisten, nichts löschen.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        list: Die (zu) löschenden Pfade.
+    """
+    referenced = {row[0] for row in get_connection(db_path).execute("SELECT DISTINCT path FROM file_refs")}
+    orphans = []
+    for root, _, files in os.walk(UPLOAD_DIR):
+        for filename in files:
+            path = normalize_path_slashes(os.path.join(root, filename))
+            if _in_grace_period(path):
+                continue
+            if filename.startswith(".upload_") or (is_store_path(path) and path not in referenced):
+                orphans.append(path)
+    if not dry_run:
+        for path in orphans:
+            os.remove(path)
+    return orphans
+
+
+def migrate_uploads(db_path=DB_PATH):
+    """
+    Überführt alle Dateien, auf die Trainings noch mit altem (zeitgestempeltem) Namen verweisen,
+    in die Ablage und stellt die Verweise um. Byte-identische Kopien werden dabei zu einer Datei.
+    Die alten Dateien bleiben liegen und können danach von Hand gelöscht werden.
+
+    Args:
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        tuple: (Anzahl umgestellter Verweise, Anzahl neu abgelegter Dateien).
+    """
+    trainings = open_table('trainings', db_path=db_path)
+    file_fields = TABLES['trainings']['file_fields']
+    moved = stored = 0
+    for training in trainings.all():
+        changes = {}
+        for field in file_fields:
+            path = training.get(field)
+            if not path or is_store_path(path) or not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                new_path, _, existed = store_stream(f, os.path.splitext(path)[1])
+            changes[field] = new_path
+            stored += 0 if existed else 1
+        if changes:
+            trainings.update(changes, doc_ids=[training.doc_id])
+            moved += len(changes)
+    return moved, stored
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inhaltsadressierte Dateiablage der Trainings.")
+    parser.add_argument("--migrieren", action="store_true", help="Alte Uploads in die Ablage überführen")
+    parser.add_argument("--aufraeumen", action="store_true", help="Dateien ohne Verweis löschen")
+    parser.add_argument("--probelauf", action="store_true", help="Beim Aufräumen nur auflisten")
+    args = parser.parse_args()
+
+    if args.migrieren:
+        moved, stored = migrate_uploads()
+        print(f"{moved} Verweis(e) umgestellt, {stored} Datei(en) neu abgelegt.")
+    if args.aufraeumen or not args.migrieren:
+        orphans = collect_garbage(dry_run=args.probelauf or not args.aufraeumen)
+        action = "Gelöscht" if args.aufraeumen and not args.probelauf else "Ohne Verweis"
+        for path in orphans:
+            print(f"{action}: {path}")
+        print(f"{len(orphans)} Datei(en) ohne Verweis.")
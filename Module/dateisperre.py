@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import inspect
+import tempfile
+import threading
+from contextlib import contextmanager
+import yaml
+from yaml.loader import SafeLoader
+from yaml.dumper import Dumper
+from tinydb import TinyDB
+from tinydb.storages import Storage
+from tinydb.table import Table
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+# --- Konfiguration & Konstanten ---
+LOCK_SUFFIX = ".lock"
+
+# Pro Thread gehaltene Sperren: {Sperrdatei: [Dateideskriptor, Verschachtelungstiefe]}
+_held = threading.local()
+
+
+def _lock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        # msvcrt.locking wartet nur ca. 10 s; danach erneut versuchen
+        os.lseek(fd, 0, os.SEEK_SET)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Exklusive, prozessübergreifende Schreibsperre für eine Datei. Gesperrt wird eine
+    daneben liegende `<path>.lock`-Datei, da die eigentliche Datei beim atomaren Schreiben
+    ersetzt wird. Die Sperre ist pro Thread wiedereintrittsfähig.
+
+    Leser brauchen keine Sperre: Dateien werden nur per `os.replace` ausgetauscht,
+    ein Leser sieht daher immer einen vollständigen Stand.
+
+    Args:
+        path (str): Pfad der zu schützenden Datei.
+
+    Yields:
+        None
+    """
+    lock_path = os.path.abspath(path) + LOCK_SUFFIX
+    held = getattr(_held, "locks", None)
+    if held is None:
+        held = _held.locks = {}
+    entry = held.get(lock_path)
+    if entry is not None:
+        entry[1] += 1
+        try:
+            yield
+        finally:
+            entry[1] -= 1
+        return
+
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock_fd(fd)
+        held[lock_path] = [fd, 1]
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """
+    Schreibt eine Textdatei atomar: erst in eine temporäre Datei im selben Verzeichnis,
+    dann `fsync` und `os.replace`. Ein Absturz hinterlässt so nie eine halb geschriebene Datei.
+
+    Args:
+        path (str): Zielpfad.
+        text (str): Der Inhalt.
+        encoding (str, optional): Zeichenkodierung.
+
+    Returns:
+        None
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path, data, **kwargs):
+    """
+    Schreibt Daten atomar als JSON (siehe `atomic_write_text`).
+
+    Args:
+        path (str): Zielpfad.
+        data: JSON-serialisierbare Daten.
+        **kwargs: Weitere Argumente für `json.dumps`.
+
+    Returns:
+        None
+    """
+    atomic_write_text(path, json.dumps(data, **kwargs))
+
+
+def update_yaml_file(path, mutate):
+    """
+    Ändert eine YAML-Datei (z.B. `config.yaml`) unter Sperre: die Datei wird frisch gelesen,
+    `mutate` verändert die Daten und das Ergebnis wird atomar zurückgeschrieben. Dadurch gehen
+    gleichzeitige Änderungen anderer Sessions nicht verloren.
+
+    Args:
+        path (str): Pfad der YAML-Datei.
+        mutate (callable): Funktion, die das geladene Dictionary direkt verändert.
+
+    Returns:
+        dict: Die geschriebenen Daten.
+    """
+    with file_lock(path):
+        data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                data = yaml.load(f, Loader=SafeLoader) or {}
+        mutate(data)
+        atomic_write_text(path, yaml.dump(data, Dumper=Dumper, default_flow_style=False, sort_keys=False))
+    return data
+
+
+class LockedJSONStorage(Storage):
+    """
+    TinyDB-Storage für mehrere Prozesse: gelesen wird ohne Sperre (die Datei wird nur atomar
+    ersetzt), geschrieben unter `file_lock` per `atomic_write_json`.
+    """
+
+    def __init__(self, path, encoding="utf-8", **kwargs):
+        super().__init__()
+        self.path = path
+        self.encoding = encoding
+        self.kwargs = kwargs
+
+    def read(self):
+        try:
+            with open(self.path, "r", encoding=self.encoding) as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        return json.loads(text) if text.strip() else None
+
+    def write(self, data):
+        with file_lock(self.path):
+            atomic_write_json(self.path, data, **self.kwargs)
+
+
+class LockedTable(Table):
+    """
+    TinyDB-Tabelle, deren Read-Modify-Write-Zyklen unter der Dateisperre laufen. Die nächste
+    freie ID wird innerhalb der Sperre neu ermittelt, da andere Prozesse inzwischen eingefügt
+    haben können. Der Abfrage-Cache ist abgeschaltet, weil er fremde Änderungen nicht bemerkt.
+    """
+
+    def __init__(self, storage, name, cache_size=0, persist_empty=False):
+        super().__init__(storage, name, cache_size=cache_size, persist_empty=persist_empty)
+
+    def _lock(self):
+        return file_lock(self._storage.path)
+
+    def _update_table(self, updater):
+        with self._lock():
+            super()._update_table(updater)
+
+    def insert(self, document):
+        with self._lock():
+            self._next_id = None
+            return super().insert(document)
+
+    def insert_multiple(self, documents):
+        with self._lock():
+            self._next_id = None
+            return super().insert_multiple(documents)
+
+
+class LockedTinyDB(TinyDB):
+    """
+    TinyDB mit `LockedJSONStorage` und `LockedTable`. Mehrere Schritte (z.B. Entfernen und
+    Einfügen) fasst man mit `with db.lock():` zu einer atomaren Einheit zusammen.
+    """
+
+    table_class = LockedTable
+    default_storage_class = LockedJSONStorage
+
+    def lock(self):
+        """
+        Sperrt die Datenbankdatei für eine zusammengesetzte Änderung.
+
+        Returns:
+            contextmanager: Die (wiedereintrittsfähige) Dateisperre.
+        """
+        return file_lock(self.storage.path)
@@ -0,0 +1,927 @@
+import os
+import sys
+import json
+import sqlite3
+import inspect
+import threading
+from contextlib import contextmanager
+from tinydb.table import Document
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.laufzeitprofil import timed
+
+# --- Konfiguration & Konstanten ---
+DB_PATH = 'trainingstagebuch.db'
+
+# Tabellen mit ihren indizierten Spalten. Das vollständige Dokument liegt als JSON in `data`,
+# die Spalten sind Kopien einzelner Felder, damit SQLite darüber filtern und sortieren kann.
+TABLES = {
+    'persons': {
+        'json_path': 'dbperson.json',
+        'columns': {'firstname': 'TEXT', 'lastname': 'TEXT'},
+        'search_fields': ['firstname', 'lastname'],
+    },
+    'trainings': {
+        'json_path': 'dbtests.json',
+        'columns': {'date': 'TEXT', 'sportart': 'TEXT', 'distanz': 'REAL', 'star_rating': 'INTEGER'},
+        # Ersatzwerte für fehlende Felder, damit Sortierung und Blättern ohne NULL-Sonderfälle auskommen
+        'defaults': {'date': '', 'distanz': 0.0, 'star_rating': 0},
+        'search_fields': ['name', 'description', 'sportart'],
+        # Verweise auf Dateien, gespiegelt in `file_refs` (Referenzzählung der Dateiablage)
+        'file_fields': ['image', 'gpx_file', 'ekg_file', 'fit_file'],
+    },
+}
+JSON_PATH_TO_TABLE = {config['json_path']: name for name, config in TABLES.items()}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS persons (
+    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    firstname TEXT,
+    lastname TEXT,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS trainings (
+    doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT,
+    sportart TEXT,
+    distanz REAL,
+    star_rating INTEGER,
+    person_id INTEGER,
+    version INTEGER NOT NULL DEFAULT 1,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS person_trainings (
+    person_id INTEGER NOT NULL,
+    training_id INTEGER NOT NULL,
+    PRIMARY KEY (person_id, training_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS file_refs (
+    path TEXT NOT NULL,
+    training_id INTEGER NOT NULL,
+    field TEXT NOT NULL,
+    PRIMARY KEY (path, training_id, field)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_persons_name ON persons(lastname, firstname);
+CREATE INDEX IF NOT EXISTS idx_trainings_date ON trainings(date);
+CREATE INDEX IF NOT EXISTS idx_trainings_sportart ON trainings(sportart, date);
+CREATE INDEX IF NOT EXISTS idx_person_trainings_training ON person_trainings(training_id);
+CREATE INDEX IF NOT EXISTS idx_file_refs_training ON file_refs(training_id);
+"""
+
+SQLITE_MAX_PARAMS = 900  # Obergrenze der Platzhalter pro IN(...)-Abfrage (auch für ältere SQLite-Versionen)
+FUZZY_MIN_SCORE = 0.5    # Anteil der Trigramme eines Suchbegriffs, die ein unscharfer Treffer enthalten muss
+FUZZY_CANDIDATES = 200   # Kandidaten aus dem Index, die für die unscharfe Suche bewertet werden
+
+
+def _search_index_supported():
+    """Prüft, ob das eingebundene SQLite FTS5 mit Trigramm-Tokenizer kennt (ab SQLite 3.34)."""
+    try:
+        conn = sqlite3.connect(":memory:")
+        conn.execute("CREATE VIRTUAL TABLE probe USING fts5(text, tokenize='trigram')")
+        conn.close()
+        return True
+    except sqlite3.Error:
+        return False
+
+
+SEARCH_INDEX_AVAILABLE = _search_index_supported()
+
+class VersionConflictError(Exception):
+    """Das Dokument wurde seit dem Lesen von einer anderen Session geändert."""
+
+    def __init__(self, doc_id, expected_version, actual_version):
+        super().__init__(f"Dokument {doc_id} wurde zwischenzeitlich geändert "
+                         f"(erwartete Version {expected_version}, aktuell {actual_version}).")
+        self.doc_id = doc_id
+        self.expected_version = expected_version
+        self.actual_version = actual_version
+
+
+_local = threading.local()
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+_registry_lock = threading.Lock()
+_tables = {}
+_caches = {}
+_write_generation = {}
+
+
+def get_connection(db_path=DB_PATH):
+    """
+    Liefert die SQLite-Verbindung des aktuellen Threads (Streamlit führt jede Session in
+    einem eigenen Thread aus). Beim ersten Zugriff wird der WAL-Modus aktiviert und das Schema angelegt.
+
+    Args:
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        sqlite3.Connection: Die Verbindung im Autocommit-Modus; Schreibzugriffe laufen über `transaction`.
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        # WAL: Leser blockieren Schreiber nicht und umgekehrt; ein Commit hängt nur Seiten an das Log an
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with _schema_lock:
+            if db_path not in _initialized_paths:
+                conn.executescript(_SCHEMA)
+                _add_missing_columns(conn)
+                _ensure_search_index(conn)
+                _initialized_paths.add(db_path)
+        connections[db_path] = conn
+    return conn
+
+
+def _add_missing_columns(conn):
+    """Ergänzt Spalten und Indizes, die in älteren Datenbankdateien noch fehlen."""
+    for table_name in TABLES:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table_name})")}
+        if 'version' not in existing:
+            conn.execute(f"ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(trainings)")}
+    if 'person_id' not in existing:
+        conn.execute("ALTER TABLE trainings ADD COLUMN person_id INTEGER")
+        conn.execute("UPDATE trainings SET person_id = (SELECT person_id FROM person_trainings "
+                     "WHERE training_id = trainings.doc_id)")
+        for column, default in TABLES['trainings']['defaults'].items():
+            conn.execute(f"UPDATE trainings SET {column} = ? WHERE {column} IS NULL", (default,))
+    # Liste einer Person nach Datum: Index-Scan in Sortierreihenfolge, die erste Seite ist unabhängig von der Anzahl
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_trainings_person_date ON trainings(person_id, date, doc_id)")
+    if not conn.execute("SELECT 1 FROM meta WHERE key = 'file_refs'").fetchone():
+        for field in TABLES['trainings']['file_fields']:
+            conn.execute(f"INSERT OR IGNORE INTO file_refs (path, training_id, field) "
+                         f"SELECT replace(json_extract(data, '$.{field}'), '\\', '/'), doc_id, ? FROM trainings "
+                         f"WHERE coalesce(json_extract(data, '$.{field}'), '-') NOT IN ('', '-')", (field,))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('file_refs', '1')")
+
+
+def _ensure_search_index(conn):
+    """
+    Legt je Tabelle einen FTS5-Volltextindex (Trigramme, ohne Groß-/Kleinschreibung) über die
+    `search_fields` an und füllt ihn beim ersten Mal aus den vorhandenen Dokumenten. Danach wird er
+    bei jedem Schreibzugriff mitgepflegt.
+    """
+    if not SEARCH_INDEX_AVAILABLE:
+        return
+    for table_name, config in TABLES.items():
+        fts = f"{table_name}_fts"
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone():
+            continue
+        fields = config['search_fields']
+        conn.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({', '.join(fields)}, tokenize='trigram')")
+        extracts = ", ".join(f"json_extract(data, '$.{field}')" for field in fields)
+        conn.execute(f"INSERT INTO {fts} (rowid, {', '.join(fields)}) SELECT doc_id, {extracts} FROM {table_name}")
+
+
+def _index_document(conn, table_name, doc_id, document=None):
+    """Aktualisiert den Volltexteintrag eines Dokuments (ohne `document`: nur entfernen)."""
+    if not SEARCH_INDEX_AVAILABLE:
+        return
+    fts = f"{table_name}_fts"
+    conn.execute(f"DELETE FROM {fts} WHERE rowid = ?", (doc_id,))
+    if document is not None:
+        fields = TABLES[table_name]['search_fields']
+        values = [document.get(field) for field in fields]
+        values = [None if value is None else str(value) for value in values]
+        conn.execute(f"INSERT INTO {fts} (rowid, {', '.join(fields)}) VALUES (?, {', '.join(['?'] * len(fields))})",
+                     [doc_id] + values)
+
+
+def _trigrams(term):
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _fts_phrase(text):
+    """Setzt einen Suchbegriff als FTS5-Phrase in Anführungszeichen."""
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _fuzzy_score(terms, text):
+    """
+    Mittlerer Anteil der Trigramme je Suchbegriff, die im Text vorkommen (1.0 = alle).
+    Fehlt ein Begriff vollständig, ist der Wert 0.
+    """
+    scores = []
+    for term in terms:
+        grams = _trigrams(term)
+        scores.append(sum(gram in text for gram in grams) / len(grams) if grams else float(term in text))
+    return sum(scores) / len(scores) if all(scores) else 0.0
+
+
+@contextmanager
+def transaction(db_path=DB_PATH):
+    """
+    Führt einen Block als Schreibtransaktion aus und dient zugleich als Schreibpuffer: alle Schreibzugriffe
+    innerhalb des Blocks (auch über mehrere Tabellen) landen gesammelt mit einem Commit auf der Platte.
+    `BEGIN IMMEDIATE` holt die Schreibsperre sofort, damit zwei Sessions nicht beide lesen und dann beim
+    Schreiben scheitern. Verschachtelte Aufrufe schließen sich der äußeren Transaktion an.
+
+    Args:
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Yields:
+        sqlite3.Connection: Die Verbindung des aktuellen Threads.
+    """
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    else:
+        conn.execute("COMMIT")
+    finally:
+        _bump_generation(db_path)
+
+
+def _bump_generation(db_path):
+    with _registry_lock:
+        _write_generation[db_path] = _write_generation.get(db_path, 0) + 1
+
+
+def _change_token(db_path):
+    """
+    Kennzeichnet den aktuellen Stand der Datenbank. Schreibt dieser Prozess, ändert sich der Zähler;
+    schreibt ein anderer Prozess, ändern sich Zeitstempel bzw. Größe der Datenbank- oder WAL-Datei.
+    Es werden nur Metadaten abgefragt, keine Inhalte gelesen.
+    """
+    token = [_write_generation.get(db_path, 0)]
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            token.extend((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            token.extend((None, None))
+    return tuple(token)
+
+
+class _TableCache:
+    """Prozessweiter Lese-Cache einer Tabelle, gemeinsam für alle Sessions."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.token = None
+        self.docs = {}        # doc_id -> (JSON-Text, Version); jeder Leser bekommt so eine eigene Kopie
+        self.all_ids = None   # sortierte doc_ids, sobald die ganze Tabelle geladen wurde
+        self.by_person = {}   # person_id -> doc_ids der Trainings
+
+    def reset(self, token):
+        self.token = token
+        self.docs = {}
+        self.all_ids = None
+        self.by_person = {}
+
+
+class SQLiteTable:
+    """
+    TinyDB-kompatible Tabelle auf SQLite. Unterstützt die in der App verwendeten Aufrufe
+    (`insert`, `get`, `all`, `search`, `update`, `remove`, `contains`, `len`) und liefert wie
+    TinyDB `Document`-Objekte mit `doc_id` zurück. Bedingungen (`tinydb.Query`) werden in Python
+    ausgewertet; für häufige Abfragen gibt es indizierte Methoden (`get(doc_ids=...)`, `search_by_person`).
+
+    Args:
+        table_name (str): 'persons' oder 'trainings'.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+    """
+
+    def __init__(self, table_name, db_path=DB_PATH):
+        if table_name not in TABLES:
+            raise ValueError(f"Unbekannte Tabelle: {table_name}")
+        self.name = table_name
+        self.db_path = db_path
+        with _registry_lock:
+            self._cache = _caches.setdefault((db_path, table_name), _TableCache())
+        get_connection(db_path)
+        ensure_migrated(table_name, db_path)
+        if table_name == 'trainings':
+            # Die Verknüpfungen für search_by_person entstehen beim Import der Personen
+            ensure_migrated('persons', db_path)
+
+    @property
+    def _conn(self):
+        return get_connection(self.db_path)
+
+    def _valid_cache(self):
+        """
+        Liefert (cache, token) mit einem zum aktuellen Datenbankstand passenden Cache. Schreibt der
+        aktuelle Thread gerade in einer Transaktion, wird der Cache umgangen (None), damit er seine
+        eigenen, noch nicht bestätigten Änderungen sieht.
+        """
+        if self._conn.in_transaction:
+            return None, None
+        token = _change_token(self.db_path)
+        with self._cache.lock:
+            if self._cache.token != token:
+                self._cache.reset(token)
+        return self._cache, token
+
+    def _store(self, cache, token, rows, all_ids=None):
+        if cache is None:
+            return
+        with cache.lock:
+            # Nur übernehmen, wenn sich die Datenbank seit dem Lesen nicht geändert hat
+            if cache.token != token:
+                return
+            for doc_id, text, version in rows:
+                cache.docs[doc_id] = (text, version)
+            if all_ids is not None:
+                cache.all_ids = all_ids
+
+    def _write(self, conn, doc_id, document, version=1):
+        return _write_document(conn, self.name, doc_id, document, version)
+
+    @staticmethod
+    def _to_document(row):
+        """Baut aus (doc_id, JSON-Text, Version) ein Document; die Version steht in `document.version`."""
+        document = Document(json.loads(row[1]), doc_id=row[0])
+        document.version = row[2]
+        return document
+
+    def _fetch(self, doc_ids):
+        """Liest Dokumente (als (doc_id, JSON-Text)) über den Primärschlüssel, gebündelt in IN(...)-Abfragen."""
+        rows = []
+        for start in range(0, len(doc_ids), SQLITE_MAX_PARAMS):
+            chunk = doc_ids[start:start + SQLITE_MAX_PARAMS]
+            placeholders = ", ".join(["?"] * len(chunk))
+            rows.extend(self._conn.execute(f"SELECT doc_id, data, version FROM {self.name} WHERE doc_id IN ({placeholders})", chunk))
+        return rows
+
+    def insert(self, document):
+        """
+        Fügt ein Dokument ein.
+
+        Args:
+            document (dict): Das neue Dokument.
+
+        Returns:
+            int: Die vergebene doc_id.
+        """
+        with transaction(self.db_path) as conn:
+            return self._write(conn, None, dict(document))
+
+    def insert_multiple(self, documents):
+        """
+        Fügt mehrere Dokumente in einer Transaktion ein.
+
+        Args:
+            documents (iterable): Die neuen Dokumente.
+
+        Returns:
+            list: Die vergebenen doc_ids.
+        """
+        with transaction(self.db_path) as conn:
+            return [self._write(conn, None, dict(document)) for document in documents]
+
+    @timed("DB: get")
+    def get(self, cond=None, doc_id=None, doc_ids=None):
+        """
+        Liest ein Dokument über seine doc_id, mehrere Dokumente über `doc_ids` (gebündelt in
+        wenigen Abfragen über den Primärschlüssel) oder das erste Dokument, das `cond` erfüllt.
+
+        Args:
+            cond (tinydb.Query, optional): Bedingung.
+            doc_id (int, optional): Die doc_id.
+            doc_ids (list, optional): Mehrere doc_ids.
+
+        Returns:
+            tinydb.table.Document or list or None: Das Dokument bzw. bei `doc_ids` die Liste der
+                                                   gefundenen Dokumente in der angefragten Reihenfolge.
+        """
+        if doc_id is not None:
+            documents = self.get(doc_ids=[doc_id])
+            return documents[0] if documents else None
+        if doc_ids is not None:
+            ids = [int(i) for i in doc_ids]
+            cache, token = self._valid_cache()
+            found = {}
+            missing = ids
+            if cache is not None:
+                with cache.lock:
+                    found = {i: cache.docs[i] for i in ids if i in cache.docs}
+                    # Ist die ganze Tabelle geladen, existieren fehlende IDs nicht
+                    missing = [] if cache.all_ids is not None else [i for i in ids if i not in found]
+            if missing:
+                rows = self._fetch(missing)
+                self._store(cache, token, rows)
+                found.update((doc_id, (text, version)) for doc_id, text, version in rows)
+            return [self._to_document((i,) + found[i]) for i in ids if i in found]
+        if cond is not None:
+            for document in self:
+                if cond(document):
+                    return document
+            return None
+        raise RuntimeError("Für get() muss cond, doc_id oder doc_ids angegeben werden.")
+
+    @timed("DB: search_by_person")
+    def search_by_person(self, person_id):
+        """
+        Liefert alle Trainings einer Person über den Index der Verknüpfungstabelle. Der Aufwand
+        hängt nur von der Anzahl ihrer Trainings ab, nicht von der Größe der Trainingstabelle.
+
+        Args:
+            person_id (int): Die doc_id der Person.
+
+        Returns:
+            list: Die Trainings-Dokumente der Person, nach doc_id sortiert.
+        """
+        if self.name != 'trainings':
+            raise ValueError("search_by_person() ist nur für die Trainingstabelle verfügbar.")
+        person_id = int(person_id)
+        cache, token = self._valid_cache()
+        training_ids = None
+        if cache is not None:
+            with cache.lock:
+                training_ids = cache.by_person.get(person_id)
+        if training_ids is None:
+            training_ids = [row[0] for row in self._conn.execute(
+                "SELECT training_id FROM person_trainings WHERE person_id = ? ORDER BY training_id", (person_id,))]
+            if cache is not None:
+                with cache.lock:
+                    if cache.token == token:
+                        cache.by_person[person_id] = training_ids
+        return self.get(doc_ids=training_ids)
+
+    def _query_sql(self, filters, person_id, order_by, descending, cursor):
+        """Baut WHERE-/ORDER-BY-Teil einer Abfrage über die indizierten Spalten."""
+        columns = TABLES[self.name]['columns']
+        if order_by != 'doc_id' and order_by not in columns:
+            raise ValueError(f"Sortierung nach '{order_by}' ist nicht möglich (nur indizierte Spalten).")
+        clauses, params = [], []
+        if person_id is not None:
+            if self.name != 'trainings':
+                raise ValueError("person_id ist nur für die Trainingstabelle verfügbar.")
+            clauses.append("person_id = ?")
+            params.append(int(person_id))
+        for column, operator, value in filters or []:
+            if column != 'doc_id' and column not in columns:
+                raise ValueError(f"Filter auf '{column}' ist nicht möglich (nur indizierte Spalten).")
+            if operator == 'in':
+                values = list(value)
+                if not values:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{column} IN ({', '.join(['?'] * len(values))})")
+                params.extend(values)
+            elif operator in ('=', '>=', '<=', '>', '<'):
+                clauses.append(f"{column} {operator} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unbekannter Operator: {operator}")
+        if cursor is not None:
+            # Keyset-Pagination: direkt hinter dem letzten Eintrag der vorherigen Seite weiterlesen
+            comparison = "<" if descending else ">"
+            if order_by == 'doc_id':
+                clauses.append(f"doc_id {comparison} ?")
+                params.append(cursor[1])
+            else:
+                clauses.append(f"({order_by} {comparison} ? OR ({order_by} = ? AND doc_id {comparison} ?))")
+                params.extend([cursor[0], cursor[0], cursor[1]])
+        direction = "DESC" if descending else "ASC"
+        order = f"doc_id {direction}" if order_by == 'doc_id' else f"{order_by} {direction}, doc_id {direction}"
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, order, params
+
+    @timed("DB: query")
+    def query(self, filters=None, person_id=None, order_by='doc_id', descending=False, limit=None, offset=0, cursor=None):
+        """
+        Filtert, sortiert und begrenzt direkt in SQLite über die indizierten Spalten; nur die Dokumente
+        der Ergebnisseite werden geladen (über den Lese-Cache). Für Trainings einer Person nach Datum
+        liefert der Index (person_id, date, doc_id) die Zeilen bereits in Sortierreihenfolge.
+
+        Args:
+            filters (list, optional): Bedingungen als (Spalte, Operator, Wert) mit den Operatoren
+                                      '=', '>=', '<=', '>', '<' und 'in' (Wert ist dann eine Liste),
+                                      z.B. [('date', '>=', '2025-01-01'), ('sportart', 'in', ['Laufen'])].
+                                      Neben den indizierten Spalten ist auch 'doc_id' erlaubt.
+            person_id (int, optional): Nur Trainings dieser Person.
+            order_by (str, optional): Indizierte Spalte oder 'doc_id'; bei Gleichstand entscheidet die doc_id.
+            descending (bool, optional): Absteigend sortieren.
+            limit (int, optional): Höchstzahl der Ergebnisse.
+            offset (int, optional): Anzahl zu überspringender Ergebnisse (besser `cursor` verwenden).
+            cursor (tuple, optional): (Sortierwert, doc_id) des letzten Eintrags der vorherigen Seite.
+
+        Returns:
+            list: Die Dokumente in der angeforderten Reihenfolge.
+        """
+        rows = self._query_rows(filters, person_id, order_by, descending, limit, offset, cursor)
+        return self.get(doc_ids=[row[0] for row in rows])
+
+    def _query_rows(self, filters, person_id, order_by, descending, limit, offset, cursor):
+        """Liefert (doc_id, Sortierwert) der Treffer, ohne die Dokumente zu laden."""
+        where, order, params = self._query_sql(filters, person_id, order_by, descending, cursor)
+        sql = f"SELECT doc_id, {order_by} FROM {self.name} {where} ORDER BY {order}"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params += [-1 if limit is None else int(limit), int(offset)]
+        return self._conn.execute(sql, params).fetchall()
+
+    @timed("DB: query_page")
+    def query_page(self, page_size, cursor=None, order_by='doc_id', descending=False, filters=None, person_id=None):
+        """
+        Liefert eine Seite für das Blättern mit Cursor (siehe `query`). Der Aufwand hängt von der
+        Seitengröße ab, nicht von der Position in der Liste.
+
+        Args:
+            page_size (int): Einträge pro Seite.
+            cursor (tuple, optional): Cursor der vorherigen Seite (None für die erste Seite).
+            order_by (str, optional): Sortierspalte.
+            descending (bool, optional): Absteigend sortieren.
+            filters (list, optional): Bedingungen wie bei `query`.
+            person_id (int, optional): Nur Trainings dieser Person.
+
+        Returns:
+            tuple: (Dokumente, Cursor der nächsten Seite oder None, wenn dies die letzte Seite ist).
+        """
+        rows = self._query_rows(filters, person_id, order_by, descending, page_size + 1, 0, cursor)
+        documents = self.get(doc_ids=[row[0] for row in rows[:page_size]])
+        if len(rows) <= page_size:
+            return documents, None
+        last_id, last_value = rows[page_size - 1]
+        return documents, (last_value, last_id)
+
+    @timed("DB: search_text_ids")
+    def search_text_ids(self, text, limit=50, person_id=None, fuzzy=True):
+        """
+        Volltextsuche über die `search_fields` der Tabelle mit dem Trigramm-Index. Jeder Suchbegriff
+        muss als Teilwort (also auch als Präfix) vorkommen, Groß-/Kleinschreibung spielt keine Rolle.
+        Reichen diese Treffer nicht, ergänzt eine unscharfe Suche Dokumente, die einen Großteil der
+        Trigramme jedes Begriffs enthalten (Tippfehler wie "Mustr" oder "Mueller" statt "Müller").
+
+        Args:
+            text (str): Die Suchbegriffe, durch Leerzeichen getrennt.
+            limit (int, optional): Höchstzahl der Treffer.
+            person_id (int, optional): Nur Trainings dieser Person.
+            fuzzy (bool, optional): Unscharfe Treffer ergänzen.
+
+        Returns:
+            list: Die doc_ids der Treffer, exakte vor unscharfen, jeweils nach Relevanz.
+        """
+        terms = text.lower().split()
+        if not terms:
+            return []
+        if person_id is not None and self.name != 'trainings':
+            raise ValueError("person_id ist nur für die Trainingstabelle verfügbar.")
+        if not SEARCH_INDEX_AVAILABLE:
+            return self._search_text_scan(terms, limit, person_id, fuzzy)
+
+        fts = f"{self.name}_fts"
+        fields = TABLES[self.name]['search_fields']
+        owner = ""
+        owner_params = []
+        if person_id is not None:
+            owner = f" AND rowid IN (SELECT doc_id FROM {self.name} WHERE person_id = ?)"
+            owner_params = [int(person_id)]
+
+        # Exakte Treffer: Begriffe ab drei Zeichen über den Index, kürzere per LIKE auf den Treffern
+        long_terms = [term for term in terms if len(term) >= 3]
+        clauses, params = [], []
+        if long_terms:
+            clauses.append(f"{fts} MATCH ?")
+            params.append(" AND ".join(_fts_phrase(term) for term in long_terms))
+        for term in terms:
+            if len(term) < 3:
+                pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+                clauses.append("(" + " OR ".join(f"{field} LIKE ? ESCAPE '\\'" for field in fields) + ")")
+                params.extend([pattern] * len(fields))
+        order = "rank" if long_terms else "rowid"
+        sql = f"SELECT rowid FROM {fts} WHERE {' AND '.join(clauses)}{owner} ORDER BY {order} LIMIT ?"
+        ids = [row[0] for row in self._conn.execute(sql, params + owner_params + [limit])]
+        if not fuzzy or len(ids) >= limit or not long_terms:
+            return ids
+
+        # Unscharfe Treffer: Kandidaten mit mindestens einem gemeinsamen Trigramm, in Python bewertet
+        grams = set().union(*(_trigrams(term) for term in long_terms))
+        joined = " || char(10) || ".join(f"coalesce({field}, '')" for field in fields)
+        sql = f"SELECT rowid, {joined} FROM {fts} WHERE {fts} MATCH ?{owner} ORDER BY rank LIMIT ?"
+        candidates = self._conn.execute(sql, [" OR ".join(_fts_phrase(gram) for gram in grams)] + owner_params
+                                        + [FUZZY_CANDIDATES]).fetchall()
+        found = set(ids)
+        scored = [(_fuzzy_score(long_terms, candidate_text.lower()), doc_id)
+                  for doc_id, candidate_text in candidates if doc_id not in found]
+        scored = sorted((item for item in scored if item[0] >= FUZZY_MIN_SCORE), key=lambda item: -item[0])
+        return ids + [doc_id for _, doc_id in scored[:limit - len(ids)]]
+
+    def _search_text_scan(self, terms, limit, person_id, fuzzy):
+        """Ersatz für `search_text_ids` ohne FTS5: bewertet alle Dokumente in Python."""
+        documents = self.search_by_person(person_id) if person_id is not None else self.all()
+        fields = TABLES[self.name]['search_fields']
+        exact, scored = [], []
+        for document in documents:
+            text = "\n".join(str(document.get(field) or "") for field in fields).lower()
+            if all(term in text for term in terms):
+                exact.append(document.doc_id)
+            elif fuzzy:
+                score = _fuzzy_score(terms, text)
+                if score >= FUZZY_MIN_SCORE:
+                    scored.append((score, document.doc_id))
+        scored.sort(key=lambda item: -item[0])
+        return (exact + [doc_id for _, doc_id in scored])[:limit]
+
+    def search_text(self, text, limit=50, person_id=None, fuzzy=True):
+        """
+        Wie `search_text_ids`, liefert aber die Dokumente.
+
+        Args:
+            text (str): Die Suchbegriffe, durch Leerzeichen getrennt.
+            limit (int, optional): Höchstzahl der Treffer.
+            person_id (int, optional): Nur Trainings dieser Person.
+            fuzzy (bool, optional): Unscharfe Treffer ergänzen.
+
+        Returns:
+            list: Die gefundenen Dokumente nach Relevanz.
+        """
+        return self.get(doc_ids=self.search_text_ids(text, limit, person_id, fuzzy))
+
+    @timed("DB: all")
+    def all(self):
+        """
+        Liest alle Dokumente der Tabelle.
+
+        Returns:
+            list: Alle Dokumente, nach doc_id sortiert.
+        """
+        cache, token = self._valid_cache()
+        if cache is not None:
+            with cache.lock:
+                if cache.all_ids is not None:
+                    return [self._to_document((i,) + cache.docs[i]) for i in cache.all_ids]
+        rows = self._conn.execute(f"SELECT doc_id, data, version FROM {self.name} ORDER BY doc_id").fetchall()
+        self._store(cache, token, rows, all_ids=[row[0] for row in rows])
+        return [self._to_document(row) for row in rows]
+
+    @timed("DB: search")
+    def search(self, cond):
+        """
+        Liefert alle Dokumente, die `cond` erfüllen.
+
+        Args:
+            cond (tinydb.Query): Bedingung.
+
+        Returns:
+            list: Die passenden Dokumente.
+        """
+        return [document for document in self if cond(document)]
+
+    def contains(self, cond=None, doc_id=None):
+        """
+        Prüft, ob ein Dokument existiert.
+
+        Args:
+            cond (tinydb.Query, optional): Bedingung.
+            doc_id (int, optional): Die doc_id.
+
+        Returns:
+            bool: True, wenn ein passendes Dokument existiert.
+        """
+        if doc_id is not None:
+            return self.get(doc_id=doc_id) is not None
+        return self.get(cond) is not None
+
+    def _select_ids(self, conn, cond, doc_ids):
+        if doc_ids is not None:
+            return [int(i) for i in doc_ids]
+        if cond is not None:
+            return [document.doc_id for document in self if cond(document)]
+        return [row[0] for row in conn.execute(f"SELECT doc_id FROM {self.name}")]
+
+    def update(self, fields, cond=None, doc_ids=None, expected_version=None):
+        """
+        Aktualisiert Dokumente wie TinyDB: die Felder werden in das bestehende Dokument übernommen.
+        Lesen und Schreiben geschehen unter der Schreibsperre, eine Funktion als `fields` ist daher
+        ein atomares Read-Modify-Write (z.B. zum Anhängen an `ekg_tests`).
+
+        Args:
+            fields (dict or callable): Neue Feldwerte oder eine Funktion, die das Dokument verändert.
+            cond (tinydb.Query, optional): Bedingung.
+            doc_ids (list, optional): Die zu aktualisierenden doc_ids.
+            expected_version (int, optional): Optimistische Sperre für genau ein Dokument: weicht die
+                                              gespeicherte Version ab (`document.version` beim Lesen),
+                                              wird nichts geschrieben.
+
+        Returns:
+            list: Die doc_ids der aktualisierten Dokumente.
+
+        Raises:
+            VersionConflictError: Wenn `expected_version` nicht mehr aktuell ist.
+        """
+        updated = []
+        with transaction(self.db_path) as conn:
+            ids = self._select_ids(conn, cond, doc_ids)
+            if expected_version is not None and len(ids) != 1:
+                raise ValueError("expected_version ist nur für genau ein Dokument möglich.")
+            for doc_id in ids:
+                row = conn.execute(f"SELECT data, version FROM {self.name} WHERE doc_id = ?", (doc_id,)).fetchone()
+                if row is None:
+                    continue
+                document, version = json.loads(row[0]), row[1]
+                if expected_version is not None and version != expected_version:
+                    raise VersionConflictError(doc_id, expected_version, version)
+                if callable(fields):
+                    fields(document)
+                else:
+                    document.update(fields)
+                self._write(conn, doc_id, document, version + 1)
+                updated.append(doc_id)
+        return updated
+
+    def remove(self, cond=None, doc_ids=None):
+        """
+        Löscht Dokumente samt ihrer Personen-Trainings-Verknüpfungen.
+
+        Args:
+            cond (tinydb.Query, optional): Bedingung.
+            doc_ids (list, optional): Die zu löschenden doc_ids.
+
+        Returns:
+            list: Die doc_ids der gelöschten Dokumente.
+        """
+        link_column = 'person_id' if self.name == 'persons' else 'training_id'
+        removed = []
+        with transaction(self.db_path) as conn:
+            for doc_id in self._select_ids(conn, cond, doc_ids):
+                if conn.execute(f"DELETE FROM {self.name} WHERE doc_id = ?", (doc_id,)).rowcount:
+                    _index_document(conn, self.name, doc_id)
+                    if 'file_fields' in TABLES[self.name]:
+                        _sync_file_refs(conn, doc_id)
+                    conn.execute(f"DELETE FROM person_trainings WHERE {link_column} = ?", (doc_id,))
+                    if self.name == 'persons':
+                        conn.execute("UPDATE trainings SET person_id = NULL WHERE person_id = ?", (doc_id,))
+                    removed.append(doc_id)
+        return removed
+
+    def truncate(self):
+        """Löscht alle Dokumente der Tabelle."""
+        self.remove()
+
+    def __len__(self):
+        cache, _ = self._valid_cache()
+        if cache is not None and cache.all_ids is not None:
+            return len(cache.all_ids)
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.name}").fetchone()[0]
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def close(self):
+        """Schließt die Verbindung des aktuellen Threads."""
+        conn = getattr(_local, 'connections', {}).pop(self.db_path, None)
+        if conn is not None:
+            conn.close()
+
+
+def _write_document(conn, table_name, doc_id, document, version=1):
+    """Schreibt ein Dokument samt indizierter Spalten (doc_id=None vergibt eine neue ID)."""
+    columns = list(TABLES[table_name]['columns'])
+    defaults = TABLES[table_name].get('defaults', {})
+    values = [document.get(column) for column in columns]
+    values = [None if isinstance(value, (dict, list)) else value for value in values]
+    values = [defaults.get(column) if value is None else value for column, value in zip(columns, values)]
+    placeholders = ["?"] * len(columns)
+    if table_name == 'trainings':
+        # Die Besitzerspalte stammt aus der Verknüpfungstabelle und bleibt beim Ersetzen erhalten
+        columns.append('person_id')
+        placeholders.append("(SELECT person_id FROM person_trainings WHERE training_id = ?)")
+        values.append(doc_id)
+    cursor = conn.execute(
+        f"INSERT OR REPLACE INTO {table_name} (doc_id, {', '.join(columns)}, version, data) "
+        f"VALUES (?, {', '.join(placeholders)}, ?, ?)",
+        [doc_id] + values + [version, json.dumps(document, ensure_ascii=False)])
+    doc_id = cursor.lastrowid if doc_id is None else doc_id
+    _index_document(conn, table_name, doc_id, document)
+    if 'file_fields' in TABLES[table_name]:
+        _sync_file_refs(conn, doc_id, document)
+    if table_name == 'persons':
+        _sync_person_links(conn, doc_id, document.get('ekg_tests', []))
+    return doc_id
+
+
+def _sync_file_refs(conn, training_id, document=None):
+    """Spiegelt die Dateiverweise eines Trainings in `file_refs` (ohne `document`: nur entfernen)."""
+    conn.execute("DELETE FROM file_refs WHERE training_id = ?", (training_id,))
+    if document is None:
+        return
+    refs = []
+    for field in TABLES['trainings']['file_fields']:
+        path = document.get(field)
+        if isinstance(path, str) and path not in ("", "-"):
+            refs.append((path.replace('\\', '/'), training_id, field))
+    conn.executemany("INSERT OR IGNORE INTO file_refs (path, training_id, field) VALUES (?, ?, ?)", refs)
+
+
+def _sync_person_links(conn, person_id, training_ids):
+    """Spiegelt die `ekg_tests`-Liste einer Person in die Verknüpfungstabelle und die Besitzerspalte der Trainings."""
+    training_ids = [int(training_id) for training_id in training_ids]
+    conn.execute("DELETE FROM person_trainings WHERE person_id = ?", (person_id,))
+    conn.executemany("INSERT OR IGNORE INTO person_trainings (person_id, training_id) VALUES (?, ?)",
+                     [(person_id, training_id) for training_id in training_ids])
+    conn.execute("UPDATE trainings SET person_id = NULL WHERE person_id = ?", (person_id,))
+    for start in range(0, len(training_ids), SQLITE_MAX_PARAMS):
+        chunk = training_ids[start:start + SQLITE_MAX_PARAMS]
+        conn.execute(f"UPDATE trainings SET person_id = ? WHERE doc_id IN ({', '.join(['?'] * len(chunk))})",
+                     [person_id] + chunk)
+
+
+def open_table(name, db_path=DB_PATH):
+    """
+    Öffnet eine Tabelle als Ersatz für `TinyDB(...)`. Zur einfachen Umstellung werden auch die
+    alten JSON-Dateinamen akzeptiert. Pro Prozess gibt es genau ein Objekt je Tabelle, das sich alle
+    Seiten und Sessions samt Lese-Cache teilen.
+
+    Args:
+        name (str): 'persons', 'trainings', 'dbperson.json' oder 'dbtests.json'.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        SQLiteTable: Die Tabelle.
+    """
+    table_name = JSON_PATH_TO_TABLE.get(name, name)
+    with _registry_lock:
+        table = _tables.get((db_path, table_name))
+    if table is None:
+        table = SQLiteTable(table_name, db_path)
+        with _registry_lock:
+            table = _tables.setdefault((db_path, table_name), table)
+    return table
+
+
+def _read_tinydb_json(json_path):
+    """Liest eine TinyDB-JSON-Datei und gibt {doc_id: dokument} der Standardtabelle zurück."""
+    if not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+        return {}
+    with open(json_path, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    return {int(doc_id): document for doc_id, document in content.get('_default', {}).items()}
+
+
+def migrate_json(table_name, json_path=None, db_path=DB_PATH, force=False):
+    """
+    Importiert eine TinyDB-JSON-Datei mit ihren doc_ids in die SQLite-Tabelle.
+
+    Args:
+        table_name (str): 'persons' oder 'trainings'.
+        json_path (str, optional): Pfad zur JSON-Datei. Standard ist die bisherige Datei der Tabelle.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+        force (bool, optional): Wenn True, wird die Tabelle vorher geleert und erneut importiert.
+
+    Returns:
+        int: Anzahl der importierten Dokumente.
+    """
+    json_path = json_path or TABLES[table_name]['json_path']
+    documents = _read_tinydb_json(json_path)
+    with transaction(db_path) as conn:
+        if force:
+            conn.execute(f"DELETE FROM {table_name}")
+            if SEARCH_INDEX_AVAILABLE:
+                conn.execute(f"DELETE FROM {table_name}_fts")
+            if 'file_fields' in TABLES[table_name]:
+                conn.execute("DELETE FROM file_refs")
+            if table_name == 'persons':
+                conn.execute("DELETE FROM person_trainings")
+        for doc_id in sorted(documents):
+            _write_document(conn, table_name, doc_id, documents[doc_id])
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"migrated:{table_name}", json_path))
+    return len(documents)
+
+
+def ensure_migrated(table_name, db_path=DB_PATH):
+    """
+    Importiert beim ersten Öffnen einer Tabelle einmalig die alte JSON-Datei, falls vorhanden.
+
+    Args:
+        table_name (str): 'persons' oder 'trainings'.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        None
+    """
+    conn = get_connection(db_path)
+    if conn.execute("SELECT 1 FROM meta WHERE key = ?", (f"migrated:{table_name}",)).fetchone():
+        return
+    if conn.execute(f"SELECT 1 FROM {table_name} LIMIT 1").fetchone() is None:
+        migrate_json(table_name, db_path=db_path)
+    else:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"migrated:{table_name}", ""))
+
+
+if __name__ == "__main__":
+    # Einmaliger Import der bisherigen JSON-Datenbanken: python Module/datenbank.py [--force]
+    force = "--force" in sys.argv
+    for name in TABLES:
+        count = migrate_json(name, force=force)
+        print(f"{name}: {count} Dokument(e) aus {TABLES[name]['json_path']} importiert.")
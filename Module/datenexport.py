@@ -0,0 +1,326 @@
+import io
+import os
+import sys
+import json
+import time
+import inspect
+import zipfile
+import argparse
+import tempfile
+import multiprocessing
+from itertools import repeat
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.datenbank import open_table, transaction
+from Module.trackdaten import read_gpx_track, read_fit_records, FIT_CHANNELS
+from Module.utils import normalize_path_slashes
+from Module.dateiablage import store_stream
+from Module.zusammenfassung import get_contribution, add_training_to_summary
+
+# --- Konfiguration & Konstanten ---
+EXPORT_DIR = "exports"
+EXPORT_FORMAT = 1
+RESTORE_BATCH_SIZE = 500                  # Trainings pro Schreibtransaktion beim Wiederherstellen
+FILE_FIELDS = ('fit_file', 'gpx_file', 'ekg_file', 'image')
+COMPRESSIONS = ('zstd', 'snappy', 'gzip', 'none')
+
+# Aktivitäten im Langformat: eine Zeile pro Messpunkt, eine Row Group pro Training
+ACTIVITY_SCHEMA = pa.schema([
+    ('training_id', pa.int64()),
+    ('quelle', pa.string()),
+    ('time', pa.timestamp('us')),
+    ('latitude', pa.float64()),
+    ('longitude', pa.float64()),
+    *[(name, pa.float64()) for name in FIT_CHANNELS.values()],
+])
+EKG_SCHEMA = pa.schema([
+    ('training_id', pa.int64()),
+    ('zeit_ms', pa.float64()),
+    ('messwert_mv', pa.float64()),
+])
+
+
+# --- Export ---
+
+def _activity_frame(training):
+    """Liest die Messkanäle eines Trainings (FIT bevorzugt, sonst GPX) als DataFrame im Schema der Aktivitäten."""
+    df, source = None, None
+    fit_file = training.get('fit_file')
+    gpx_file = training.get('gpx_file')
+    if fit_file and fit_file != "-":
+        df, source = read_fit_records(fit_file), 'fit'
+    if (df is None or df.empty) and gpx_file and gpx_file != "-":
+        df, source = read_gpx_track(gpx_file), 'gpx'
+    if df is None or df.empty:
+        return None
+    df = df.reindex(columns=[field.name for field in ACTIVITY_SCHEMA])
+    df['training_id'] = training.doc_id
+    df['quelle'] = source
+    return df
+
+
+def _ekg_frame(training):
+    """Liest die EKG-Datei eines Trainings (Messwert in mV, Zeit in ms) als DataFrame im Schema der EKG-Daten."""
+    ekg_file = training.get('ekg_file')
+    if not ekg_file or not os.path.exists(ekg_file):
+        return None
+    separator = '\t' if ekg_file.lower().endswith('.txt') else ','
+    df = pd.read_csv(ekg_file, sep=separator, header=None, names=['messwert_mv', 'zeit_ms'], dtype=float)
+    df['training_id'] = training.doc_id
+    return df[[field.name for field in EKG_SCHEMA]]
+
+
+def _metadata_column(values):
+    """
+    Wählt für eine Metadatenspalte einen passenden Arrow-Typ. Gemischte oder verschachtelte
+    Werte werden als JSON-Text gespeichert.
+
+    Returns:
+        tuple: (pyarrow.Array, True wenn die Spalte JSON-kodiert ist).
+    """
+    present = [value for value in values if value is not None]
+    if all(isinstance(value, bool) for value in present):
+        return pa.array(values, type=pa.bool_()), False
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in present):
+        return pa.array(values, type=pa.int64()), False
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in present):
+        return pa.array([None if value is None else float(value) for value in values], type=pa.float64()), False
+    if all(isinstance(value, str) for value in present):
+        return pa.array(values, type=pa.string()), False
+    return pa.array([None if value is None else json.dumps(value, ensure_ascii=False) for value in values],
+                    type=pa.string()), True
+
+
+def _metadata_table(trainings):
+    """Baut die Metadatentabelle (eine Zeile pro Training) samt gespeichertem Beitrag zur Zusammenfassung."""
+    fields = []
+    for training in trainings:
+        fields.extend(field for field in training if field not in fields)
+    rows = [dict(training, doc_id=training.doc_id, beitrag=get_contribution(training.doc_id)) for training in trainings]
+    columns, json_columns = {}, []
+    for field in ['doc_id', *fields, 'beitrag']:
+        columns[field], is_json = _metadata_column([row.get(field) for row in rows])
+        if is_json:
+            json_columns.append(field)
+    return pa.table(columns), json_columns
+
+
+def export_history(person_id, target_path=None, include_files=True, compression='zstd', progress=None):
+    """
+    Exportiert alle Trainings einer Person in ein einzelnes Archiv (ZIP-Container) mit
+    - `trainings.parquet`: Metadaten, eine Zeile pro Training,
+    - `aktivitaeten.parquet`: alle Messpunkte aus FIT/GPX (Position, Zeit, Kanäle) im Langformat,
+    - `ekg.parquet`: alle EKG-Messwerte im Langformat,
+    - `dateien/`: die Originaldateien (optional), damit `restore_history` die Trainings vollständig herstellt.
+    Die Messdaten werden Training für Training als eigene Row Group geschrieben; im Speicher liegt
+    immer nur ein Training.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        target_path (str, optional): Zieldatei. Standard: `exports/<Name>_<Zeitstempel>.zip`.
+        include_files (bool, optional): Originaldateien (FIT, GPX, EKG, Bilder) beilegen.
+        compression (str, optional): Parquet-Kompression ('zstd', 'snappy', 'gzip' oder 'none').
+        progress (callable, optional): Wird mit (erledigt, gesamt) aufgerufen.
+
+    Returns:
+        dict: 'pfad', 'trainings', 'messpunkte', 'ekg_werte', 'bytes' und 'dauer_s'.
+
+    Raises:
+        ValueError: Wenn die Person nicht existiert oder die Kompression unbekannt ist.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unbekannte Kompression: {compression}")
+    person = open_table('dbperson.json').get(doc_id=int(person_id))
+    if person is None:
+        raise ValueError(f"Person mit ID {person_id} nicht gefunden.")
+    start = time.perf_counter()
+    trainings = open_table('dbtests.json').search_by_person(int(person_id))
+    if target_path is None:
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        name = f"{person.get('firstname', '')}_{person.get('lastname', '')}".replace(' ', '_')
+        target_path = os.path.join(EXPORT_DIR, f"{name}_{datetime.now().strftime('%Y%m%d%H%M%S')}.zip")
+    codec = None if compression == 'none' else compression
+
+    points = ekg_values = 0
+    files = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        activity_path = os.path.join(tmp, "aktivitaeten.parquet")
+        ekg_path = os.path.join(tmp, "ekg.parquet")
+        with pq.ParquetWriter(activity_path, ACTIVITY_SCHEMA, compression=codec) as activity_writer, \
+                pq.ParquetWriter(ekg_path, EKG_SCHEMA, compression=codec) as ekg_writer:
+            for done, training in enumerate(trainings, start=1):
+                activity = _activity_frame(training)
+                if activity is not None:
+                    activity_writer.write_table(pa.Table.from_pandas(activity, schema=ACTIVITY_SCHEMA, preserve_index=False))
+                    points += len(activity)
+                ekg = _ekg_frame(training)
+                if ekg is not None:
+                    ekg_writer.write_table(pa.Table.from_pandas(ekg, schema=EKG_SCHEMA, preserve_index=False))
+                    ekg_values += len(ekg)
+                for field in FILE_FIELDS:
+                    file_path = training.get(field)
+                    if include_files and file_path and os.path.exists(file_path):
+                        files[file_path] = f"dateien/{training.doc_id}/{os.path.basename(file_path)}"
+                if progress is not None:
+                    progress(done, len(trainings))
+
+        metadata, json_columns = _metadata_table(trainings)
+        metadata_path = os.path.join(tmp, "trainings.parquet")
+        pq.write_table(metadata, metadata_path, compression=codec)
+        manifest = {
+            'format': EXPORT_FORMAT,
+            'erstellt': datetime.now().isoformat(timespec='seconds'),
+            'person': {key: value for key, value in person.items() if key != 'ekg_tests'},
+            'trainings': len(trainings),
+            'json_spalten': json_columns,
+            'dateien': files,
+        }
+
+        # Parquet ist bereits komprimiert; nur die Originaldateien werden im ZIP komprimiert
+        file_compression = zipfile.ZIP_STORED if codec is None else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(target_path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            archive.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+            for path in (metadata_path, activity_path, ekg_path):
+                archive.write(path, os.path.basename(path))
+            for file_path, arcname in files.items():
+                archive.write(file_path, arcname, compress_type=file_compression)
+
+    return {
+        'pfad': normalize_path_slashes(target_path),
+        'trainings': len(trainings),
+        'messpunkte': points,
+        'ekg_werte': ekg_values,
+        'bytes': os.path.getsize(target_path),
+        'dauer_s': round(time.perf_counter() - start, 2),
+    }
+
+
+def read_activity_arrays(archive_path, training_id=None):
+    """
+    Liest die Messpunkte aus einem Export, optional nur für ein Training (es wird dann nur
+    dessen Row Group gelesen).
+
+    Args:
+        archive_path (str): Pfad zum Export.
+        training_id (int, optional): Die ursprüngliche doc_id des Trainings.
+
+    Returns:
+        pandas.DataFrame: Die Messpunkte im Langformat.
+    """
+    with zipfile.ZipFile(archive_path) as archive, archive.open("aktivitaeten.parquet") as f:
+        filters = None if training_id is None else [('training_id', '=', int(training_id))]
+        return pq.read_table(f, filters=filters).to_pandas()
+
+
+# --- Wiederherstellung ---
+
+def _extract_file(archive, arcname):
+    """Legt eine Datei aus dem Export inhaltsadressiert in der Dateiablage ab (bereits vorhandene Inhalte werden wiederverwendet)."""
+    with archive.open(arcname) as source:
+        return store_stream(source, os.path.splitext(arcname)[1])[0]
+
+
+def restore_history(archive_path, person_id=None, update_derived=True, progress=None):
+    """
+    Stellt die Trainings aus einem Export wieder her: Originaldateien werden in die Dateiablage
+    entpackt, die Metadaten spaltenweise gelesen und stapelweise (samt Verknüpfung und Beitrag zur
+    Zusammenfassung) in je einer Transaktion eingefügt. Die Messdaten-Tabellen werden dafür nicht
+    gelesen. Ohne `person_id` wird die exportierte Person neu angelegt.
+
+    Args:
+        archive_path (str or file): Pfad oder Dateiobjekt des Exports.
+        person_id (int, optional): Person, der die Trainings zugeordnet werden.
+        update_derived (bool, optional): Streckenerkennung, Heatmap und Segmente aktualisieren.
+        progress (callable, optional): Wird mit (erledigt, gesamt) aufgerufen.
+
+    Returns:
+        dict: 'person_id', 'trainings' (neue doc_ids) und 'dauer_s'.
+
+    Raises:
+        ValueError: Wenn das Archiv kein unterstützter Export ist oder die Person nicht existiert.
+    """
+    start = time.perf_counter()
+    trainings_db = open_table('dbtests.json')
+    persons_db = open_table('dbperson.json')
+    with zipfile.ZipFile(archive_path) as archive:
+        try:
+            manifest = json.loads(archive.read("manifest.json"))
+        except KeyError:
+            raise ValueError("Das Archiv enthält kein manifest.json und ist kein Trainings-Export.")
+        if manifest.get('format') != EXPORT_FORMAT:
+            raise ValueError(f"Nicht unterstütztes Exportformat: {manifest.get('format')}")
+        rows = pq.read_table(io.BytesIO(archive.read("trainings.parquet"))).to_pylist()
+        paths = {old: _extract_file(archive, arcname) for old, arcname in manifest['dateien'].items()}
+
+    if person_id is None:
+        person_id = persons_db.insert(dict(manifest['person'], ekg_tests=[]))
+    elif persons_db.get(doc_id=int(person_id)) is None:
+        raise ValueError(f"Person mit ID {person_id} nicht gefunden.")
+    person_id = int(person_id)
+
+    entries = []
+    for row in rows:
+        for column in manifest['json_spalten']:
+            if row.get(column) is not None:
+                row[column] = json.loads(row[column])
+        row.pop('doc_id', None)
+        contribution = row.pop('beitrag', None)
+        training = {key: value for key, value in row.items() if value is not None}
+        for field in FILE_FIELDS:
+            if training.get(field):
+                training[field] = paths.get(training[field])
+        if contribution is not None:
+            contribution['fit_file'] = training.get('fit_file')
+        entries.append((training, contribution))
+
+    new_ids = []
+    for batch_start in range(0, len(entries), RESTORE_BATCH_SIZE):
+        batch = entries[batch_start:batch_start + RESTORE_BATCH_SIZE]
+        with transaction():
+            ids = trainings_db.insert_multiple([training for training, _ in batch])
+            persons_db.update(lambda person: person.setdefault('ekg_tests', []).extend(ids), doc_ids=[person_id])
+            for training_id, (training, contribution) in zip(ids, batch):
+                add_training_to_summary(person_id, training_id, training, contribution)
+        new_ids.extend(ids)
+        if progress is not None:
+            progress(len(new_ids), len(entries))
+
+    if update_derived and new_ids:
+        # Wie beim Massenimport parallel; die Indizes sind per Dateisperre prozesssicher
+        from Module.massenimport import update_derived_data
+        with ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(update_derived_data, new_ids, [training for training, _ in entries], repeat(person_id)))
+
+    return {'person_id': person_id, 'trainings': new_ids, 'dauer_s': round(time.perf_counter() - start, 2)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export und Wiederherstellung aller Trainings einer Person.")
+    commands = parser.add_subparsers(dest="befehl", required=True)
+    export_parser = commands.add_parser("export", help="Trainings einer Person exportieren")
+    export_parser.add_argument("--person", type=int, required=True, help="doc_id der Person")
+    export_parser.add_argument("--ziel", default=None, help="Zieldatei (Standard: exports/<Name>_<Zeit>.zip)")
+    export_parser.add_argument("--ohne-dateien", action="store_true", help="Originaldateien nicht beilegen")
+    export_parser.add_argument("--kompression", choices=COMPRESSIONS, default='zstd')
+    import_parser = commands.add_parser("import", help="Export wiederherstellen")
+    import_parser.add_argument("archiv", help="Pfad zum Export")
+    import_parser.add_argument("--person", type=int, default=None, help="Zielperson (Standard: neu anlegen)")
+    import_parser.add_argument("--ohne-abgeleitete", action="store_true",
+                               help="Streckenerkennung, Heatmap und Segmente nicht aktualisieren")
+    args = parser.parse_args()
+
+    if args.befehl == "export":
+        result = export_history(args.person, args.ziel, include_files=not args.ohne_dateien, compression=args.kompression)
+        print(f"{result['trainings']} Training(e), {result['messpunkte']} Messpunkte und {result['ekg_werte']} EKG-Werte "
+              f"in {result['dauer_s']} s nach {result['pfad']} exportiert ({result['bytes'] / 1e6:.1f} MB).")
+    else:
+        result = restore_history(args.archiv, args.person, update_derived=not args.ohne_abgeleitete)
+        print(f"{len(result['trainings'])} Training(e) in {result['dauer_s']} s für Person {result['person_id']} wiederhergestellt.")
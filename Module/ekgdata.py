@@ -231,13 +231,21 @@ if __name__ == "__main__":
     #print(ekg.df.head())
 '''
 
+import os
+import sys
 import json
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.io as pio
+import inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.laufzeitprofil import timed
+from Module.utils import lazy_import
 
-pio.renderers.default = 'browser' 
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+px = lazy_import("plotly.express")
 
 # %% Objekt-Welt
 
@@ -275,6 +283,7 @@ class EKGdata:
         return ekg_test
     
 
+    @timed()
     def find_peaks(self, respacing_factor=5):
         """
         A function to find the peaks in a series completely without explicit loops.
@@ -431,6 +440,8 @@ class EKGdata:
 
 
 if __name__ == "__main__":
+    import plotly.io as pio
+    pio.renderers.default = 'browser'  # Nur für die Ausführung als Skript: Diagramme im Browser öffnen
     print("This is a module with some functions to read the EKG data")
     ekg_3_dict = EKGdata.load_by_id(3)
     ekg_3 = EKGdata(ekg_3_dict)
@@ -0,0 +1,358 @@
+import io
+import os
+import sys
+import json
+import base64
+import inspect
+import numpy as np
+import folium
+from PIL import Image
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.trackdaten import load_track_for_training, resample_by_distance, bounding_box
+from Module.dateisperre import file_lock, atomic_write_json
+
+# --- Konfiguration & Konstanten ---
+# Rohzählwerte pro Kachel für inkrementelle Updates. Das Verzeichnis wird nicht ausgeliefert:
+# die Heatmap zeigt Wohn- und Trainingsorte und wird nur als eingebettetes Bild in die Karte der Person gerendert.
+HEATMAP_DATA_DIR = "heatmap_cache"
+
+TILE_SIZE = 256
+HEATMAP_ZOOM_LEVELS = range(6, 16)
+RESAMPLE_STEP_M = 4.0       # etwas feiner als ein Pixel auf Zoomstufe 15 (ca. 3-5 m)
+SATURATION_COUNT = 20       # ab so vielen Aktivitäten pro Pixel ist die Farbe voll gesättigt
+OVERLAY_MAX_PX = 2048       # Kantenlänge eines Overlay-Bilds; bestimmt die höchste Zoomstufe je Region
+REGION_MARGIN_DEG = 0.05    # Tracks mit so nahen Bounding Boxes landen im selben Overlay
+
+
+def lonlat_to_global_pixels(lat, lon, zoom):
+    """
+    Rechnet Koordinaten in globale Web-Mercator-Pixelkoordinaten einer Zoomstufe um.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+        zoom (int): Die Zoomstufe.
+
+    Returns:
+        tuple: (px, py) als ganzzahlige numpy.ndarray.
+    """
+    world_size = TILE_SIZE * (1 << zoom)
+    lat_rad = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * world_size
+    y = (1.0 - np.log(np.tan(lat_rad) + 1.0 / np.cos(lat_rad)) / np.pi) / 2.0 * world_size
+    px = np.clip(x.astype(np.int64), 0, world_size - 1)
+    py = np.clip(y.astype(np.int64), 0, world_size - 1)
+    return px, py
+
+
+def global_pixels_to_lonlat(px, py, zoom):
+    """
+    Rechnet globale Web-Mercator-Pixelkoordinaten (Pixelkanten) einer Zoomstufe in Koordinaten zurück.
+
+    Args:
+        px (float): Globale x-Pixelkoordinate.
+        py (float): Globale y-Pixelkoordinate.
+        zoom (int): Die Zoomstufe.
+
+    Returns:
+        tuple: (lat, lon) in Grad.
+    """
+    world_size = TILE_SIZE * (1 << zoom)
+    lon = px / world_size * 360.0 - 180.0
+    lat = float(np.degrees(np.arctan(np.sinh(np.pi * (1.0 - 2.0 * py / world_size)))))
+    return lat, lon
+
+
+def rasterize_track(lat, lon, zoom):
+    """
+    Bint die Punkte eines Tracks in die Web-Mercator-Kacheln einer Zoomstufe.
+    Jedes Pixel zählt pro Aktivität höchstens einmal, damit langsame Abschnitte
+    (viele Punkte auf engem Raum) die Heatmap nicht dominieren.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade (bereits dicht abgetastet).
+        lon (numpy.ndarray): Längengrade (bereits dicht abgetastet).
+        zoom (int): Die Zoomstufe.
+
+    Returns:
+        dict: {(tile_x, tile_y): numpy.ndarray (256x256, uint16)} mit den Trefferzahlen.
+    """
+    px, py = lonlat_to_global_pixels(lat, lon, zoom)
+    tiles_per_side = 1 << zoom
+    # Eindeutige Pixel-IDs über alle Kacheln hinweg
+    pixel_ids = np.unique(py * (TILE_SIZE * tiles_per_side) + px)
+    gy = pixel_ids // (TILE_SIZE * tiles_per_side)
+    gx = pixel_ids % (TILE_SIZE * tiles_per_side)
+    tile_ids = (gx // TILE_SIZE) * tiles_per_side + (gy // TILE_SIZE)
+    local_ids = (gy % TILE_SIZE) * TILE_SIZE + (gx % TILE_SIZE)
+
+    tiles = {}
+    order = np.argsort(tile_ids, kind="stable")
+    tile_ids = tile_ids[order]
+    local_ids = local_ids[order]
+    unique_tiles, starts = np.unique(tile_ids, return_index=True)
+    ends = np.append(starts[1:], len(tile_ids))
+    for tile_id, start, end in zip(unique_tiles, starts, ends):
+        counts = np.bincount(local_ids[start:end], minlength=TILE_SIZE * TILE_SIZE)
+        tiles[(int(tile_id // tiles_per_side), int(tile_id % tiles_per_side))] = \
+            counts.reshape(TILE_SIZE, TILE_SIZE).astype(np.uint16)
+    return tiles
+
+
+def counts_to_rgba(counts):
+    """
+    Färbt eine Zählkachel ein (transparent -> rot -> gelb -> weiß) mit logarithmischer Skala.
+
+    Args:
+        counts (numpy.ndarray): 256x256 Zählwerte.
+
+    Returns:
+        numpy.ndarray: RGBA-Bild (256x256x4, uint8).
+    """
+    intensity = np.clip(np.log1p(counts) / np.log1p(SATURATION_COUNT), 0.0, 1.0)
+    rgba = np.zeros(counts.shape + (4,), dtype=np.uint8)
+    rgba[..., 0] = 255
+    rgba[..., 1] = (np.clip(intensity * 2.0 - 0.5, 0.0, 1.0) * 255).astype(np.uint8)
+    rgba[..., 2] = (np.clip(intensity * 3.0 - 2.0, 0.0, 1.0) * 255).astype(np.uint8)
+    rgba[..., 3] = np.where(counts > 0, (110 + intensity * 145), 0).astype(np.uint8)
+    return rgba
+
+
+class PersonalHeatmap:
+    """
+    Verwaltet die Heatmap einer Person. Die Rohzählwerte pro Kachel werden in `heatmap_cache/<person_id>/`
+    gehalten, damit beim Hinzufügen oder Entfernen eines Trainings nur die betroffenen Kacheln neu gerechnet
+    werden. Angezeigt wird sie als Bild je Region (`get_overlays`), das direkt in die Karte eingebettet wird;
+    es gibt keine öffentlich abrufbaren Kachel-URLs. Änderungen laufen unter einer Sperre auf das Manifest,
+    Dateien werden atomar ersetzt.
+    """
+
+    def __init__(self, person_id):
+        self.person_id = int(person_id)
+        self.data_dir = os.path.join(HEATMAP_DATA_DIR, str(self.person_id))
+        self.manifest_path = os.path.join(self.data_dir, "manifest.json")
+        self.overlay_path = os.path.join(self.data_dir, "overlays.json")
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        return {"trainings": {}, "version": 0}
+
+    def _save_manifest(self):
+        atomic_write_json(self.manifest_path, self.manifest)
+
+    @staticmethod
+    def _replace_file(path, write):
+        """Schreibt über `write(f)` in eine temporäre Datei und ersetzt dann `path` atomar."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+    def _counts_path(self, zoom, tile_x, tile_y):
+        return os.path.join(self.data_dir, str(zoom), f"{tile_x}_{tile_y}.npz")
+
+    def _apply(self, training, sign):
+        """Addiert (sign=+1) oder subtrahiert (sign=-1) den Beitrag eines Tracks zu den betroffenen Kacheln."""
+        track_df = load_track_for_training(training)
+        if track_df is None:
+            return None
+        lat, lon = resample_by_distance(track_df['latitude'].to_numpy(dtype=float),
+                                        track_df['longitude'].to_numpy(dtype=float), RESAMPLE_STEP_M)
+        for zoom in HEATMAP_ZOOM_LEVELS:
+            for (tile_x, tile_y), delta in rasterize_track(lat, lon, zoom).items():
+                counts_path = self._counts_path(zoom, tile_x, tile_y)
+                if os.path.exists(counts_path):
+                    counts = np.load(counts_path)["counts"].astype(np.int32)
+                else:
+                    counts = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.int32)
+                counts = np.clip(counts + sign * delta.astype(np.int32), 0, np.iinfo(np.uint16).max)
+
+                if counts.any():
+                    self._replace_file(counts_path, lambda f: np.savez_compressed(f, counts=counts.astype(np.uint16)))
+                elif os.path.exists(counts_path):
+                    os.remove(counts_path)
+        return bounding_box(lat, lon)
+
+    def add_training(self, training_id, training):
+        """
+        Rastert den Track eines Trainings in die Heatmap ein (nur wenn es noch nicht enthalten ist).
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+            training (dict): Das Trainings-Dokument mit 'gpx_file' und/oder 'fit_file'.
+
+        Returns:
+            bool: True, wenn die Heatmap verändert wurde.
+        """
+        key = str(int(training_id))
+        with file_lock(self.manifest_path):
+            # Frisch laden, falls eine andere Session die Heatmap inzwischen geändert hat
+            self.manifest = self._load_manifest()
+            if key in self.manifest["trainings"]:
+                return False
+            bbox = self._apply(training, +1)
+            # Auch Trainings ohne Track merken, damit sie nicht bei jedem Abgleich erneut geladen werden
+            self.manifest["trainings"][key] = {
+                "bbox": bbox,
+                "gpx_file": training.get('gpx_file'),
+                "fit_file": training.get('fit_file'),
+            }
+            self.manifest["version"] += 1
+            self._save_manifest()
+        return bbox is not None
+
+    def remove_training(self, training_id):
+        """
+        Entfernt den Beitrag eines Trainings aus der Heatmap.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+
+        Returns:
+            bool: True, wenn die Heatmap verändert wurde.
+        """
+        key = str(int(training_id))
+        with file_lock(self.manifest_path):
+            self.manifest = self._load_manifest()
+            entry = self.manifest["trainings"].pop(key, None)
+            if entry is None:
+                return False
+            changed = False
+            if entry.get("bbox") is not None:
+                changed = self._apply(entry, -1) is not None
+            self.manifest["version"] += 1
+            self._save_manifest()
+        return changed
+
+    def sync(self, trainings):
+        """
+        Gleicht die Heatmap mit der aktuellen Trainingsliste ab: neue Trainings werden
+        eingerastert, gelöschte oder mit geänderten Dateien neu berechnet.
+
+        Args:
+            trainings (list): Trainings-Dokumente der Person (mit `doc_id`).
+
+        Returns:
+            int: Anzahl der Trainings, deren Beitrag hinzugefügt oder entfernt wurde.
+        """
+        changes = 0
+        current = {str(t.doc_id): t for t in trainings}
+        for key, entry in list(self.manifest["trainings"].items()):
+            training = current.get(key)
+            if training is None or training.get('gpx_file') != entry.get('gpx_file') \
+                    or training.get('fit_file') != entry.get('fit_file'):
+                self.remove_training(key)
+                changes += 1
+        for key, training in current.items():
+            if key not in self.manifest["trainings"]:
+                self.add_training(key, training)
+                changes += 1
+        return changes
+
+    def get_bounds(self):
+        """
+        Liefert die Bounding Box aller enthaltenen Tracks.
+
+        Returns:
+            list or None: [[min_lat, min_lon], [max_lat, max_lon]] oder None, wenn keine Tracks vorhanden sind.
+        """
+        boxes = [e["bbox"] for e in self.manifest["trainings"].values() if e.get("bbox")]
+        if not boxes:
+            return None
+        boxes = np.array(boxes)
+        return [[float(boxes[:, 0].min()), float(boxes[:, 1].min())],
+                [float(boxes[:, 2].max()), float(boxes[:, 3].max())]]
+
+    def _regions(self):
+        """Fasst die Bounding Boxes aller Tracks zu Regionen zusammen (überlappende oder nahe Boxen werden vereinigt)."""
+        regions = []
+        for box in (e["bbox"] for e in self.manifest["trainings"].values() if e.get("bbox")):
+            box = list(box)
+            merged = True
+            while merged:
+                merged = False
+                for region in regions:
+                    if region[0] <= box[2] + REGION_MARGIN_DEG and region[2] >= box[0] - REGION_MARGIN_DEG and \
+                            region[1] <= box[3] + REGION_MARGIN_DEG and region[3] >= box[1] - REGION_MARGIN_DEG:
+                        regions.remove(region)
+                        box = [min(box[0], region[0]), min(box[1], region[1]), max(box[2], region[2]), max(box[3], region[3])]
+                        merged = True
+                        break
+            regions.append(box)
+        return regions
+
+    def _render_region(self, bbox):
+        """Setzt die Zählkacheln einer Region auf der höchsten passenden Zoomstufe zu einem eingefärbten PNG zusammen."""
+        zoom = min(HEATMAP_ZOOM_LEVELS)
+        for candidate in HEATMAP_ZOOM_LEVELS:
+            px, py = lonlat_to_global_pixels(np.array([bbox[0], bbox[2]]), np.array([bbox[1], bbox[3]]), candidate)
+            if px[1] - px[0] + 1 <= OVERLAY_MAX_PX and py[0] - py[1] + 1 <= OVERLAY_MAX_PX:
+                zoom = candidate
+        px, py = lonlat_to_global_pixels(np.array([bbox[0], bbox[2]]), np.array([bbox[1], bbox[3]]), zoom)
+        x0, x1, y0, y1 = int(px[0]), int(px[1]) + 1, int(py[1]), int(py[0]) + 1
+
+        counts = np.zeros((y1 - y0, x1 - x0), dtype=np.uint16)
+        for tile_x in range(x0 // TILE_SIZE, (x1 - 1) // TILE_SIZE + 1):
+            for tile_y in range(y0 // TILE_SIZE, (y1 - 1) // TILE_SIZE + 1):
+                counts_path = self._counts_path(zoom, tile_x, tile_y)
+                if not os.path.exists(counts_path):
+                    continue
+                tile = np.load(counts_path)["counts"]
+                left, top = tile_x * TILE_SIZE, tile_y * TILE_SIZE
+                # Ausschnitt der Kachel innerhalb der Region
+                cx0, cx1 = max(x0, left), min(x1, left + TILE_SIZE)
+                cy0, cy1 = max(y0, top), min(y1, top + TILE_SIZE)
+                counts[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0] = tile[cy0 - top:cy1 - top, cx0 - left:cx1 - left]
+
+        buffer = io.BytesIO()
+        Image.fromarray(counts_to_rgba(counts)).save(buffer, format="PNG", optimize=True)
+        north, west = global_pixels_to_lonlat(x0, y0, zoom)
+        south, east = global_pixels_to_lonlat(x1, y1, zoom)
+        return {"bounds": [[south, west], [north, east]], "zoom": zoom,
+                "png": base64.b64encode(buffer.getvalue()).decode("ascii")}
+
+    def get_overlays(self):
+        """
+        Liefert die Heatmap als Bilder je Region (nahe beieinanderliegende Tracks bilden eine Region).
+        Die Bilder werden pro Manifest-Version einmal gerendert und in `heatmap_cache/` zwischengespeichert.
+
+        Returns:
+            list: Je Region {'bounds': [[süd, west], [nord, ost]], 'zoom': Zoomstufe, 'png': Base64-PNG}.
+        """
+        if os.path.exists(self.overlay_path):
+            with open(self.overlay_path, "r") as f:
+                cached = json.load(f)
+            if cached.get("version") == self.manifest["version"]:
+                return cached["overlays"]
+        overlays = [self._render_region(region) for region in self._regions()]
+        atomic_write_json(self.overlay_path, {"version": self.manifest["version"], "overlays": overlays})
+        return overlays
+
+
+def create_heatmap_layer(heatmap):
+    """
+    Erstellt den Folium-Layer für eine persönliche Heatmap. Die Bilder werden als Data-URL in die Karte
+    eingebettet, damit die Heatmap nur in der Sitzung der Person sichtbar ist.
+
+    Args:
+        heatmap (PersonalHeatmap): Die Heatmap der Person.
+
+    Returns:
+        folium.FeatureGroup: Overlay-Layer mit einem Bild je Region.
+    """
+    layer = folium.FeatureGroup(name="Heatmap", overlay=True, control=True)
+    for overlay in heatmap.get_overlays():
+        folium.raster_layers.ImageOverlay(
+            image=f"data:image/png;base64,{overlay['png']}",
+            bounds=overlay["bounds"],
+            attr="Eigene Trainings",
+        ).add_to(layer)
+    return layer
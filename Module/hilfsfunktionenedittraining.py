@@ -4,11 +4,6 @@
 import streamlit as st
 from datetime import datetime, timedelta
 import os
-import gpxpy
-import gpxpy.gpx
-import pandas as pd
-from fitparse import FitFile
-import numpy as np
 
 
 import sys
@@ -17,7 +12,15 @@ currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentfram
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
 
-from Module.utils import normalize_path_slashes 
+from Module.utils import normalize_path_slashes, lazy_import
+from Module.dateiablage import store_stream
+from Module.bildvarianten import create_renditions, rendition_path
+
+# Erst beim Auswerten einer Datei gebraucht
+gpxpy = lazy_import("gpxpy")
+fitparse = lazy_import("fitparse")
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 # --- Konfiguration & Konstanten ---
 UPLOAD_DIR = "uploaded_files"
@@ -26,35 +29,34 @@ os.makedirs(UPLOAD_DIR, exist_ok=True) # Sicherstellen, dass das Verzeichnis exi
 # --- Hilfsfunktion zum Speichern von Dateien ---
 def save_uploaded_file(uploaded_file, file_prefix, workout_name):
     """
-    Speichert eine hochgeladene Datei im UPLOAD_DIR mit einem eindeutigen Namen.
-    Normalisiert den Pfad mit Forward-Slashes.
+    Speichert eine hochgeladene Datei inhaltsadressiert in der Dateiablage (Name = SHA-256 des Inhalts,
+    beim Hochladen blockweise berechnet). Wurde derselbe Inhalt schon einmal hochgeladen, wird die
+    vorhandene Datei wiederverwendet, sodass auch alle daraus abgeleiteten Caches geteilt werden.
+    Für Bilder werden gleich die verkleinerten Varianten für die Anzeige erzeugt (`Module.bildvarianten`).
 
     Args:
         uploaded_file (streamlit.runtime.uploaded_file_manager.UploadedFile):
             Das von st.file_uploader erhaltene Dateiobjekt.
-        file_prefix (str): Ein Präfix für den Dateinamen (z.B. "img", "gpx").
-        workout_name (str): Der Name des Workouts, um den Dateinamen aussagekräftiger zu machen.
+        file_prefix (str): Ein Präfix für den Dateityp (z.B. "img", "gpx"); nur noch für Meldungen verwendet.
+        workout_name (str): Der Name des Workouts; nur noch für Meldungen verwendet.
 
     Returns:
         str or None: Der Pfad zur gespeicherten Datei (mit Forward-Slashes) oder None, wenn keine Datei hochgeladen wurde.
     """
     if uploaded_file is not None:
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         file_extension = uploaded_file.name.split(".")[-1]
-        safe_name = workout_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
-        unique_filename = f"{safe_name}_{file_prefix}_{timestamp}.{file_extension}"
-        
-        # Originalpfad erstellen und dann normalisieren
-        raw_file_path = os.path.join(UPLOAD_DIR, unique_filename)
-        file_path = normalize_path_slashes(raw_file_path) 
-        
         try:
-            with open(raw_file_path, "wb") as f: 
-                f.write(uploaded_file.getbuffer())
-            return file_path 
+            uploaded_file.seek(0)
+            file_path, digest, existed = store_stream(uploaded_file, file_extension)
         except Exception as e:
             st.error(f"Fehler beim Speichern der Datei {uploaded_file.name}: {e}")
             return None
+        if file_prefix == "img" and not create_renditions(file_path, digest):
+            st.warning(f"Das Bild {uploaded_file.name} konnte nicht gelesen werden und wird in Originalgröße angezeigt.")
+        if existed:
+            st.info(f"Die Datei {uploaded_file.name} ({file_prefix}) für '{workout_name}' ist bereits vorhanden "
+                    f"und wird wiederverwendet.")
+        return file_path
     return None
 
 # --- Funktion zum Parsen von GPX-Dateien ---
@@ -169,7 +171,7 @@ def parse_fit_data(fit_file_path):
         return 0, 0.0, None, None, 0, 0.0, 0, 0
 
     try:
-        fitfile = FitFile(fit_file_path_os_native) 
+        fitfile = fitparse.FitFile(fit_file_path_os_native) 
         
         min_timestamp = None
         max_timestamp = None
@@ -484,6 +486,9 @@ def display_workout_form(initial_data=None, form_key_suffix="add"):
             display_fit_path = os.path.basename(st.session_state.get(f'{prefix}current_fit_path', '')) if st.session_state.get(f'{prefix}current_fit_path') else 'Keine FIT-Datei'
 
             st.markdown(f"**Aktuelles Bild:** {display_image_path}")
+            current_image_preview = rendition_path(st.session_state.get(f'{prefix}current_image_path'), 'thumb')
+            if current_image_preview:
+                st.image(current_image_preview)
             st.markdown(f"**Aktuelle GPX-Datei:** {display_gpx_path}")
             st.markdown(f"**Aktuelle EKG-Datei:** {display_ekg_path}")
             st.markdown(f"**Aktuelle FIT-Datei:** {display_fit_path}")
@@ -0,0 +1,139 @@
+import os
+import sys
+import inspect
+import hashlib
+from collections import OrderedDict
+import numpy as np
+import folium
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.trackdaten import simplify_track
+from Module.polyline import encode_polyline, EncodedPolyLine
+
+# --- Konfiguration & Konstanten ---
+MAP_CACHE_DIR = "map_cache"
+MAP_CACHE_VERSION = 2            # Erhöhen, wenn sich das Aussehen der Karten ändert
+MAP_SIMPLIFY_TOLERANCE_M = 3.0   # Bei dieser Toleranz ist die Vereinfachung auf der Karte nicht sichtbar
+MAX_CACHE_FILES = 500            # Älteste Karten werden darüber hinaus gelöscht
+MAX_MEMORY_ENTRIES = 32
+
+_memory_cache = OrderedDict()
+
+
+def track_hash(segments):
+    """
+    Berechnet einen Inhalts-Hash über die Koordinaten eines Tracks.
+    Ändert sich die GPX-/FIT-Datei eines Trainings, ändert sich auch der Hash,
+    wodurch veraltete Karten automatisch nicht mehr verwendet werden.
+
+    Args:
+        segments (list): Liste von (lat, lon)-Tupeln aus numpy.ndarray, eines pro Tracksegment.
+
+    Returns:
+        str: SHA-1-Hash als Hex-String.
+    """
+    digest = hashlib.sha1()
+    for lat, lon in segments:
+        digest.update(np.ascontiguousarray(lat, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(lon, dtype=np.float64).tobytes())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+
+def build_track_map(segments, color, tolerance_m=MAP_SIMPLIFY_TOLERANCE_M):
+    """
+    Erstellt die Folium-Karte eines Tracks. Jedes Segment wird vorher mit Douglas-Peucker vereinfacht
+    und als Encoded Polyline eingebettet, die erst im Browser dekodiert wird.
+
+    Args:
+        segments (list): Liste von (lat, lon)-Tupeln aus numpy.ndarray.
+        color (str): Linienfarbe.
+        tolerance_m (float, optional): Vereinfachungstoleranz in Metern.
+
+    Returns:
+        folium.Map: Die Karte, auf den Track gezoomt.
+    """
+    first_lat, first_lon = segments[0][0][0], segments[0][1][0]
+    m = folium.Map(location=[float(first_lat), float(first_lon)], zoom_start=13)
+    for lat, lon in segments:
+        keep = simplify_track(lat, lon, tolerance_m)
+        EncodedPolyLine(encode_polyline(lat[keep], lon[keep]), color=color, weight=2.5, opacity=1).add_to(m)
+    all_lat = np.concatenate([lat for lat, _ in segments])
+    all_lon = np.concatenate([lon for _, lon in segments])
+    m.fit_bounds([[float(all_lat.min()), float(all_lon.min())], [float(all_lat.max()), float(all_lon.max())]])
+    return m
+
+
+def _remember(key, html):
+    _memory_cache[key] = html
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MAX_MEMORY_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+
+def prune_map_cache(max_files=MAX_CACHE_FILES):
+    """
+    Löscht die ältesten Karten, wenn der Cache mehr als `max_files` Dateien enthält.
+
+    Args:
+        max_files (int, optional): Maximale Anzahl gespeicherter Karten.
+
+    Returns:
+        int: Anzahl der gelöschten Dateien.
+    """
+    if not os.path.isdir(MAP_CACHE_DIR):
+        return 0
+    entries = [e for e in os.scandir(MAP_CACHE_DIR) if e.is_file() and e.name.endswith(".html")]
+    if len(entries) <= max_files:
+        return 0
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    removed = 0
+    for entry in entries[:len(entries) - max_files]:
+        try:
+            os.remove(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def get_track_map_html(segments, color, tolerance_m=MAP_SIMPLIFY_TOLERANCE_M):
+    """
+    Liefert das fertig gerenderte HTML der Karte eines Tracks. Das HTML wird pro
+    Track-Hash, Vereinfachungsstufe und Darstellung auf der Festplatte abgelegt und
+    zusätzlich im Speicher gehalten, sodass es über Reruns und Sessions wiederverwendet wird.
+
+    Args:
+        segments (list): Liste von (lat, lon)-Tupeln aus numpy.ndarray, eines pro Tracksegment.
+        color (str): Linienfarbe.
+        tolerance_m (float, optional): Vereinfachungstoleranz in Metern.
+
+    Returns:
+        str: Das vollständige HTML-Dokument der Karte.
+    """
+    key = f"{track_hash(segments)}_{tolerance_m:g}_{color}_v{MAP_CACHE_VERSION}"
+    if key in _memory_cache:
+        _memory_cache.move_to_end(key)
+        return _memory_cache[key]
+
+    cache_path = os.path.join(MAP_CACHE_DIR, f"{key}.html")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            html = f.read()
+        os.utime(cache_path) # als zuletzt benutzt markieren
+        _remember(key, html)
+        return html
+
+    m = build_track_map(segments, color, tolerance_m)
+    html = folium.Figure().add_child(m).render()
+    os.makedirs(MAP_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp_path, cache_path)
+    prune_map_cache()
+    _remember(key, html)
+    return html
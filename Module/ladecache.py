@@ -0,0 +1,200 @@
+import os
+import sys
+import inspect
+import threading
+from collections import OrderedDict
+import streamlit as st
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.utils import lazy_import
+from Module.dateiablage import content_hash, is_store_path
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# --- Konfiguration & Konstanten ---
+LOADER_CACHE_MB = 256     # Speicherbudget aller geladenen Dateien (prozessweit, über alle Sitzungen)
+OBJECT_SIZE_FACTOR = 5    # Geschätzter Speicherbedarf von Objektbäumen (z.B. gpxpy) relativ zur Dateigröße
+
+
+def file_key(file_path):
+    """
+    Liefert den Cache-Schlüssel einer Datei: den Inhalts-Hash bei Dateien der Ablage (steht im Namen),
+    sonst (Pfad, Größe, Änderungszeit). Eine ersetzte oder geänderte Datei erhält damit einen neuen Schlüssel.
+
+    Args:
+        file_path (str): Dateipfad.
+
+    Returns:
+        tuple or None: Der Schlüssel oder None, wenn die Datei nicht existiert.
+    """
+    if not file_path or not os.path.exists(file_path):
+        return None
+    if is_store_path(file_path):
+        return ('sha256', content_hash(file_path))
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def estimate_size(value, file_path=None):
+    """
+    Schätzt den Speicherbedarf eines geladenen Objekts in Bytes.
+
+    Args:
+        value: DataFrame, Series, Array, dict/list/tuple daraus oder ein beliebiges Objekt.
+        file_path (str, optional): Quelldatei; dient bei unbekannten Objekten als Schätzgrundlage.
+
+    Returns:
+        int: Geschätzte Größe in Bytes.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(deep=True).sum()) if isinstance(value, pd.DataFrame) else int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(item) for item in value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return sys.getsizeof(value)
+    if file_path and os.path.exists(file_path):
+        return os.path.getsize(file_path) * OBJECT_SIZE_FACTOR
+    return sys.getsizeof(value)
+
+
+def _freeze(value):
+    """Macht Arrays im zwischengespeicherten Objekt schreibgeschützt."""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+def _hand_out(value):
+    """
+    Gibt ein zwischengespeichertes Objekt heraus. Tabellen werden kopiert (Spalten hinzufügen oder Werte
+    überschreiben verändert so nie den Cache), Arrays sind schreibgeschützt, andere Objekte werden geteilt.
+    """
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {name: _hand_out(item) for name, item in value.items()}
+    if isinstance(value, tuple):
+        return tuple(_hand_out(item) for item in value)
+    if isinstance(value, list):
+        return [_hand_out(item) for item in value]
+    return value
+
+
+class LoaderCache:
+    """
+    LRU-Cache für geparste Dateien mit Speicherbudget. Wird der Platz knapp, fallen die am längsten
+    nicht verwendeten Einträge heraus. Lädt dieselbe Datei in zwei Sitzungen gleichzeitig, wartet
+    die zweite auf das Ergebnis der ersten.
+    """
+
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # Schlüssel -> (Objekt, Größe)
+        self._lock = threading.Lock()
+        self._loading = {}             # Schlüssel -> Lock des laufenden Ladevorgangs
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self.used_bytes -= self._entries.pop(key)[1]
+            if size > self.budget_bytes:
+                return
+            self._entries[key] = (value, size)
+            self.used_bytes += size
+            while self.used_bytes > self.budget_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.used_bytes -= evicted_size
+
+    def load(self, key, loader, size_of):
+        """
+        Liefert den Eintrag zu `key` oder lädt ihn mit `loader()` (None wird nicht gespeichert,
+        damit Fehlermeldungen beim nächsten Aufruf wieder erscheinen).
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        with self._lock:
+            key_lock = self._loading.setdefault(key, threading.Lock())
+        with key_lock:
+            value = self.get(key)
+            if value is not None:
+                return value
+            with self._lock:
+                self.misses += 1
+            try:
+                value = loader()
+                if value is not None:
+                    self.put(key, _freeze(value), size_of(value))
+            finally:
+                with self._lock:
+                    self._loading.pop(key, None)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {'eintraege': len(self._entries), 'belegt_mb': round(self.used_bytes / 2**20, 1),
+                    'budget_mb': round(self.budget_bytes / 2**20, 1), 'treffer': self.hits, 'fehlgriffe': self.misses}
+
+
+@st.cache_resource(show_spinner=False)
+def get_loader_cache():
+    """
+    Der gemeinsame Cache des Prozesses. Über `st.cache_resource` teilen sich alle Sitzungen dieselben
+    geladenen Objekte (ohne Kopie beim Zugriff) und er wird mit "Clear cache" geleert.
+
+    Returns:
+        LoaderCache: Der Cache mit dem Budget `LOADER_CACHE_MB`.
+    """
+    return LoaderCache(LOADER_CACHE_MB * 2**20)
+
+
+def cached_load(kind, file_path, loader):
+    """
+    Lädt eine Datei über den gemeinsamen Cache. Schlüssel ist (Art, `file_key`), sodass verschiedene
+    Auswertungen derselben Datei nebeneinander liegen und eine geänderte Datei neu geladen wird.
+
+    Args:
+        kind (str): Art der Auswertung, z.B. 'fit_records' oder 'gpx'.
+        file_path (str): Dateipfad.
+        loader (callable): Lädt die Datei: loader(file_path) -> Objekt oder None.
+
+    Returns:
+        Das geladene Objekt (DataFrames als eigene Kopie, siehe `_hand_out`) oder None.
+    """
+    key = file_key(file_path)
+    if key is None:
+        return loader(file_path)
+    value = get_loader_cache().load((kind, key), lambda: loader(file_path),
+                                    lambda loaded: estimate_size(loaded, file_path))
+    return _hand_out(value)
@@ -0,0 +1,214 @@
+import os
+import sys
+import time
+import inspect
+import functools
+from contextlib import contextmanager, nullcontext
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.utils import lazy_import
+
+# Streamlit und Plotly werden erst gebraucht, wenn die Messung eingeschaltet ist
+# (das Modul wird auch von der Datenbank und den Hintergrund-Workern importiert)
+st = lazy_import("streamlit")
+go = lazy_import("plotly.graph_objects")
+
+# --- Konfiguration & Konstanten ---
+PROFILING_ENV = "TRAININGSTAGEBUCH_PROFIL"   # =1: Messung für alle Sitzungen
+PROFILING_QUERY_PARAM = "profil"             # ?profil=1: Messung für die eigene Sitzung
+SESSION_KEY = "_laufzeitprofil"
+STATS_SESSION_KEY = "_laufzeitprofil_statistik"
+MAX_WATERFALL_SPANS = 150                    # Längere Durchläufe werden im Wasserfall gekürzt
+
+# Sitzungen mit eingeschalteter Messung. Ist die Menge leer (Normalfall), kosten `span` und
+# `timed` nur diese eine Abfrage.
+_active_sessions = set()
+_NO_SPAN = nullcontext()
+
+
+class Laufzeitprofil:
+    """
+    Messpunkte eines Seitendurchlaufs (Rerun): Startzeit relativ zum Beginn, Dauer und
+    Verschachtelungstiefe. Jede Messung fließt zusätzlich in die Gesamtstatistik der Sitzung ein.
+    """
+
+    def __init__(self, page, stats):
+        self.page = page
+        self.started = time.perf_counter()
+        self.spans = []
+        self.depth = 0
+        self.stats = stats  # Name -> {'aufrufe', 'gesamt_ms', 'max_ms'}
+
+    def record(self, name, start, duration, depth):
+        duration_ms = duration * 1000
+        self.spans.append({'name': name, 'start_ms': (start - self.started) * 1000,
+                           'dauer_ms': duration_ms, 'ebene': depth})
+        entry = self.stats.setdefault(name, {'aufrufe': 0, 'gesamt_ms': 0.0, 'max_ms': 0.0})
+        entry['aufrufe'] += 1
+        entry['gesamt_ms'] += duration_ms
+        entry['max_ms'] = max(entry['max_ms'], duration_ms)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+
+def _current_profile():
+    """Das Profil der laufenden Sitzung oder None (Messung aus, Hintergrund-Thread ohne Sitzung)."""
+    if not _active_sessions:
+        return None
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or ctx.session_id not in _active_sessions:
+        return None
+    return st.session_state.get(SESSION_KEY)
+
+
+@contextmanager
+def _measure(profile, name):
+    depth = profile.depth
+    profile.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.depth = depth
+        profile.record(name, start, time.perf_counter() - start, depth)
+
+
+def span(name):
+    """
+    Misst einen Abschnitt: `with span("folium: Heatmap"): ...`. Ist die Messung aus, wird ein
+    leerer Kontext zurückgegeben.
+
+    Args:
+        name (str): Bezeichnung im Wasserfall und in der Statistik.
+
+    Returns:
+        Kontextmanager.
+    """
+    profile = _current_profile()
+    if profile is None:
+        return _NO_SPAN
+    return _measure(profile, name)
+
+
+def timed(name=None):
+    """
+    Dekorator: misst jeden Aufruf der Funktion als eigenen Abschnitt. Bei `st.cache_data`-Funktionen
+    über den Cache-Dekorator setzen, dann erscheinen auch Cache-Treffer (mit ihrer kurzen Dauer).
+
+    Args:
+        name (str, optional): Bezeichnung; Standard ist der qualifizierte Funktionsname.
+
+    Returns:
+        callable: Der Dekorator.
+    """
+    def decorator(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = _current_profile()
+            if profile is None:
+                return func(*args, **kwargs)
+            with _measure(profile, label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_enabled():
+    """
+    Prüft, ob für die aktuelle Sitzung gemessen werden soll (Umgebungsvariable `PROFILING_ENV`
+    oder URL-Parameter `?profil=1`).
+
+    Returns:
+        bool: True, wenn die Messung eingeschaltet ist.
+    """
+    return os.environ.get(PROFILING_ENV) == "1" or st.query_params.get(PROFILING_QUERY_PARAM) == "1"
+
+
+@contextmanager
+def profiled_rerun(page):
+    """
+    Umschließt den Durchlauf einer Seite: `with profiled_rerun("Trainingsliste"): main()`.
+    Ist die Messung eingeschaltet, sammelt der Durchlauf seine Abschnitte und zeigt am Ende das
+    Debug-Panel (`display_profile_ui`). Bricht der Durchlauf ab (z.B. `st.rerun`), entfällt das Panel.
+
+    Args:
+        page (str): Name der Seite.
+
+    Yields:
+        Laufzeitprofil or None: Das Profil des Durchlaufs (None bei ausgeschalteter Messung).
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx(suppress_warning=True)
+    if ctx is None or not is_enabled():
+        if ctx is not None:
+            _active_sessions.discard(ctx.session_id)
+        yield None
+        return
+    if STATS_SESSION_KEY not in st.session_state:
+        st.session_state[STATS_SESSION_KEY] = {}
+    profile = Laufzeitprofil(page, st.session_state[STATS_SESSION_KEY])
+    st.session_state[SESSION_KEY] = profile
+    _active_sessions.add(ctx.session_id)
+    yield profile
+    display_profile_ui(profile)
+
+
+def create_waterfall_figure(spans, total_ms):
+    """
+    Erstellt den Wasserfall eines Durchlaufs: ein Balken je Abschnitt, eingerückt nach Verschachtelung.
+
+    Args:
+        spans (list): Abschnitte aus `Laufzeitprofil.spans`.
+        total_ms (float): Gesamtdauer des Durchlaufs.
+
+    Returns:
+        plotly.graph_objects.Figure: Das Diagramm.
+    """
+    spans = sorted(spans, key=lambda s: s['start_ms'])
+    labels = [f"{i + 1:>3}. {'· ' * s['ebene']}{s['name']}" for i, s in enumerate(spans)]
+    fig = go.Figure(go.Bar(
+        y=labels, x=[s['dauer_ms'] for s in spans], base=[s['start_ms'] for s in spans], orientation='h',
+        marker_color=[s['ebene'] for s in spans], marker_colorscale="Viridis",
+        hovertemplate="%{y}<br>Start: %{base:.1f} ms<br>Dauer: %{x:.1f} ms<extra></extra>"))
+    fig.update_layout(height=80 + 22 * len(spans), margin=dict(l=10, r=10, t=30, b=30),
+                      xaxis_title="ms seit Beginn des Durchlaufs", xaxis_range=[0, total_ms],
+                      yaxis_autorange="reversed", showlegend=False)
+    return fig
+
+
+def display_profile_ui(profile):
+    """
+    Debug-Panel am Ende der Seite: Wasserfall des letzten Durchlaufs und die Gesamtstatistik der Sitzung.
+
+    Args:
+        profile (Laufzeitprofil): Das Profil des laufenden Durchlaufs.
+
+    Returns:
+        None: Die Funktion rendert das Panel direkt in der Streamlit-Anwendung.
+    """
+    total_ms = profile.elapsed_ms()
+    spans = profile.spans
+    st.markdown("---")
+    with st.expander(f"⏱️ Laufzeitprofil {profile.page}: {total_ms:.0f} ms, {len(spans)} Messpunkt(e)"):
+        if not spans:
+            st.info("In diesem Durchlauf wurden keine Messpunkte erfasst.")
+        else:
+            if len(spans) > MAX_WATERFALL_SPANS:
+                st.caption(f"Wasserfall zeigt die ersten {MAX_WATERFALL_SPANS} von {len(spans)} Messpunkten.")
+            st.plotly_chart(create_waterfall_figure(spans[:MAX_WATERFALL_SPANS], total_ms),
+                            use_container_width=True, key="laufzeitprofil_wasserfall")
+
+        st.markdown("**Gesamtstatistik dieser Sitzung** (inkl. Fragment-Durchläufe)")
+        rows = [{'Abschnitt': name, 'Aufrufe': entry['aufrufe'], 'Gesamt (ms)': round(entry['gesamt_ms'], 1),
+                 'Mittel (ms)': round(entry['gesamt_ms'] / entry['aufrufe'], 1), 'Max (ms)': round(entry['max_ms'], 1)}
+                for name, entry in sorted(profile.stats.items(), key=lambda item: item[1]['gesamt_ms'], reverse=True)]
+        if rows:
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+        st.button("Statistik zurücksetzen", key="laufzeitprofil_reset", on_click=profile.stats.clear)
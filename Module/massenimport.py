@@ -0,0 +1,333 @@
+import os
+import sys
+import time
+import zipfile
+import hashlib
+import inspect
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.datenbank import open_table, transaction
+from Module.utils import normalize_path_slashes
+from Module.dateiablage import store_bytes, content_hash, is_store_path
+from Module.zusammenfassung import training_contribution, add_training_to_summary
+
+# --- Konfiguration & Konstanten ---
+BATCH_SIZE = 100            # Trainings pro Schreibtransaktion
+EKG_SAMPLE_RATE_HZ = 500    # Abtastrate der EKG-Dateien (siehe data/ekg/ReadMe.txt)
+FILE_FIELD = {'fit': "fit_file", 'gpx': "gpx_file", 'ekg': "ekg_file"}
+
+
+# --- Erkennung & Quellen ---
+
+def detect_file_type(filename, data):
+    """
+    Erkennt den Dateityp am Inhalt (die Endung allein ist bei Archiven oft unzuverlässig).
+
+    Args:
+        filename (str): Dateiname (für die Endung als Hinweis).
+        data (bytes): Dateiinhalt.
+
+    Returns:
+        str or None: 'fit', 'gpx', 'ekg' oder None, wenn die Datei nicht importiert werden kann.
+    """
+    if len(data) >= 12 and data[8:12] == b".FIT":
+        return 'fit'
+    head = data[:4096].decode('utf-8', errors='ignore')
+    if "<gpx" in head:
+        return 'gpx'
+    if filename.lower().endswith(('.txt', '.csv')):
+        # EKG: Zeilen mit Messwert und Zeitstempel (siehe data/ekg)
+        first_line = next((line for line in head.splitlines() if line.strip()), "")
+        values = first_line.replace(';', ' ').replace(',', ' ').split()
+        if len(values) == 2 and all(value.lstrip('-').replace('.', '', 1).isdigit() for value in values):
+            return 'ekg'
+    return None
+
+
+def _iter_sources(path):
+    """
+    Liefert (Anzeigename, Dateiname, Inhalt, Änderungszeit) für alle Dateien eines Verzeichnisses
+    (rekursiv) oder ZIP-Archivs. Die Inhalte werden einzeln gelesen, nie das ganze Archiv auf einmal.
+    """
+    if not isinstance(path, str) or zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                yield info.filename, os.path.basename(info.filename), archive.read(info), datetime(*info.date_time)
+        return
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for filename in sorted(files):
+            file_path = os.path.join(root, filename)
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            yield normalize_path_slashes(file_path), filename, data, datetime.fromtimestamp(os.path.getmtime(file_path))
+
+
+def _file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _known_hashes(trainings, sizes):
+    """
+    Sammelt die Inhalts-Hashes der vorhandenen Trainings. Bei Dateien in der Dateiablage steht der Hash
+    im Namen; ältere Dateien werden nur gehasht, wenn die Größe zu einer Importdatei passt.
+    """
+    hashes = set()
+    for training in trainings:
+        if training.get('source_hash'):
+            hashes.add(training['source_hash'])
+            continue
+        for field in FILE_FIELD.values():
+            file_path = training.get(field)
+            if is_store_path(file_path):
+                hashes.add(content_hash(file_path))
+            elif file_path and os.path.exists(file_path) and os.path.getsize(file_path) in sizes:
+                hashes.add(content_hash(file_path))
+    return hashes
+
+
+def _store_file(filename, data):
+    """Legt die Datei inhaltsadressiert in der Dateiablage ab; die Endung bestimmt, wie sie später gelesen wird."""
+    return store_bytes(data, os.path.splitext(filename)[1])[0]
+
+
+# --- Auswertung (läuft in den Worker-Prozessen) ---
+
+def _read_ekg_summary(ekg_path):
+    """Bestimmt die Dauer einer EKG-Aufzeichnung aus dem ersten und letzten Zeitstempel (in ms)."""
+    with open(ekg_path, 'r') as f:
+        lines = [line.split() for line in f if line.strip()]
+    if len(lines) < 2:
+        return 0
+    try:
+        duration_ms = float(lines[-1][1]) - float(lines[0][1])
+    except (IndexError, ValueError):
+        duration_ms = len(lines) / EKG_SAMPLE_RATE_HZ * 1000
+    return int(duration_ms / 60000)
+
+
+def _gpx_sport(gpx_path):
+    import gpxpy
+    with open(gpx_path, 'r') as f:
+        gpx = gpxpy.parse(f)
+    for track in gpx.tracks:
+        if track.type:
+            return str(track.type).replace('_', ' ').title()
+    return None
+
+
+def parse_import_file(kind, file_path, filename, modified):
+    """
+    Wertet eine Datei aus und baut daraus ein Trainings-Dokument wie das Formular in "Workout hinzufügen".
+    Läuft in einem Worker-Prozess; berechnet auch den Beitrag zur Zusammenfassung, damit der
+    Hauptprozess beim Schreiben keine Dateien mehr öffnen muss.
+
+    Args:
+        kind (str): 'fit', 'gpx' oder 'ekg'.
+        file_path (str): Pfad der abgelegten Datei im Upload-Verzeichnis.
+        filename (str): Ursprünglicher Dateiname (für den Trainingsnamen).
+        modified (datetime): Änderungszeit der Datei (Datum, wenn die Datei keines enthält).
+
+    Returns:
+        tuple: (Trainings-Dokument, Beitrag zur Zusammenfassung).
+
+    Raises:
+        ValueError: Wenn die Datei keine verwertbaren Daten enthält.
+    """
+    from Module.hilfsfunktionenedittraining import parse_fit_data, parse_gpx_data
+
+    training = {
+        "name": os.path.splitext(filename)[0].replace('_', ' ').strip(),
+        "date": modified.strftime("%Y-%m-%d"),
+        "sportart": "Unbekannt",
+        "dauer": 0,
+        "distanz": 0.0,
+        "puls": 0,
+        "kalorien": 0,
+        "anstrengung": None,
+        "star_rating": 0,
+        "description": f"Importiert aus {filename}",
+        "image": None,
+        "gpx_file": None,
+        "ekg_file": None,
+        "fit_file": None,
+        "avg_speed_kmh": 0.0,
+        "elevation_gain_pos": 0,
+        "elevation_gain_neg": 0,
+    }
+    training[FILE_FIELD[kind]] = file_path
+
+    if kind == 'fit':
+        duration, distance, start_date, sport, puls, avg_speed, elev_pos, elev_neg = parse_fit_data(file_path)
+        if start_date is None and distance == 0.0:
+            raise ValueError("FIT-Datei enthält keine Aufzeichnung.")
+        training.update({"sportart": sport or training["sportart"], "puls": puls})
+    elif kind == 'gpx':
+        result = parse_gpx_data(file_path)
+        if len(result) != 6:
+            raise ValueError("GPX-Datei konnte nicht gelesen werden.")
+        duration, distance, start_date, avg_speed, elev_pos, elev_neg = result
+        training["sportart"] = _gpx_sport(file_path) or training["sportart"]
+    else:
+        duration, distance, start_date, avg_speed, elev_pos, elev_neg = _read_ekg_summary(file_path), 0.0, None, 0.0, 0, 0
+        training["sportart"] = "EKG"
+
+    training.update({
+        "dauer": duration,
+        "distanz": round(distance, 2),
+        "avg_speed_kmh": round(avg_speed or 0.0, 2),
+        "elevation_gain_pos": elev_pos,
+        "elevation_gain_neg": elev_neg,
+    })
+    if start_date:
+        training["date"] = start_date.strftime("%Y-%m-%d")
+    return training, training_contribution(training)
+
+
+# --- Import ---
+
+def update_derived_data(training_id, training, person_id):
+    """Streckenerkennung, Heatmap und Segmente wie beim Hinzufügen über das Formular. Liefert Warnungen."""
+    from Module.streckenerkennung import get_routen_index
+    from Module.heatmap import PersonalHeatmap
+    from Module.segmente import match_training_against_segments
+
+    warnings = []
+    for label, update in (("Streckenerkennung", lambda: get_routen_index().add_training(training_id, training, person_id)),
+                          ("Heatmap", lambda: PersonalHeatmap(person_id).add_training(training_id, training)),
+                          ("Segmente", lambda: match_training_against_segments(training_id, training, person_id))):
+        try:
+            update()
+        except Exception as e:
+            warnings.append(f"{label}: {e}")
+    return warnings
+
+
+def _write_batch(batch, person_id, trainings_db, persons_db):
+    """Schreibt Trainings, Verknüpfung und Zusammenfassung eines Stapels in einem Commit."""
+    with transaction():
+        ids = trainings_db.insert_multiple([training for _, training, _ in batch])
+        persons_db.update(lambda person: person.setdefault('ekg_tests', []).extend(ids), doc_ids=[person_id])
+        for training_id, (_, training, contribution) in zip(ids, batch):
+            add_training_to_summary(person_id, training_id, training, contribution)
+    return ids
+
+
+def import_trainings(path, person_id, workers=None, update_derived=True, progress=None):
+    """
+    Importiert alle FIT-, GPX- und EKG-Dateien eines Verzeichnisses oder ZIP-Archivs als Trainings
+    einer Person. Dateitypen werden am Inhalt erkannt, Duplikate (gleicher Inhalt wie eine bereits
+    importierte Datei oder eine Datei desselben Imports) übersprungen. Die Dateien werden parallel in
+    einem Prozesspool ausgewertet und stapelweise in je einer Transaktion gespeichert.
+
+    Args:
+        path (str or file): Verzeichnis, ZIP-Datei oder ein ZIP-Dateiobjekt (z.B. aus st.file_uploader).
+        person_id (int): Die doc_id der Person.
+        workers (int, optional): Anzahl Worker-Prozesse (Standard: Anzahl CPU-Kerne).
+        update_derived (bool, optional): Streckenerkennung, Heatmap und Segmente mitaktualisieren.
+        progress (callable, optional): Wird mit (erledigt, gesamt) aufgerufen.
+
+    Returns:
+        dict: 'dateien' (je Datei: datei, typ, status, training_id, meldung), 'importiert',
+              'dauer_s', 'dateien_pro_s' und 'mb_pro_s'.
+
+    Raises:
+        ValueError: Wenn die Person nicht existiert.
+    """
+    person_id = int(person_id)
+    trainings_db = open_table('dbtests.json')
+    persons_db = open_table('dbperson.json')
+    if persons_db.get(doc_id=person_id) is None:
+        raise ValueError(f"Person mit ID {person_id} nicht gefunden.")
+    start = time.perf_counter()
+
+    # 1. Dateien lesen, Typ erkennen und ablegen; Duplikate per Inhalts-Hash aussortieren
+    results, candidates = [], []
+    total_bytes = 0
+    for label, filename, data, modified in _iter_sources(path):
+        total_bytes += len(data)
+        kind = detect_file_type(filename, data)
+        result = {'datei': label, 'typ': kind, 'status': "übersprungen", 'training_id': None, 'meldung': ""}
+        results.append(result)
+        if kind is None:
+            result['meldung'] = "Kein FIT-, GPX- oder EKG-Format erkannt."
+            continue
+        candidates.append((result, filename, data, modified))
+
+    known = _known_hashes(trainings_db.search_by_person(person_id), {len(data) for _, _, data, _ in candidates})
+    jobs = []
+    for result, filename, data, modified in candidates:
+        digest = _file_hash(data)
+        if digest in known:
+            result.update(status="Duplikat", meldung="Gleiche Datei wurde bereits importiert.")
+            continue
+        known.add(digest)
+        jobs.append((result, digest, (result['typ'], _store_file(filename, data), filename, modified)))
+
+    # 2. Parallel auswerten ("spawn": keine Kopie der Streamlit-Threads im Worker), 3. stapelweise schreiben
+    imported = 0
+    if jobs:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=context) as pool:
+            futures = [pool.submit(parse_import_file, *args) for _, _, args in jobs]
+            batch, derived = [], []
+            for done, ((result, digest, _), future) in enumerate(zip(jobs, futures), start=1):
+                try:
+                    training, contribution = future.result()
+                    training['source_hash'] = digest
+                    batch.append((result, training, contribution))
+                except Exception as e:
+                    result.update(status="Fehler", meldung=str(e))
+                if len(batch) >= BATCH_SIZE or (done == len(jobs) and batch):
+                    for training_id, (batch_result, _, _) in zip(_write_batch(batch, person_id, trainings_db, persons_db), batch):
+                        batch_result.update(status="importiert", training_id=training_id)
+                    if update_derived:
+                        # Die Indizes sind per Dateisperre prozesssicher und werden ebenfalls parallel aktualisiert
+                        derived += [(batch_result, pool.submit(update_derived_data, batch_result['training_id'],
+                                                               training, person_id))
+                                    for batch_result, training, _ in batch]
+                    imported += len(batch)
+                    batch = []
+                if progress is not None:
+                    progress(done, len(jobs))
+            for result, future in derived:
+                try:
+                    result['meldung'] = "; ".join(future.result())
+                except Exception as e:
+                    result['meldung'] = str(e)
+
+    elapsed = time.perf_counter() - start
+    return {
+        'dateien': results,
+        'importiert': imported,
+        'dauer_s': round(elapsed, 2),
+        'dateien_pro_s': round(len(results) / elapsed, 1) if elapsed > 0 else 0.0,
+        'mb_pro_s': round(total_bytes / 1e6 / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importiert FIT-/GPX-/EKG-Dateien eines Verzeichnisses oder ZIP-Archivs.")
+    parser.add_argument("pfad", help="Verzeichnis (z.B. data/fitfiles) oder ZIP-Archiv")
+    parser.add_argument("--person", type=int, required=True, help="doc_id der Person")
+    parser.add_argument("--worker", type=int, default=None, help="Anzahl Worker-Prozesse")
+    parser.add_argument("--ohne-abgeleitete", action="store_true",
+                        help="Streckenerkennung, Heatmap und Segmente nicht aktualisieren")
+    args = parser.parse_args()
+
+    report = import_trainings(args.pfad, args.person, workers=args.worker, update_derived=not args.ohne_abgeleitete)
+    for entry in report['dateien']:
+        training = f" -> Training {entry['training_id']}" if entry['training_id'] else ""
+        message = f" ({entry['meldung']})" if entry['meldung'] else ""
+        print(f"{entry['status']:>12}  {entry['datei']}{training}{message}")
+    print(f"{report['importiert']} Training(e) importiert in {report['dauer_s']} s "
+          f"({report['dateien_pro_s']} Dateien/s, {report['mb_pro_s']} MB/s).")
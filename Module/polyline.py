@@ -0,0 +1,130 @@
+import json
+import numpy as np
+from branca.element import Element, MacroElement
+from folium.template import Template
+from folium.vector_layers import path_options
+
+# Google Encoded Polyline Algorithm: 5 Nachkommastellen entsprechen ca. 1 m Genauigkeit
+POLYLINE_PRECISION = 5
+_MAX_CHUNKS = 7  # 32-Bit-Werte (nach Zickzack-Kodierung) benötigen höchstens 7 Blöcke à 5 Bit
+
+# Dekodierer im Browser; wird pro Karte nur einmal in den <head> eingebettet
+_DECODER_JS = """
+<script>
+function decodePolyline(encoded, precision) {
+    var factor = Math.pow(10, precision);
+    var points = [];
+    var index = 0, lat = 0, lng = 0;
+    while (index < encoded.length) {
+        var deltas = [0, 0];
+        for (var k = 0; k < 2; k++) {
+            var result = 0, shift = 0, b;
+            do {
+                b = encoded.charCodeAt(index++) - 63;
+                result |= (b & 0x1f) << shift;
+                shift += 5;
+            } while (b >= 0x20);
+            deltas[k] = (result & 1) ? ~(result >> 1) : (result >> 1);
+        }
+        lat += deltas[0];
+        lng += deltas[1];
+        points.push([lat / factor, lng / factor]);
+    }
+    return points;
+}
+</script>
+"""
+
+
+def encode_polyline(lat, lon, precision=POLYLINE_PRECISION):
+    """
+    Kodiert einen Track als Google Encoded Polyline. Die Koordinaten werden quantisiert,
+    als Differenzen zum Vorgänger gespeichert und in 5-Bit-Blöcken als ASCII-Zeichen abgelegt
+    (vektorisiert über alle Punkte).
+
+    Args:
+        lat (array-like): Breitengrade in Grad.
+        lon (array-like): Längengrade in Grad.
+        precision (int, optional): Anzahl der Nachkommastellen.
+
+    Returns:
+        str: Der kodierte Track.
+    """
+    factor = 10 ** precision
+    coords = np.column_stack((np.round(np.asarray(lat, dtype=float) * factor),
+                              np.round(np.asarray(lon, dtype=float) * factor))).astype(np.int64)
+    if len(coords) == 0:
+        return ""
+    deltas = np.diff(coords, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+
+    # Zickzack-Kodierung: negative Werte werden auf ungerade, positive auf gerade Zahlen abgebildet
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1).astype(np.uint64)
+    shifts = np.arange(_MAX_CHUNKS, dtype=np.uint64) * np.uint64(5)
+    chunks = (values[:, None] >> shifts[None, :]) & np.uint64(0x1f)
+    n_chunks = 1 + np.sum((values[:, None] >> shifts[None, 1:]) > 0, axis=1)
+    chunk_index = np.arange(_MAX_CHUNKS)[None, :]
+    # Alle Blöcke außer dem letzten eines Werts tragen das Fortsetzungsbit 0x20
+    chunks = chunks | np.where(chunk_index < (n_chunks[:, None] - 1), np.uint64(0x20), np.uint64(0))
+    used = chunk_index < n_chunks[:, None]
+    return (chunks[used].astype(np.uint8) + 63).tobytes().decode("ascii")
+
+
+def decode_polyline(encoded, precision=POLYLINE_PRECISION):
+    """
+    Dekodiert eine Google Encoded Polyline (Gegenstück zu `encode_polyline`).
+
+    Args:
+        encoded (str): Der kodierte Track.
+        precision (int, optional): Anzahl der Nachkommastellen.
+
+    Returns:
+        tuple: (lat, lon) als numpy.ndarray.
+    """
+    data = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    # Ein Wert endet bei jedem Block ohne Fortsetzungsbit
+    ends = np.flatnonzero(data < 0x20)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    position = np.arange(len(data)) - np.repeat(starts, ends - starts + 1)
+    values = np.add.reduceat((data & 0x1f) << (5 * position), starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    coords = np.cumsum(deltas.reshape(-1, 2), axis=0) / 10 ** precision
+    return coords[:, 0], coords[:, 1]
+
+
+class EncodedPolyLine(MacroElement):
+    """
+    Folium-Linie, deren Koordinaten als Encoded Polyline in die Karte eingebettet und erst
+    im Browser dekodiert werden. Gegenüber `folium.PolyLine` (JSON-Listen mit vollen Floats)
+    schrumpft der Anteil des Tracks am HTML etwa um den Faktor 5 bis 10.
+
+    Args:
+        encoded (str): Ergebnis von `encode_polyline`.
+        precision (int, optional): Die beim Kodieren verwendete Genauigkeit.
+        **kwargs: Leaflet-Pfadoptionen wie bei `folium.PolyLine` (color, weight, opacity, ...).
+    """
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+            var {{ this.get_name() }} = L.polyline(
+                decodePolyline({{ this.encoded_js }}, {{ this.precision }}),
+                {{ this.options|tojavascript }}
+            ).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, encoded, precision=POLYLINE_PRECISION, **kwargs):
+        super().__init__()
+        self._name = "EncodedPolyLine"
+        self.encoded = encoded
+        # Branca kompiliert das gerenderte Skript erneut als Jinja-Template; geschweifte Klammern
+        # (im Polyline-Alphabet enthalten) müssen daher als Unicode-Escape im JS-String stehen.
+        self.encoded_js = json.dumps(encoded).replace("{", "\\u007b").replace("}", "\\u007d")
+        self.precision = int(precision)
+        self.options = path_options(line=True, **kwargs)
+
+    def render(self, **kwargs):
+        # Unter einem festen Namen eingefügt, damit der Dekodierer bei mehreren Linien nur einmal im HTML steht
+        self.get_root().header.add_child(Element(_DECODER_JS), name="polyline_decoder")
+        super().render(**kwargs)
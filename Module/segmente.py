@@ -0,0 +1,488 @@
+import os
+import sys
+import json
+import inspect
+import threading
+from datetime import datetime
+import numpy as np
+from tinydb.table import Document
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.trackdaten import (load_track_for_training, cumulative_distance_m, to_local_xy,
+                               resample_by_distance, simplify_track, bounding_box)
+from Module.streckenerkennung import get_routen_index
+from Module.datenbank import DB_PATH, get_connection, transaction, open_table
+from Module.laufzeitprofil import timed
+
+# --- Konfiguration & Konstanten ---
+SEGMENTE_JSON_PATH = 'dbsegmente.json'  # Frühere TinyDB-Datei, wird beim ersten Zugriff übernommen
+EKG_TESTS_DB_PATH = 'dbtests.json'
+
+START_END_RADIUS_M = 30.0        # Ein Track muss Start/Ziel so nahe kommen, um sie zu "überqueren"
+DEFAULT_CORRIDOR_M = 40.0        # Standardbreite (halbe Breite) des Segment-Korridors
+CORRIDOR_SAMPLE_STEP_M = 25.0    # Abtastschritt der Segmentlinie für die Korridorprüfung
+MIN_CORRIDOR_COVERAGE = 0.95     # Anteil der Segmentlinie, der im Korridor liegen muss
+MAX_LENGTH_RATIO = 1.3           # Zurückgelegte Distanz darf höchstens 30 % länger sein
+METERS_PER_DEGREE_LAT = 111320.0
+
+# Einzelne Anweisungen statt executescript(), das eine umgebende Transaktion vorzeitig bestätigen würde
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS segmente (
+        segment_id INTEGER PRIMARY KEY,
+        min_lat REAL NOT NULL,
+        min_lon REAL NOT NULL,
+        max_lat REAL NOT NULL,
+        max_lon REAL NOT NULL,
+        corridor_m REAL NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS segment_efforts (
+        segment_id INTEGER NOT NULL,
+        training_id INTEGER NOT NULL,
+        person_id INTEGER NOT NULL,
+        date TEXT,
+        start_time TEXT,
+        elapsed_s REAL NOT NULL,
+        distance_m REAL NOT NULL,
+        PRIMARY KEY (segment_id, training_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_segment_efforts_training ON segment_efforts(training_id)",
+    "CREATE INDEX IF NOT EXISTS idx_segment_efforts_person ON segment_efforts(segment_id, person_id, elapsed_s)",
+)
+_EFFORT_COLUMNS = ('segment_id', 'training_id', 'person_id', 'date', 'start_time', 'elapsed_s', 'distance_m')
+
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _conn(db_path):
+    conn = get_connection(db_path)
+    with _schema_lock:
+        if db_path not in _initialized_paths:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            if db_path == DB_PATH:
+                _migrate_json(db_path)
+            _initialized_paths.add(db_path)
+    return conn
+
+
+def _insert_segment(conn, segment_id, segment):
+    min_lat, min_lon, max_lat, max_lon = segment['bbox']
+    cursor = conn.execute("INSERT OR REPLACE INTO segmente (segment_id, min_lat, min_lon, max_lat, max_lon, corridor_m, data) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          (segment_id, min_lat, min_lon, max_lat, max_lon,
+                           segment.get('corridor_m', DEFAULT_CORRIDOR_M), json.dumps(segment)))
+    return cursor.lastrowid
+
+
+def _insert_efforts(conn, efforts):
+    conn.executemany(f"INSERT OR REPLACE INTO segment_efforts ({', '.join(_EFFORT_COLUMNS)}) "
+                     f"VALUES ({', '.join('?' * len(_EFFORT_COLUMNS))})",
+                     [tuple(effort.get(column) for column in _EFFORT_COLUMNS) for effort in efforts])
+
+
+def _migrate_json(db_path, json_path=SEGMENTE_JSON_PATH):
+    """Übernimmt Segmente (mit ihren doc_ids) und Befahrungen einmalig aus der früheren TinyDB-Datei."""
+    conn = get_connection(db_path)
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'migrated:segmente'").fetchone():
+        return
+    content = {}
+    if os.path.exists(json_path) and os.path.getsize(json_path) > 0:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            content = json.load(f)
+    with transaction(db_path):
+        if conn.execute("SELECT 1 FROM segmente LIMIT 1").fetchone() is None:
+            for doc_id, segment in content.get('segmente', {}).items():
+                _insert_segment(conn, int(doc_id), segment)
+            _insert_efforts(conn, content.get('efforts', {}).values())
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('migrated:segmente', ?)", (json_path,))
+
+
+def _segment_document(row):
+    """Baut aus (segment_id, JSON-Text) ein Document; doc_id ist die Segment-ID."""
+    return Document(json.loads(row[1]), doc_id=row[0])
+
+
+_training_db = None
+
+def _get_training_db():
+    global _training_db
+    if _training_db is None:
+        _training_db = open_table(EKG_TESTS_DB_PATH)
+    return _training_db
+
+
+# --- Geometrie ---
+
+def _track_arrays(track_df):
+    """
+    Bereitet einen Track für das Matching vor: Koordinaten, kumulierte Distanz
+    und Zeit in Sekunden seit Trackbeginn.
+
+    Returns:
+        dict or None: Arrays des Tracks oder None, wenn keine Zeitstempel vorhanden sind.
+    """
+    track_df = track_df.dropna(subset=["time"])
+    if len(track_df) < 2:
+        return None
+    lat = track_df['latitude'].to_numpy(dtype=float)
+    lon = track_df['longitude'].to_numpy(dtype=float)
+    times = track_df['time'].to_numpy(dtype="datetime64[ns]")
+    seconds = (times - times[0]).astype("timedelta64[ns]").astype(np.int64) / 1e9
+    return {
+        "lat": lat,
+        "lon": lon,
+        "dist": cumulative_distance_m(lat, lon),
+        "seconds": seconds,
+        "start_time": times[0],
+    }
+
+
+def _crossings(track, point, radius_m):
+    """
+    Findet alle Durchgänge eines Tracks an einem Punkt und bestimmt für jeden die genaue
+    Position als kumulierte Distanz. Die Nähe wird vektorisiert über alle Trackpunkte berechnet;
+    pro zusammenhängendem Durchgang wird der nächste Punkt auf die angrenzenden
+    Teilstrecken projiziert.
+
+    Args:
+        track (dict): Ergebnis von `_track_arrays`.
+        point (list): [lat, lon] des Start- oder Zielpunkts.
+        radius_m (float): Suchradius in Metern.
+
+    Returns:
+        list: Tupel (index, kumulierte Distanz in m) pro Durchgang, chronologisch sortiert.
+    """
+    x, y = to_local_xy(track["lat"], track["lon"], point[0], point[1])
+    dist_to_point = np.hypot(x, y)
+    near = dist_to_point <= radius_m
+    if not near.any():
+        return []
+
+    # Zusammenhängende Läufe innerhalb des Radius bilden je einen Durchgang
+    edges = np.diff(near.astype(np.int8))
+    run_starts = np.flatnonzero(edges == 1) + 1
+    run_ends = np.flatnonzero(edges == -1) + 1
+    if near[0]:
+        run_starts = np.concatenate(([0], run_starts))
+    if near[-1]:
+        run_ends = np.concatenate((run_ends, [len(near)]))
+
+    crossings = []
+    n = len(x)
+    for start, end in zip(run_starts, run_ends):
+        k = start + int(np.argmin(dist_to_point[start:end]))
+        best_dist = track["dist"][k]
+        best_offset = dist_to_point[k]
+        # Projektion des Punktes (Ursprung) auf die Teilstrecken (k-1, k) und (k, k+1)
+        for a, b in ((k - 1, k), (k, k + 1)):
+            if a < 0 or b >= n:
+                continue
+            dx, dy = x[b] - x[a], y[b] - y[a]
+            seg_len_sq = dx * dx + dy * dy
+            if seg_len_sq == 0:
+                continue
+            t = np.clip(-(x[a] * dx + y[a] * dy) / seg_len_sq, 0.0, 1.0)
+            offset = np.hypot(x[a] + t * dx, y[a] + t * dy)
+            if offset < best_offset:
+                best_offset = offset
+                best_dist = track["dist"][a] + t * (track["dist"][b] - track["dist"][a])
+        crossings.append((k, float(best_dist)))
+    return crossings
+
+
+def _corridor_coverage(segment, track, start_idx, end_idx):
+    """
+    Anteil der abgetasteten Segmentlinie, der innerhalb des Korridors um den Trackabschnitt liegt.
+    """
+    path_lat = np.asarray(segment['path_lat'], dtype=float)
+    path_lon = np.asarray(segment['path_lon'], dtype=float)
+    sample_lat, sample_lon = resample_by_distance(path_lat, path_lon, CORRIDOR_SAMPLE_STEP_M)
+    lat0, lon0 = segment['start']
+    sx, sy = to_local_xy(sample_lat, sample_lon, lat0, lon0)
+    tx, ty = to_local_xy(track["lat"][start_idx:end_idx + 1], track["lon"][start_idx:end_idx + 1], lat0, lon0)
+    min_dist = np.hypot(sx[:, None] - tx[None, :], sy[:, None] - ty[None, :]).min(axis=1)
+    return float(np.mean(min_dist <= segment.get('corridor_m', DEFAULT_CORRIDOR_M)))
+
+
+def match_segment(segment, track):
+    """
+    Sucht die schnellste Befahrung eines Segments in einem Track.
+
+    Ein Durchgang zählt, wenn der Track zuerst den Startpunkt und danach den Zielpunkt
+    überquert, die zurückgelegte Distanz plausibel ist und die Segmentlinie innerhalb des
+    Korridors abgefahren wurde. Start- und Zielzeit werden über die kumulierte Distanz interpoliert.
+
+    Args:
+        segment (dict): Segment-Dokument.
+        track (dict): Ergebnis von `_track_arrays`.
+
+    Returns:
+        dict or None: {'elapsed_s', 'start_offset_s', 'distance_m'} der schnellsten Befahrung oder None.
+    """
+    starts = _crossings(track, segment['start'], START_END_RADIUS_M)
+    if not starts:
+        return None
+    ends = _crossings(track, segment['end'], START_END_RADIUS_M)
+    if not ends:
+        return None
+
+    end_indices = np.array([e[0] for e in ends])
+    best = None
+    for start_idx, start_dist in starts:
+        later = np.flatnonzero(end_indices > start_idx)
+        if len(later) == 0:
+            continue
+        end_idx, end_dist = ends[later[0]]
+        ridden = end_dist - start_dist
+        if ridden <= 0 or ridden > segment['length_m'] * MAX_LENGTH_RATIO:
+            continue
+        if _corridor_coverage(segment, track, start_idx, end_idx) < MIN_CORRIDOR_COVERAGE:
+            continue
+        start_s = float(np.interp(start_dist, track["dist"], track["seconds"]))
+        end_s = float(np.interp(end_dist, track["dist"], track["seconds"]))
+        elapsed = end_s - start_s
+        if elapsed > 0 and (best is None or elapsed < best['elapsed_s']):
+            best = {'elapsed_s': round(elapsed, 1), 'start_offset_s': round(start_s, 1), 'distance_m': round(ridden, 1)}
+    return best
+
+
+# --- Segmente verwalten ---
+
+def create_segment(name, path_lat, path_lon, created_by, corridor_m=DEFAULT_CORRIDOR_M):
+    """
+    Legt ein neues Segment an. Start- und Zielpunkt sind der erste und letzte Punkt der Linie.
+
+    Args:
+        name (str): Anzeigename des Segments.
+        path_lat (array-like): Breitengrade der Segmentlinie.
+        path_lon (array-like): Längengrade der Segmentlinie.
+        created_by (int): ID der Person, die das Segment angelegt hat.
+        corridor_m (float, optional): Halbe Korridorbreite in Metern.
+
+    Returns:
+        int: Die doc_id des neuen Segments.
+    """
+    path_lat = np.asarray(path_lat, dtype=float)
+    path_lon = np.asarray(path_lon, dtype=float)
+    keep = simplify_track(path_lat, path_lon, 5.0)
+    path_lat = path_lat[keep]
+    path_lon = path_lon[keep]
+    segment = {
+        'name': name,
+        'start': [float(path_lat[0]), float(path_lon[0])],
+        'end': [float(path_lat[-1]), float(path_lon[-1])],
+        'path_lat': np.round(path_lat, 6).tolist(),
+        'path_lon': np.round(path_lon, 6).tolist(),
+        'corridor_m': float(corridor_m),
+        'length_m': float(cumulative_distance_m(path_lat, path_lon)[-1]),
+        'bbox': bounding_box(path_lat, path_lon),
+        'created_by': int(created_by),
+        'created_at': datetime.now().strftime("%Y-%m-%d"),
+    }
+    conn = _conn(DB_PATH)
+    with transaction(DB_PATH):
+        return _insert_segment(conn, None, segment)
+
+
+def delete_segment(segment_id):
+    """
+    Löscht ein Segment samt aller Befahrungen.
+
+    Args:
+        segment_id (int): Die doc_id des Segments.
+
+    Returns:
+        None
+    """
+    conn = _conn(DB_PATH)
+    with transaction(DB_PATH):
+        conn.execute("DELETE FROM segment_efforts WHERE segment_id = ?", (int(segment_id),))
+        conn.execute("DELETE FROM segmente WHERE segment_id = ?", (int(segment_id),))
+
+
+def get_all_segments():
+    """
+    Gibt alle Segmente zurück.
+
+    Returns:
+        list: Segment-Dokumente.
+    """
+    rows = _conn(DB_PATH).execute("SELECT segment_id, data FROM segmente ORDER BY segment_id").fetchall()
+    return [_segment_document(row) for row in rows]
+
+
+def get_segment(segment_id):
+    """
+    Gibt ein Segment zurück.
+
+    Args:
+        segment_id (int): Die doc_id des Segments.
+
+    Returns:
+        tinydb.table.Document or None: Das Segment oder None.
+    """
+    row = _conn(DB_PATH).execute("SELECT segment_id, data FROM segmente WHERE segment_id = ?", (int(segment_id),)).fetchone()
+    return _segment_document(row) if row else None
+
+
+def _segments_in_bbox(bbox):
+    """Bounding-Box-Vorfilter über alle Segmente (Rand: Korridorbreite, in Längenrichtung doppelt)."""
+    rows = _conn(DB_PATH).execute(
+        "SELECT segment_id, data FROM segmente "
+        "WHERE min_lat - corridor_m / ? <= ? AND max_lat + corridor_m / ? >= ? "
+        "AND min_lon - corridor_m * 2 / ? <= ? AND max_lon + corridor_m * 2 / ? >= ?",
+        (METERS_PER_DEGREE_LAT, bbox[2], METERS_PER_DEGREE_LAT, bbox[0],
+         METERS_PER_DEGREE_LAT, bbox[3], METERS_PER_DEGREE_LAT, bbox[1])).fetchall()
+    return [_segment_document(row) for row in rows]
+
+
+def _effort(segment_id, training_id, training, person_id, result, track):
+    """Baut den Datensatz einer Befahrung aus dem Ergebnis von `match_segment`."""
+    start_time = track["start_time"] + np.timedelta64(int(result['start_offset_s'] * 1000), 'ms')
+    return {
+        'segment_id': int(segment_id),
+        'training_id': int(training_id),
+        'person_id': int(person_id),
+        'date': training.get('date'),
+        'start_time': str(start_time.astype('datetime64[s]')),
+        'elapsed_s': result['elapsed_s'],
+        'distance_m': result['distance_m'],
+    }
+
+
+def match_training_against_segments(training_id, training, person_id):
+    """
+    Gleicht ein (neues) Training gegen alle Segmente ab und speichert die Befahrungen in einer
+    Transaktion. Nur Segmente, deren Bounding Box den Track berührt, werden genauer geprüft.
+
+    Args:
+        training_id (int): Die doc_id des Trainings.
+        training (dict): Das Trainings-Dokument.
+        person_id (int): Die ID der Person, der das Training gehört.
+
+    Returns:
+        list: Tupel (Segmentname, Zeit in Sekunden) der gefundenen Befahrungen.
+    """
+    track_df = load_track_for_training(training)
+    track = _track_arrays(track_df) if track_df is not None else None
+
+    found, efforts = [], []
+    if track is not None:
+        for segment in _segments_in_bbox(bounding_box(track["lat"], track["lon"])):
+            result = match_segment(segment, track)
+            if result is not None:
+                efforts.append(_effort(segment.doc_id, training_id, training, person_id, result, track))
+                found.append((segment['name'], result['elapsed_s']))
+
+    conn = _conn(DB_PATH)
+    with transaction(DB_PATH):
+        conn.execute("DELETE FROM segment_efforts WHERE training_id = ?", (int(training_id),))
+        _insert_efforts(conn, efforts)
+    return found
+
+
+@timed()
+def match_segment_against_trainings(segment_id):
+    """
+    Gleicht ein Segment gegen alle vorhandenen Trainings ab. Die Kandidaten kommen aus dem
+    räumlichen Vorfilter über die gespeicherten Bounding Boxes der Strecken-Fingerprints;
+    die Befahrungen des Segments werden am Ende in einer Transaktion ersetzt.
+
+    Args:
+        segment_id (int): Die doc_id des Segments.
+
+    Returns:
+        int: Anzahl der gefundenen Befahrungen.
+    """
+    segment = get_segment(segment_id)
+    if segment is None:
+        return 0
+    routen_index = get_routen_index()
+    margin_deg = segment.get('corridor_m', DEFAULT_CORRIDOR_M) / METERS_PER_DEGREE_LAT * 2
+    efforts = []
+    for training_id in routen_index.find_by_bbox(segment['bbox'], margin_deg):
+        training = _get_training_db().get(doc_id=training_id)
+        fingerprint = routen_index.get(training_id)
+        if training is None or fingerprint is None:
+            continue
+        track_df = load_track_for_training(training)
+        track = _track_arrays(track_df) if track_df is not None else None
+        if track is None:
+            continue
+        result = match_segment(segment, track)
+        if result is not None:
+            efforts.append(_effort(segment.doc_id, training_id, training, fingerprint['person_id'], result, track))
+
+    conn = _conn(DB_PATH)
+    with transaction(DB_PATH):
+        conn.execute("DELETE FROM segment_efforts WHERE segment_id = ?", (segment.doc_id,))
+        _insert_efforts(conn, efforts)
+    return len(efforts)
+
+
+def remove_training_efforts(training_id):
+    """
+    Entfernt alle Befahrungen eines Trainings (z.B. beim Löschen oder nach dem Dateiwechsel).
+
+    Args:
+        training_id (int): Die doc_id des Trainings.
+
+    Returns:
+        None
+    """
+    conn = _conn(DB_PATH)
+    with transaction(DB_PATH):
+        conn.execute("DELETE FROM segment_efforts WHERE training_id = ?", (int(training_id),))
+
+
+# --- Bestenlisten ---
+
+@timed()
+def get_leaderboard(segment_id, person_id=None, limit=10):
+    """
+    Erstellt die Bestenliste eines Segments.
+
+    Args:
+        segment_id (int): Die doc_id des Segments.
+        person_id (int, optional): Wenn gesetzt, alle Befahrungen dieser Person (persönliche Bestenliste).
+                                   Sonst die jeweils beste Zeit jeder Person (Gesamtwertung).
+        limit (int, optional): Maximale Anzahl Einträge.
+
+    Returns:
+        list: Befahrungen (dict), aufsteigend nach Zeit sortiert.
+    """
+    columns = ', '.join(_EFFORT_COLUMNS)
+    if person_id is not None:
+        rows = _conn(DB_PATH).execute(
+            f"SELECT {columns} FROM segment_efforts WHERE segment_id = ? AND person_id = ? "
+            "ORDER BY elapsed_s LIMIT ?", (int(segment_id), int(person_id), int(limit))).fetchall()
+    else:
+        # Beste Zeit je Person (bei Gleichstand die frühere Befahrung)
+        rows = _conn(DB_PATH).execute(
+            f"SELECT {columns} FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY person_id ORDER BY elapsed_s, date) AS rang "
+            "FROM segment_efforts WHERE segment_id = ?) WHERE rang = 1 ORDER BY elapsed_s LIMIT ?",
+            (int(segment_id), int(limit))).fetchall()
+    return [dict(zip(_EFFORT_COLUMNS, row)) for row in rows]
+
+
+def format_elapsed(seconds):
+    """
+    Formatiert eine Segmentzeit als "m:ss" bzw. "h:mm:ss".
+
+    Args:
+        seconds (float): Zeit in Sekunden.
+
+    Returns:
+        str: Die formatierte Zeit.
+    """
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
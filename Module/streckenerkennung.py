@@ -0,0 +1,470 @@
+import os
+import sys
+import json
+import inspect
+import threading
+import numpy as np
+from tinydb.table import Document
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.trackdaten import (load_track_for_training, resample_by_distance, simplify_track,
+                               cumulative_distance_m, to_local_xy, bounding_box)
+from Module.datenbank import DB_PATH, get_connection, transaction, open_table
+
+# --- Konfiguration & Konstanten ---
+GEOHASH_PRECISION = 7          # ca. 150 m x 150 m (in Mitteleuropa ca. 105 m breit)
+GEOHASH_SAMPLE_STEP_M = 50.0   # Abtastschritt, damit jede durchfahrene Zelle getroffen wird
+SIMPLIFY_TOLERANCE_M = 15.0    # Douglas-Peucker-Toleranz für den gespeicherten Track
+FRECHET_MAX_POINTS = 250       # Obergrenze der Punkte pro Track beim Fréchet-Vergleich
+FRECHET_SCHWELLE_M = 200.0     # Maximale Fréchet-Distanz für "gleiche Strecke"
+MAX_LAENGEN_ABWEICHUNG = 0.25  # Relative Längendifferenz, ab der nicht mehr verglichen wird
+
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16                 # 16 Bänder x 4 Zeilen -> Kandidat ab ca. 50 % Jaccard-Ähnlichkeit
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+_MERSENNE_PRIME = (1 << 31) - 1
+
+# Einzelne Anweisungen statt executescript(), das eine umgebende Transaktion vorzeitig bestätigen würde
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS routen_fingerprints (
+        training_id INTEGER PRIMARY KEY,
+        person_id INTEGER,
+        date TEXT,
+        min_lat REAL NOT NULL,
+        min_lon REAL NOT NULL,
+        max_lat REAL NOT NULL,
+        max_lon REAL NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_routen_fingerprints_person ON routen_fingerprints(person_id)",
+    "CREATE INDEX IF NOT EXISTS idx_routen_fingerprints_bbox ON routen_fingerprints(min_lat, max_lat)",
+    """CREATE TABLE IF NOT EXISTS routen_buckets (
+        bucket TEXT NOT NULL,
+        training_id INTEGER NOT NULL,
+        PRIMARY KEY (bucket, training_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_routen_buckets_training ON routen_buckets(training_id)",
+    """CREATE TABLE IF NOT EXISTS routen_treffer (
+        training_id INTEGER NOT NULL,
+        match_id INTEGER NOT NULL,
+        PRIMARY KEY (training_id, match_id)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_routen_treffer_match ON routen_treffer(match_id)",
+)
+
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _conn(db_path):
+    conn = get_connection(db_path)
+    with _schema_lock:
+        if db_path not in _initialized_paths:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            _initialized_paths.add(db_path)
+    return conn
+
+# Fester Seed, damit Signaturen über Prozesse und Neustarts hinweg vergleichbar bleiben
+_rng = np.random.default_rng(20250702)
+_HASH_A = _rng.integers(1, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+_HASH_B = _rng.integers(0, _MERSENNE_PRIME, size=MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+# --- Fingerprint-Bausteine ---
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    """
+    Kodiert Koordinaten vektorisiert als Geohash in Ganzzahl-Darstellung
+    (die Bits entsprechen exakt dem Base32-Geohash der gleichen Länge).
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+        precision (int, optional): Anzahl der Geohash-Zeichen (5 Bit pro Zeichen).
+
+    Returns:
+        numpy.ndarray: Geohashes als uint64.
+    """
+    total_bits = precision * 5
+    lon_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    lat_q = np.floor((np.asarray(lat, dtype=float) + 90.0) / 180.0 * (1 << lat_bits)).astype(np.uint64)
+    lon_q = np.floor((np.asarray(lon, dtype=float) + 180.0) / 360.0 * (1 << lon_bits)).astype(np.uint64)
+    lat_q = np.minimum(lat_q, (1 << lat_bits) - 1)
+    lon_q = np.minimum(lon_q, (1 << lon_bits) - 1)
+
+    # Bits verschränken: Geohash beginnt mit dem höchsten Längengrad-Bit
+    codes = np.zeros(len(lat_q), dtype=np.uint64)
+    for bit in range(total_bits):
+        if bit % 2 == 0:
+            source, shift = lon_q, lon_bits - 1 - bit // 2
+        else:
+            source, shift = lat_q, lat_bits - 1 - bit // 2
+        codes = (codes << np.uint64(1)) | ((source >> np.uint64(shift)) & np.uint64(1))
+    return codes
+
+
+def geohash_sequence(lat, lon, precision=GEOHASH_PRECISION):
+    """
+    Erzeugt die Geohash-Sequenz eines Tracks: der Track wird gleichmäßig abgetastet,
+    kodiert und direkt aufeinanderfolgende Wiederholungen derselben Zelle werden entfernt.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+        precision (int, optional): Geohash-Genauigkeit.
+
+    Returns:
+        numpy.ndarray: Sequenz der durchfahrenen Geohash-Zellen (uint64).
+    """
+    res_lat, res_lon = resample_by_distance(lat, lon, GEOHASH_SAMPLE_STEP_M)
+    codes = geohash_encode(res_lat, res_lon, precision)
+    if len(codes) == 0:
+        return codes
+    changes = np.concatenate(([True], codes[1:] != codes[:-1]))
+    return codes[changes]
+
+
+def minhash_signature(cells):
+    """
+    Berechnet die MinHash-Signatur einer Menge von Geohash-Zellen.
+    Alle Permutationen werden per Broadcasting in einem Schritt ausgewertet.
+
+    Args:
+        cells (numpy.ndarray): Geohash-Zellen (uint64).
+
+    Returns:
+        numpy.ndarray: Signatur der Länge `MINHASH_PERMUTATIONS` (uint64).
+    """
+    unique_cells = np.unique(cells) % np.uint64(_MERSENNE_PRIME)
+    if len(unique_cells) == 0:
+        return np.full(MINHASH_PERMUTATIONS, _MERSENNE_PRIME, dtype=np.uint64)
+    hashes = (_HASH_A[:, None] * unique_cells[None, :] + _HASH_B[:, None]) % np.uint64(_MERSENNE_PRIME)
+    return hashes.min(axis=1)
+
+
+def lsh_band_keys(signature):
+    """
+    Teilt eine MinHash-Signatur in LSH-Bänder auf und liefert pro Band einen Bucket-Schlüssel.
+
+    Args:
+        signature (array-like): MinHash-Signatur.
+
+    Returns:
+        list: Liste von Strings der Form "<band>:<werte>".
+    """
+    signature = [int(v) for v in signature]
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        keys.append(f"{band}:" + "-".join(f"{v:x}" for v in rows))
+    return keys
+
+
+def discrete_frechet_m(lat_a, lon_a, lat_b, lon_b):
+    """
+    Berechnet die diskrete Fréchet-Distanz zweier Tracks in Metern.
+    Die Distanzmatrix wird vollständig vektorisiert erstellt; die Rekursion
+    wird entlang der Antidiagonalen ausgewertet, deren Zellen unabhängig voneinander sind.
+
+    Args:
+        lat_a, lon_a (numpy.ndarray): Koordinaten des ersten Tracks.
+        lat_b, lon_b (numpy.ndarray): Koordinaten des zweiten Tracks.
+
+    Returns:
+        float: Diskrete Fréchet-Distanz in Metern.
+    """
+    lat0 = float(np.mean(np.concatenate((lat_a, lat_b))))
+    lon0 = float(np.mean(np.concatenate((lon_a, lon_b))))
+    xa, ya = to_local_xy(lat_a, lon_a, lat0, lon0)
+    xb, yb = to_local_xy(lat_b, lon_b, lat0, lon0)
+    d = np.hypot(xa[:, None] - xb[None, :], ya[:, None] - yb[None, :])
+
+    n, m = d.shape
+    # Gepolsterte Kopplungsmatrix: Zeile/Spalte 0 sind Randwerte (inf), C[0, 0] = 0 als Start
+    coupling = np.full((n + 1, m + 1), np.inf)
+    coupling[0, 0] = 0.0
+    for k in range(n + m - 1):
+        i = np.arange(max(0, k - m + 1), min(n - 1, k) + 1)
+        j = k - i
+        best_prev = np.minimum(np.minimum(coupling[i, j + 1], coupling[i, j]), coupling[i + 1, j])
+        coupling[i + 1, j + 1] = np.maximum(d[i, j], best_prev)
+    return float(coupling[n, m])
+
+
+def _comparison_track(fingerprint):
+    """
+    Bereitet den gespeicherten, vereinfachten Track für den Fréchet-Vergleich auf
+    (gleichmäßige Abtastung mit höchstens `FRECHET_MAX_POINTS` Punkten).
+    """
+    lat = np.asarray(fingerprint['simplified_lat'], dtype=float)
+    lon = np.asarray(fingerprint['simplified_lon'], dtype=float)
+    step = max(GEOHASH_SAMPLE_STEP_M, fingerprint.get('length_m', 0.0) / FRECHET_MAX_POINTS)
+    return resample_by_distance(lat, lon, step)
+
+
+def build_fingerprint(track_df):
+    """
+    Erstellt den Strecken-Fingerprint eines Tracks.
+
+    Args:
+        track_df (pandas.DataFrame): Trackpunkte mit den Spalten 'latitude' und 'longitude'.
+
+    Returns:
+        dict: Fingerprint mit Geohash-Sequenz, MinHash-Signatur, Bounding Box,
+              Streckenlänge und vereinfachtem Track.
+    """
+    lat = track_df['latitude'].to_numpy(dtype=float)
+    lon = track_df['longitude'].to_numpy(dtype=float)
+    cells = geohash_sequence(lat, lon)
+    keep = simplify_track(lat, lon, SIMPLIFY_TOLERANCE_M)
+    return {
+        'geohashes': [int(c) for c in cells],
+        'signature': [int(v) for v in minhash_signature(cells)],
+        'bbox': bounding_box(lat, lon),
+        'length_m': float(cumulative_distance_m(lat, lon)[-1]),
+        'simplified_lat': np.round(lat[keep], 6).tolist(),
+        'simplified_lon': np.round(lon[keep], 6).tolist(),
+    }
+
+
+# --- Index ---
+
+class RoutenIndex:
+    """
+    Persistenter Index aller Strecken-Fingerprints mit LSH-Buckets für die Suche nach
+    gleichen Strecken. Fingerprints, Buckets und Treffer liegen in eigenen Tabellen der
+    SQLite-Datenbank (Schlüssel = Trainings-ID); jede Änderung ist eine Transaktion und schreibt
+    nur die betroffenen Zeilen. Andere Prozesse sehen Änderungen ohne Neuaufbau.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = db_path
+
+    def _document(self, training_id, data, conn):
+        """Baut aus einer Zeile ein Document (doc_id = Trainings-ID) mit den aktuellen Treffern."""
+        document = Document(json.loads(data), doc_id=training_id)
+        document['matches'] = [row[0] for row in conn.execute(
+            "SELECT match_id FROM routen_treffer WHERE training_id = ? ORDER BY match_id", (training_id,))]
+        return document
+
+    def get(self, training_id):
+        """
+        Gibt den Fingerprint eines Trainings zurück.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+
+        Returns:
+            tinydb.table.Document or None: Der Fingerprint (doc_id = Trainings-ID) oder None.
+        """
+        conn = _conn(self.db_path)
+        row = conn.execute("SELECT data FROM routen_fingerprints WHERE training_id = ?", (int(training_id),)).fetchone()
+        return self._document(int(training_id), row[0], conn) if row else None
+
+    def contains(self, training_id):
+        """
+        Prüft, ob für ein Training ein Fingerprint gespeichert ist.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+
+        Returns:
+            bool: True, wenn der Fingerprint vorhanden ist.
+        """
+        return _conn(self.db_path).execute(
+            "SELECT 1 FROM routen_fingerprints WHERE training_id = ?", (int(training_id),)).fetchone() is not None
+
+    def find_by_bbox(self, bbox, margin_deg=0.0, person_id=None):
+        """
+        Räumlicher Vorfilter: liefert alle Trainings, deren Bounding Box die gegebene Box schneidet.
+        Der Vergleich läuft als Abfrage über die Bounding-Box-Spalten.
+
+        Args:
+            bbox (list): [min_lat, min_lon, max_lat, max_lon] der gesuchten Region.
+            margin_deg (float, optional): Zusätzlicher Rand in Grad.
+            person_id (int, optional): Nur Trainings dieser Person berücksichtigen.
+
+        Returns:
+            list: IDs der Trainings, deren Track die Region berühren kann.
+        """
+        sql = ("SELECT training_id FROM routen_fingerprints "
+               "WHERE min_lat <= ? AND max_lat >= ? AND min_lon <= ? AND max_lon >= ?")
+        params = [bbox[2] + margin_deg, bbox[0] - margin_deg, bbox[3] + margin_deg, bbox[1] - margin_deg]
+        if person_id is not None:
+            sql += " AND person_id = ?"
+            params.append(int(person_id))
+        return [row[0] for row in _conn(self.db_path).execute(sql + " ORDER BY training_id", params)]
+
+    def find_candidates(self, signature, person_id=None, exclude_id=None):
+        """
+        Sucht Kandidaten über die LSH-Buckets, ohne alle Fingerprints zu vergleichen.
+
+        Args:
+            signature (list): MinHash-Signatur des gesuchten Tracks.
+            person_id (int, optional): Nur Trainings dieser Person berücksichtigen.
+            exclude_id (int, optional): Trainings-ID, die ignoriert wird (der Track selbst).
+
+        Returns:
+            list: Fingerprint-Dokumente der Kandidaten.
+        """
+        keys = lsh_band_keys(signature)
+        sql = (f"SELECT training_id, data FROM routen_fingerprints WHERE training_id IN "
+               f"(SELECT training_id FROM routen_buckets WHERE bucket IN ({', '.join('?' * len(keys))}))")
+        params = list(keys)
+        if person_id is not None:
+            sql += " AND person_id = ?"
+            params.append(int(person_id))
+        if exclude_id is not None:
+            sql += " AND training_id != ?"
+            params.append(int(exclude_id))
+        conn = _conn(self.db_path)
+        return [self._document(row[0], row[1], conn) for row in conn.execute(sql, params).fetchall()]
+
+    def add_training(self, training_id, training, person_id):
+        """
+        Erstellt den Fingerprint eines Trainings, sucht gleiche Strecken der Person und
+        speichert die Treffer in beide Richtungen. Ein vorhandener Fingerprint wird ersetzt.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+            training (dict): Das Trainings-Dokument (benötigt 'gpx_file' oder 'fit_file').
+            person_id (int): Die doc_id der Person, der das Training gehört.
+
+        Returns:
+            list: Die IDs der Trainings mit gleicher Strecke. Leer, wenn das Training
+                  keinen GPS-Track hat.
+        """
+        training_id = int(training_id)
+        track_df = load_track_for_training(training)
+        if track_df is None:
+            self.remove_training(training_id)
+            return []
+
+        fingerprint = build_fingerprint(track_df)
+        fingerprint['person_id'] = int(person_id)
+        fingerprint['date'] = training.get('date')
+        own_track = _comparison_track(fingerprint)
+
+        # Abgleich und Speichern in einer Transaktion, damit parallele Uploads keine Treffer übersehen
+        _conn(self.db_path)
+        with transaction(self.db_path) as conn:
+            self.remove_training(training_id)
+            matches = []
+            for candidate in self.find_candidates(fingerprint['signature'], person_id, exclude_id=training_id):
+                length_a = fingerprint['length_m']
+                length_b = candidate.get('length_m', 0.0)
+                if max(length_a, length_b) <= 0 or abs(length_a - length_b) / max(length_a, length_b) > MAX_LAENGEN_ABWEICHUNG:
+                    continue
+                other_track = _comparison_track(candidate)
+                if discrete_frechet_m(own_track[0], own_track[1], other_track[0], other_track[1]) <= FRECHET_SCHWELLE_M:
+                    matches.append(candidate.doc_id)
+
+            min_lat, min_lon, max_lat, max_lon = fingerprint['bbox']
+            conn.execute("INSERT INTO routen_fingerprints (training_id, person_id, date, min_lat, min_lon, max_lat, max_lon, data) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                         (training_id, fingerprint['person_id'], fingerprint['date'], min_lat, min_lon, max_lat, max_lon,
+                          json.dumps(fingerprint)))
+            conn.executemany("INSERT OR IGNORE INTO routen_buckets (bucket, training_id) VALUES (?, ?)",
+                             [(key, training_id) for key in lsh_band_keys(fingerprint['signature'])])
+            conn.executemany("INSERT OR IGNORE INTO routen_treffer (training_id, match_id) VALUES (?, ?)",
+                             [pair for match_id in matches for pair in ((training_id, match_id), (match_id, training_id))])
+        return sorted(matches)
+
+    def remove_training(self, training_id):
+        """
+        Entfernt den Fingerprint eines Trainings samt aller Verweise aus dem Index.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+
+        Returns:
+            None
+        """
+        training_id = int(training_id)
+        _conn(self.db_path)
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM routen_treffer WHERE training_id = ? OR match_id = ?", (training_id, training_id))
+            conn.execute("DELETE FROM routen_buckets WHERE training_id = ?", (training_id,))
+            conn.execute("DELETE FROM routen_fingerprints WHERE training_id = ?", (training_id,))
+
+    def get_matches(self, training_id):
+        """
+        Gibt die IDs aller Trainings mit gleicher Strecke zurück.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+
+        Returns:
+            list: IDs der gleichen Strecken (leer, wenn kein Fingerprint vorhanden ist).
+        """
+        return [row[0] for row in _conn(self.db_path).execute(
+            "SELECT match_id FROM routen_treffer WHERE training_id = ? ORDER BY match_id", (int(training_id),))]
+
+    def count_previous_matches(self, training_id):
+        """
+        Zählt, wie oft dieselbe Strecke vor diesem Training bereits gefahren/gelaufen wurde.
+
+        Args:
+            training_id (int): Die doc_id des Trainings.
+
+        Returns:
+            int: Anzahl der früheren Trainings mit gleicher Strecke.
+        """
+        row = _conn(self.db_path).execute(
+            "SELECT COUNT(*) FROM routen_treffer t "
+            "JOIN routen_fingerprints own ON own.training_id = t.training_id "
+            "JOIN routen_fingerprints other ON other.training_id = t.match_id "
+            "WHERE t.training_id = ? AND COALESCE(other.date, '') <= COALESCE(own.date, '')",
+            (int(training_id),)).fetchone()
+        return row[0]
+
+
+_routen_index = None
+
+def get_routen_index():
+    """
+    Liefert den prozessweit geteilten RoutenIndex (wird beim ersten Aufruf angelegt).
+
+    Returns:
+        RoutenIndex: Der Index.
+    """
+    global _routen_index
+    if _routen_index is None:
+        _routen_index = RoutenIndex()
+    return _routen_index
+
+
+def backfill_routen_index(person_db_path='dbperson.json', tests_db_path='dbtests.json'):
+    """
+    Erstellt Fingerprints für alle bestehenden Trainings aller Personen (z.B. nach dem
+    ersten Einspielen der Streckenerkennung).
+
+    Args:
+        person_db_path (str, optional): Pfad zur Personendatenbank.
+        tests_db_path (str, optional): Pfad zur Trainingsdatenbank.
+
+    Returns:
+        int: Anzahl der Trainings, für die ein Fingerprint erstellt wurde.
+    """
+    index = get_routen_index()
+    person_db = open_table(person_db_path)
+    tests_db = open_table(tests_db_path)
+    count = 0
+    for person in person_db.all():
+        trainings = tests_db.search_by_person(person.doc_id)
+        # Chronologisch, damit "vorherige" Strecken bereits im Index sind
+        for training in sorted(trainings, key=lambda t: t.get('date') or ""):
+            index.add_training(training.doc_id, training, person.doc_id)
+            if index.contains(training.doc_id):
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    anzahl = backfill_routen_index()
+    print(f"Fingerprints für {anzahl} Trainings erstellt.")
@@ -0,0 +1,338 @@
+import os
+import sys
+import inspect
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.utils import lazy_import
+from Module.ladecache import cached_load
+from Module.laufzeitprofil import timed
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+gpxpy = lazy_import("gpxpy")
+fitparse = lazy_import("fitparse")
+
+# Erdradius in Metern (für Haversine und die lokale Projektion)
+ERDRADIUS_M = 6371000.0
+SEMICIRCLES_TO_DEG = 180.0 / 2**31
+# Messkanäle der FIT-Datensätze (Feldname in der FIT-Datei -> Spaltenname)
+FIT_CHANNELS = {
+    "speed": "velocity",
+    "heart_rate": "heart_rate",
+    "distance": "distance",
+    "cadence": "cadence",
+    "power": "power",
+    "altitude": "altitude",
+}
+
+
+def read_gpx_track(gpx_filepath):
+    """
+    Liest alle Trackpunkte einer GPX-Datei in ein DataFrame ein.
+
+    Args:
+        gpx_filepath (str): Der Pfad zur GPX-Datei.
+
+    Returns:
+        pandas.DataFrame or None: DataFrame mit den Spalten 'latitude', 'longitude', 'time'
+                                  (NaT, wenn ein Punkt keinen Zeitstempel hat) und 'altitude' (NaN ohne Höhe).
+                                  Gibt None zurück, wenn die Datei fehlt oder nicht geparst werden kann.
+    """
+    return cached_load('gpx_track', gpx_filepath, _parse_gpx_track)
+
+
+def _parse_gpx_track(gpx_filepath):
+    if not gpx_filepath or not os.path.exists(gpx_filepath):
+        return None
+    try:
+        with open(gpx_filepath, 'r') as gpx_file:
+            gpx = gpxpy.parse(gpx_file)
+    except Exception as e:
+        print(f"Warnung: GPX-Datei {gpx_filepath} konnte nicht gelesen werden: {e}")
+        return None
+
+    latitudes = []
+    longitudes = []
+    times = []
+    altitudes = []
+    for track in gpx.tracks:
+        for segment in track.segments:
+            for point in segment.points:
+                latitudes.append(point.latitude)
+                longitudes.append(point.longitude)
+                times.append(point.time)
+                altitudes.append(point.elevation)
+
+    df = pd.DataFrame({"latitude": latitudes, "longitude": longitudes, "time": times,
+                       "altitude": pd.to_numeric(pd.Series(altitudes, dtype=object), errors="coerce").astype(float)})
+    df["time"] = pd.to_datetime(df["time"], utc=True, errors="coerce").dt.tz_localize(None)
+    return df
+
+
+def read_fit_track(fit_filepath):
+    """
+    Liest die GPS-Punkte (Breiten-/Längengrad und Zeitstempel) einer FIT-Datei ein.
+    Datensätze ohne Position werden verworfen. Die Datei wird dafür nur einmal geparst (siehe `read_fit_records`).
+
+    Args:
+        fit_filepath (str): Der Pfad zur FIT-Datei.
+
+    Returns:
+        pandas.DataFrame or None: DataFrame mit den Spalten 'latitude', 'longitude' und 'time'.
+                                  Gibt None zurück, wenn die Datei fehlt oder nicht geparst werden kann.
+    """
+    records = read_fit_records(fit_filepath)
+    if records is None:
+        return None
+    return records[["latitude", "longitude", "time"]].dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+
+
+def read_fit_records(fit_filepath):
+    """
+    Liest alle Datensätze einer FIT-Datei mit Zeitstempel, Position und den Messkanälen aus
+    `FIT_CHANNELS`. Anders als `read_fit_track` bleiben auch Datensätze ohne Position erhalten;
+    fehlende Werte sind NaN.
+
+    Args:
+        fit_filepath (str): Der Pfad zur FIT-Datei.
+
+    Returns:
+        pandas.DataFrame or None: Spalten 'time', 'latitude', 'longitude' und die Kanäle.
+                                  Gibt None zurück, wenn die Datei fehlt oder nicht geparst werden kann.
+                                  Das Ergebnis kommt aus dem gemeinsamen Ladecache (`Module.ladecache`).
+    """
+    return cached_load('fit_records', fit_filepath, _parse_fit_records)
+
+
+def _parse_fit_records(fit_filepath):
+    if not fit_filepath or not os.path.exists(fit_filepath):
+        return None
+    columns = {"time": [], "latitude": [], "longitude": [], **{name: [] for name in FIT_CHANNELS.values()}}
+    try:
+        for record in fitparse.FitFile(fit_filepath).get_messages('record'):
+            record_values = {data.name: data.value for data in record}
+            lat_semicircles = record_values.get("position_lat")
+            lon_semicircles = record_values.get("position_long")
+            columns["time"].append(record_values.get("timestamp"))
+            columns["latitude"].append(None if lat_semicircles is None else lat_semicircles * SEMICIRCLES_TO_DEG)
+            columns["longitude"].append(None if lon_semicircles is None else lon_semicircles * SEMICIRCLES_TO_DEG)
+            for field, name in FIT_CHANNELS.items():
+                columns[name].append(record_values.get(field))
+    except Exception as e:
+        print(f"Warnung: FIT-Datei {fit_filepath} konnte nicht gelesen werden: {e}")
+        return None
+
+    df = pd.DataFrame(columns)
+    df["time"] = pd.to_datetime(df["time"], errors="coerce")
+    for name in ["latitude", "longitude", *FIT_CHANNELS.values()]:
+        df[name] = pd.to_numeric(df[name], errors="coerce").astype(float)
+    return df
+
+
+@timed()
+def load_track_for_training(training):
+    """
+    Lädt den GPS-Track eines Trainings. Eine verlinkte GPX-Datei hat Vorrang vor der FIT-Datei.
+
+    Args:
+        training (dict): Trainings-Dokument mit den Feldern 'gpx_file' und/oder 'fit_file'.
+
+    Returns:
+        pandas.DataFrame or None: Trackpunkte ('latitude', 'longitude', 'time') mit mindestens
+                                  zwei gültigen Koordinaten, sonst None.
+    """
+    df = None
+    gpx_file = training.get('gpx_file')
+    fit_file = training.get('fit_file')
+    if gpx_file and gpx_file != "-":
+        df = read_gpx_track(gpx_file)
+    if (df is None or df.empty) and fit_file and fit_file != "-":
+        df = read_fit_track(fit_file)
+    if df is None:
+        return None
+
+    df = df.dropna(subset=["latitude", "longitude"]).reset_index(drop=True)
+    if len(df) < 2:
+        return None
+    return df
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """
+    Berechnet die Großkreisdistanz in Metern (vektorisiert, NumPy-Broadcasting).
+
+    Args:
+        lat1, lon1, lat2, lon2 (array-like): Koordinaten in Grad.
+
+    Returns:
+        numpy.ndarray: Distanzen in Metern.
+    """
+    lat1 = np.radians(lat1)
+    lat2 = np.radians(lat2)
+    dlat = lat2 - lat1
+    dlon = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * ERDRADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def cumulative_distance_m(lat, lon):
+    """
+    Berechnet die kumulierte Distanz entlang eines Tracks.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+
+    Returns:
+        numpy.ndarray: Kumulierte Distanz in Metern, beginnend bei 0.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if len(lat) < 2:
+        return np.zeros(len(lat))
+    steps = haversine_m(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def to_local_xy(lat, lon, lat0=None, lon0=None):
+    """
+    Projiziert Koordinaten äquirektangulär in ein lokales metrisches x/y-System.
+    Für Tracks mit wenigen hundert Kilometern Ausdehnung ist der Fehler vernachlässigbar.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+        lat0 (float, optional): Referenzbreite. Standard ist der Mittelwert von `lat`.
+        lon0 (float, optional): Referenzlänge. Standard ist der Mittelwert von `lon`.
+
+    Returns:
+        tuple: (x, y) als numpy.ndarray in Metern.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    if lat0 is None:
+        lat0 = float(np.mean(lat))
+    if lon0 is None:
+        lon0 = float(np.mean(lon))
+    x = np.radians(lon - lon0) * ERDRADIUS_M * np.cos(np.radians(lat0))
+    y = np.radians(lat - lat0) * ERDRADIUS_M
+    return x, y
+
+
+def resample_by_distance(lat, lon, step_m):
+    """
+    Tastet einen Track in gleichmäßigen Distanzschritten neu ab (lineare Interpolation
+    über die kumulierte Distanz). Dadurch werden Tracks mit unterschiedlicher Aufzeichnungsrate vergleichbar.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+        step_m (float): Abstand zwischen zwei neuen Punkten in Metern.
+
+    Returns:
+        tuple: (lat, lon) als numpy.ndarray der neu abgetasteten Punkte.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    dist = cumulative_distance_m(lat, lon)
+    if len(dist) < 2 or dist[-1] <= 0:
+        return lat, lon
+    targets = np.arange(0.0, dist[-1], step_m)
+    targets = np.append(targets, dist[-1])
+    return np.interp(targets, dist, lat), np.interp(targets, dist, lon)
+
+
+def simplify_track(lat, lon, tolerance_m):
+    """
+    Vereinfacht einen Track mit dem Douglas-Peucker-Verfahren. Die Abstände der Punkte
+    eines Abschnitts zur Sehne werden pro Schritt vektorisiert berechnet; statt Rekursion
+    wird ein expliziter Stack verwendet.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+        tolerance_m (float): Maximal erlaubte Abweichung in Metern.
+
+    Returns:
+        numpy.ndarray: Die Indizes der beibehaltenen Punkte (aufsteigend sortiert).
+    """
+    n = len(lat)
+    if n < 3:
+        return np.arange(n)
+    x, y = to_local_xy(lat, lon)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        px = x[start + 1:end]
+        py = y[start + 1:end]
+        dx = x[end] - x[start]
+        dy = y[end] - y[start]
+        seg_len = np.hypot(dx, dy)
+        if seg_len == 0:
+            dists = np.hypot(px - x[start], py - y[start])
+        else:
+            dists = np.abs(dy * (px - x[start]) - dx * (py - y[start])) / seg_len
+        idx = int(np.argmax(dists))
+        if dists[idx] > tolerance_m:
+            split = start + 1 + idx
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return np.flatnonzero(keep)
+
+
+def downsample_lttb(x, y, n_out):
+    """
+    Dünnt eine Zeitreihe mit Largest-Triangle-Three-Buckets aus: Die Punkte werden in `n_out - 2`
+    gleich große Abschnitte geteilt, und aus jedem bleibt der Punkt, der mit dem zuletzt gewählten
+    Punkt und dem Mittelwert des nächsten Abschnitts das größte Dreieck bildet. So bleibt die Form
+    der Kurve erhalten. Zusätzlich werden Minimum und Maximum immer beibehalten.
+
+    Args:
+        x (array-like): Aufsteigende x-Werte (z.B. Zeitstempel als int64-Nanosekunden), ohne NaN.
+        y (array-like): Messwerte, ohne NaN.
+        n_out (int): Gewünschte Punktzahl (Minimum und Maximum kommen ggf. hinzu).
+
+    Returns:
+        numpy.ndarray: Die Indizes der beibehaltenen Punkte (aufsteigend sortiert).
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    selected = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs((x[selected] - avg_x) * (y[start:end] - y[selected])
+                      - (x[selected] - x[start:end]) * (avg_y - y[selected]))
+        selected = start + int(np.argmax(area))
+        keep[i + 1] = selected
+    return np.union1d(keep, [int(np.argmin(y)), int(np.argmax(y))])
+
+
+def bounding_box(lat, lon):
+    """
+    Bestimmt die Bounding Box eines Tracks.
+
+    Args:
+        lat (numpy.ndarray): Breitengrade in Grad.
+        lon (numpy.ndarray): Längengrade in Grad.
+
+    Returns:
+        list: [min_lat, min_lon, max_lat, max_lon]
+    """
+    return [float(np.min(lat)), float(np.min(lon)), float(np.max(lat)), float(np.max(lon))]
@@ -1,4 +1,6 @@
 import os
+import sys
+import importlib.util
 
 def normalize_path_slashes(path_string: str) -> str:
     """
@@ -13,4 +15,29 @@ def normalize_path_slashes(path_string: str) -> str:
     """
     if path_string is None:
         return None
-    return path_string.replace('\\', '/')
\ No newline at end of file
+    return path_string.replace('\\', '/')
+
+def lazy_import(module_name: str):
+    """
+    Importiert ein Modul erst beim ersten Attributzugriff (`importlib.util.LazyLoader`).
+    Für schwere Bibliotheken (pandas, plotly, folium, ...), die eine Seite nur in bestimmten
+    Zweigen braucht: `pd = lazy_import("pandas")` statt `import pandas as pd`.
+    Ist das Modul bereits geladen, wird es direkt zurückgegeben.
+
+    Args:
+        module_name (str): Voller Modulname, z.B. "plotly.express".
+
+    Returns:
+        module: Das (noch nicht ausgeführte) Modul.
+    """
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.find_spec(module_name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {module_name!r}", name=module_name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    loader.exec_module(module)
+    return module
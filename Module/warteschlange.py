@@ -0,0 +1,421 @@
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import threading
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.datenbank import DB_PATH, get_connection, transaction, open_table
+from Module.dateiablage import release_files
+
+# --- Konfiguration & Konstanten ---
+JOB_STEPS = ('auswerten', 'ableiten', 'indizieren')  # Reihenfolge der Verarbeitungsschritte
+JOB_WORKERS = 2        # Gleichzeitig laufende Aufträge (je ein Worker-Prozess)
+POLL_S = 2.0           # Takt, in dem laufende Aufträge ein Lebenszeichen bekommen
+IDLE_POLL_S = 10.0     # Ohne laufende Aufträge: so oft nach neuen (z.B. aus anderen Prozessen) sehen
+LEASE_S = 30.0         # Laufende Aufträge ohne Lebenszeichen gelten danach als abgebrochen (Neustart, Absturz)
+MAX_ATTEMPTS = 3       # Versuche pro Auftrag, bevor er als fehlgeschlagen gilt
+PROCESSING_FIELD = 'verarbeitung'  # Trainingsfeld: 'ausstehend' während der Verarbeitung, 'fehler' danach
+# Werte, die beim Auswerten aus der FIT-/GPX-Datei übernommen werden, wenn das Formular sie leer gelassen hat
+FILLED_FIELDS = ('dauer', 'distanz', 'puls', 'avg_speed_kmh', 'elevation_gain_pos', 'elevation_gain_neg')
+
+# Einzelne Anweisungen statt executescript(), das eine umgebende Transaktion vorzeitig bestätigen würde
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS jobs (
+        job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        training_id INTEGER NOT NULL,
+        person_id INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        steps_done TEXT NOT NULL DEFAULT '[]',
+        release_files TEXT NOT NULL DEFAULT '[]',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        error TEXT,
+        heartbeat REAL,
+        created_at TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, job_id)",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_training ON jobs(training_id)",
+)
+
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+_dispatcher_lock = threading.Lock()
+_dispatchers = {}
+
+
+class StepFailedError(Exception):
+    """Ein oder mehrere Verarbeitungsschritte sind fehlgeschlagen; die übrigen sind als erledigt gespeichert."""
+
+
+def _conn(db_path):
+    conn = get_connection(db_path)
+    with _schema_lock:
+        if db_path not in _initialized_paths:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            # Ältere Datenbanken: Spalte für die nach dem Auftrag freizugebenden Dateien ergänzen
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'release_files' not in existing:
+                conn.execute("ALTER TABLE jobs ADD COLUMN release_files TEXT NOT NULL DEFAULT '[]'")
+            _initialized_paths.add(db_path)
+    return conn
+
+
+# --- Aufträge anlegen & abfragen ---
+
+def enqueue_training(training_id, person_id, release_paths=(), db_path=DB_PATH):
+    """
+    Stellt die Verarbeitung eines Trainings (Dateien auswerten, Zusammenfassung, Strecken/Heatmap,
+    Segmente) in die Warteschlange und markiert das Training als ausstehend. Sollte in derselben
+    `transaction()` wie das Speichern des Trainings laufen, damit nach einem Absturz kein Training
+    ohne Auftrag übrig bleibt; danach `start_worker()` aufrufen.
+
+    Args:
+        training_id (int): Die doc_id des Trainings.
+        person_id (int): Die doc_id der Person, der das Training gehört.
+        release_paths (iterable, optional): Ersetzte Dateien. Sie werden erst nach dem Auftrag freigegeben,
+                                            weil die Heatmap den alten Beitrag aus der alten Datei abzieht.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        int: Die ID des Auftrags.
+    """
+    conn = _conn(db_path)
+    with transaction(db_path):
+        # Ein noch wartender Auftrag desselben Trainings wird durch den neuen ersetzt (samt seiner freizugebenden Dateien)
+        paths = set(filter(None, release_paths))
+        for (replaced_paths,) in conn.execute("SELECT release_files FROM jobs WHERE training_id = ? AND status != 'laeuft'",
+                                              (int(training_id),)).fetchall():
+            paths.update(json.loads(replaced_paths))
+        conn.execute("DELETE FROM jobs WHERE training_id = ? AND status != 'laeuft'", (int(training_id),))
+        cursor = conn.execute("INSERT INTO jobs (training_id, person_id, status, release_files, created_at) "
+                              "VALUES (?, ?, 'wartend', ?, ?)",
+                              (int(training_id), int(person_id), json.dumps(sorted(paths)),
+                               datetime.now().isoformat(timespec='seconds')))
+        open_table('trainings', db_path=db_path).update({PROCESSING_FIELD: 'ausstehend'}, doc_ids=[int(training_id)])
+    return cursor.lastrowid
+
+
+def pending_jobs(person_id, db_path=DB_PATH):
+    """
+    Liefert die noch nicht abgeschlossenen Aufträge einer Person (für die Anzeige in der Trainingsliste).
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        dict: training_id -> {'status': 'wartend' | 'laeuft' | 'fehler', 'fehler': Fehlermeldung oder None}.
+    """
+    rows = _conn(db_path).execute("SELECT training_id, status, error FROM jobs WHERE person_id = ? ORDER BY job_id",
+                                  (int(person_id),)).fetchall()
+    return {training_id: {'status': status, 'fehler': error} for training_id, status, error in rows}
+
+
+def retry_job(training_id, db_path=DB_PATH):
+    """
+    Setzt einen fehlgeschlagenen Auftrag zurück, sodass er erneut (mit allen Versuchen) verarbeitet wird.
+    Danach `start_worker()` aufrufen.
+
+    Args:
+        training_id (int): Die doc_id des Trainings.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        bool: True, wenn ein Auftrag zurückgesetzt wurde.
+    """
+    conn = _conn(db_path)
+    with transaction(db_path):
+        changed = conn.execute("UPDATE jobs SET status = 'wartend', attempts = 0, error = NULL "
+                               "WHERE training_id = ? AND status = 'fehler'", (int(training_id),)).rowcount
+        if changed:
+            open_table('trainings', db_path=db_path).update({PROCESSING_FIELD: 'ausstehend'}, doc_ids=[int(training_id)])
+    return bool(changed)
+
+
+def _claim_job(db_path):
+    """Übernimmt den ältesten wartenden Auftrag; abgebrochene Aufträge werden vorher wieder freigegeben."""
+    conn = _conn(db_path)
+    now = time.time()
+    with transaction(db_path):
+        conn.execute("UPDATE jobs SET status = 'wartend' WHERE status = 'laeuft' AND heartbeat < ?", (now - LEASE_S,))
+        # Aufträge desselben Trainings laufen nie gleichzeitig
+        row = conn.execute("SELECT job_id FROM jobs WHERE status = 'wartend' AND training_id NOT IN "
+                           "(SELECT training_id FROM jobs WHERE status = 'laeuft') ORDER BY job_id LIMIT 1").fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET status = 'laeuft', attempts = attempts + 1, heartbeat = ? WHERE job_id = ?",
+                     (now, row[0]))
+    return row[0]
+
+
+def _fail_job(job_id, error, db_path):
+    """Gibt einen Auftrag nach einem Fehler zur Wiederholung frei oder markiert ihn (und das Training) als fehlgeschlagen."""
+    conn = _conn(db_path)
+    with transaction(db_path):
+        row = conn.execute("SELECT training_id, attempts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return
+        training_id, attempts = row
+        status = 'wartend' if attempts < MAX_ATTEMPTS else 'fehler'
+        conn.execute("UPDATE jobs SET status = ?, error = ? WHERE job_id = ?", (status, str(error), job_id))
+        if status == 'fehler':
+            open_table('trainings', db_path=db_path).update({PROCESSING_FIELD: 'fehler'}, doc_ids=[training_id])
+
+
+# --- Verarbeitungsschritte (laufen in den Worker-Prozessen) ---
+
+def _values_from_files(training):
+    """Liest Dauer, Distanz, Puls, Geschwindigkeit und Höhenmeter aus der FIT- bzw. GPX-Datei, soweit sie im Training fehlen."""
+    from Module.hilfsfunktionenedittraining import parse_fit_data, parse_gpx_data
+
+    missing = [field for field in FILLED_FIELDS if not training.get(field)]
+    if not missing:
+        return {}
+    fit_file, gpx_file = training.get('fit_file'), training.get('gpx_file')
+    if fit_file and os.path.exists(fit_file):
+        duration, distance, _, _, puls, avg_speed, elev_pos, elev_neg = parse_fit_data(fit_file)
+    elif gpx_file and os.path.exists(gpx_file):
+        result = parse_gpx_data(gpx_file)
+        if len(result) != 6:
+            return {}
+        duration, distance, _, avg_speed, elev_pos, elev_neg = result
+        puls = 0
+    else:
+        return {}
+    values = {
+        'dauer': duration,
+        'distanz': round(distance or 0.0, 2),
+        'puls': puls,
+        'avg_speed_kmh': round(avg_speed or 0.0, 2),
+        'elevation_gain_pos': elev_pos,
+        'elevation_gain_neg': elev_neg,
+    }
+    return {field: values[field] for field in missing if values[field]}
+
+
+def _step_auswerten(training_id, training, person_id, db_path):
+    """Ergänzt fehlende Werte aus den Dateien und trägt das Training in die Zusammenfassung ein."""
+    from Module.zusammenfassung import training_contribution, add_training_to_summary, get_contribution
+
+    changes = _values_from_files(training)
+    training = {**training, **changes}
+    contribution = training_contribution(training, previous=get_contribution(training_id, db_path))
+    with transaction(db_path):
+        if changes:
+            open_table('trainings', db_path=db_path).update(changes, doc_ids=[training_id])
+        add_training_to_summary(person_id, training_id, training, contribution, db_path=db_path)
+    return []
+
+
+def _step_ableiten(training_id, training, person_id, db_path):
+    """Strecken-Fingerprint und Heatmap (ein bereits enthaltener Beitrag wird ersetzt)."""
+    from Module.streckenerkennung import get_routen_index
+    from Module.heatmap import PersonalHeatmap
+
+    errors = []
+    try:
+        get_routen_index().add_training(training_id, training, person_id)
+    except Exception as e:
+        errors.append(f"Streckenerkennung: {e}")
+    try:
+        heatmap = PersonalHeatmap(person_id)
+        heatmap.remove_training(training_id)
+        heatmap.add_training(training_id, training)
+    except Exception as e:
+        errors.append(f"Heatmap: {e}")
+    return errors
+
+
+def _step_indizieren(training_id, training, person_id, db_path):
+    """Segment-Befahrungen für die Bestenlisten."""
+    from Module.segmente import match_training_against_segments
+
+    try:
+        match_training_against_segments(training_id, training, person_id)
+    except Exception as e:
+        return [f"Segmente: {e}"]
+    return []
+
+
+_STEP_FUNCTIONS = {
+    'auswerten': _step_auswerten,
+    'ableiten': _step_ableiten,
+    'indizieren': _step_indizieren,
+}
+
+
+def run_job(job_id, db_path=DB_PATH):
+    """
+    Führt die noch offenen Schritte eines Auftrags aus. Jeder abgeschlossene Schritt wird gespeichert,
+    sodass ein unterbrochener Auftrag nach einem Neustart dort weitermacht. Schlägt ein Teil eines
+    Schritts fehl (z.B. die Streckenerkennung), laufen die übrigen Schritte trotzdem; der Schritt bleibt
+    offen und der Auftrag endet mit `StepFailedError`, sodass er wie jeder Fehler wiederholt bzw. als
+    fehlgeschlagen markiert wird. Sonst wird am Ende die Markierung am Training entfernt, der Auftrag gelöscht
+    und die ersetzten Dateien werden freigegeben (erst jetzt hat die Heatmap ihren alten Beitrag abgezogen).
+
+    Args:
+        job_id (int): Die ID des Auftrags.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        None
+
+    Raises:
+        StepFailedError: Wenn mindestens ein Schritt fehlgeschlagen ist (Meldung mit allen Fehlern).
+    """
+    conn = _conn(db_path)
+    row = conn.execute("SELECT training_id, person_id, steps_done, release_files FROM jobs WHERE job_id = ?",
+                       (job_id,)).fetchone()
+    if row is None:
+        return
+    training_id, person_id, steps_done, replaced_paths = row[0], row[1], json.loads(row[2]), json.loads(row[3])
+    trainings = open_table('trainings', db_path=db_path)
+    failures = []
+    for step in JOB_STEPS:
+        if step in steps_done:
+            continue
+        training = trainings.get(doc_id=training_id)
+        if training is None:
+            break  # Zwischenzeitlich gelöscht
+        errors = _STEP_FUNCTIONS[step](training_id, dict(training), person_id, db_path)
+        if errors:
+            failures.extend(errors)
+            continue
+        steps_done.append(step)
+        conn.execute("UPDATE jobs SET steps_done = ?, heartbeat = ? WHERE job_id = ?",
+                     (json.dumps(steps_done), time.time(), job_id))
+    if failures and trainings.get(doc_id=training_id) is not None:
+        raise StepFailedError("; ".join(failures))
+    with transaction(db_path):
+        if trainings.get(doc_id=training_id) is not None:
+            trainings.update(lambda training: training.pop(PROCESSING_FIELD, None), doc_ids=[training_id])
+        conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+    release_files(replaced_paths, db_path)
+
+
+# --- Hintergrund-Worker ---
+
+class _Dispatcher(threading.Thread):
+    """
+    Hintergrund-Thread, der wartende Aufträge übernimmt und in einem Prozesspool ausführt. Laufende
+    Aufträge bekommen regelmäßig ein Lebenszeichen; bleibt es aus (Serverneustart), übernimmt der
+    nächste Dispatcher sie wieder.
+    """
+
+    def __init__(self, db_path):
+        super().__init__(name=f"warteschlange:{db_path}", daemon=True)
+        self.db_path = db_path
+        self.wakeup = threading.Event()
+        self.running = {}  # Future -> job_id
+        self.pool = None
+
+    def run(self):
+        while True:
+            try:
+                self._dispatch()
+            except Exception as e:
+                print(f"Warnung: Warteschlange konnte keine Aufträge übernehmen: {e}")
+            if self.running:
+                done, _ = wait(list(self.running), timeout=POLL_S, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._finish(self.running.pop(future), future)
+            else:
+                if self.pool is not None:
+                    # Leerlauf: Worker-Prozesse freigeben, beim nächsten Auftrag neu starten
+                    self.pool.shutdown(wait=False)
+                    self.pool = None
+                self.wakeup.wait(IDLE_POLL_S)
+                self.wakeup.clear()
+
+    def _dispatch(self):
+        if self.running:
+            _conn(self.db_path).execute(
+                f"UPDATE jobs SET heartbeat = ? WHERE job_id IN ({','.join('?' * len(self.running))})",
+                (time.time(), *self.running.values()))
+        while len(self.running) < JOB_WORKERS:
+            job_id = _claim_job(self.db_path)
+            if job_id is None:
+                return
+            if self.pool is None:
+                # "spawn": keine Kopie der Streamlit-Threads im Worker
+                self.pool = ProcessPoolExecutor(max_workers=JOB_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+            self.running[self.pool.submit(run_job, job_id, self.db_path)] = job_id
+
+    def _finish(self, job_id, future):
+        error = future.exception()
+        if error is None:
+            return
+        if isinstance(error, BrokenProcessPool):
+            self.pool = None
+        try:
+            _fail_job(job_id, error, self.db_path)
+        except Exception as e:
+            print(f"Warnung: Fehler von Auftrag {job_id} konnte nicht gespeichert werden: {e}")
+
+
+def start_worker(db_path=DB_PATH):
+    """
+    Startet (einmal pro Prozess) den Hintergrund-Worker bzw. weckt ihn nach dem Einstellen eines
+    Auftrags. Beim ersten Aufruf nach einem Serverneustart werden unterbrochene Aufträge fortgesetzt.
+
+    Args:
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        None
+    """
+    with _dispatcher_lock:
+        dispatcher = _dispatchers.get(db_path)
+        if dispatcher is None or not dispatcher.is_alive():
+            dispatcher = _dispatchers[db_path] = _Dispatcher(db_path)
+            dispatcher.start()
+    dispatcher.wakeup.set()
+
+
+def process_pending(db_path=DB_PATH):
+    """
+    Arbeitet alle wartenden (und abgebrochenen) Aufträge im aktuellen Prozess ab, z.B. von der Kommandozeile.
+
+    Args:
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        tuple: (Anzahl abgeschlossener, Anzahl fehlgeschlagener Versuche).
+    """
+    finished = failed = 0
+    while True:
+        job_id = _claim_job(db_path)
+        if job_id is None:
+            return finished, failed
+        try:
+            run_job(job_id, db_path)
+            finished += 1
+        except Exception as e:
+            _fail_job(job_id, e, db_path)
+            failed += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warteschlange für die Verarbeitung neuer Trainings.")
+    parser.add_argument("--abarbeiten", action="store_true", help="Wartende Aufträge in diesem Prozess abarbeiten")
+    parser.add_argument("--wiederholen", action="store_true", help="Fehlgeschlagene Aufträge erneut einreihen")
+    args = parser.parse_args()
+
+    if args.wiederholen:
+        for (training_id,) in _conn(DB_PATH).execute("SELECT training_id FROM jobs WHERE status = 'fehler'").fetchall():
+            retry_job(training_id)
+    if args.abarbeiten:
+        finished, failed = process_pending()
+        print(f"{finished} Auftrag/Aufträge abgeschlossen, {failed} fehlgeschlagen.")
+    for status, count in _conn(DB_PATH).execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall():
+        print(f"{status}: {count}")
@@ -0,0 +1,431 @@
+import os
+import sys
+import json
+import inspect
+import threading
+from datetime import datetime
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.datenbank import DB_PATH, get_connection, transaction, open_table
+from Module.utils import lazy_import
+from Module.laufzeitprofil import timed
+from Module.trackdaten import read_fit_records
+
+np = lazy_import("numpy")
+
+# --- Konfiguration & Konstanten ---
+SUMMENFELDER = ('distanz_km', 'dauer_min', 'hm_auf', 'hm_ab')
+GRUPPEN = {'sportarten': 'sportart', 'monate': 'monat', 'jahre': 'jahr'}
+RUNDUNG = 3  # Nachkommastellen der Summen (verhindert Rundungsdrift beim Addieren/Subtrahieren)
+# Zeitfenster der Power Curve (mittlere Maximalleistung) in Sekunden bzw. Datensätzen (1 Hz)
+MMP_FENSTER_S = (1, 5, 10, 30, 60, 120, 300, 600, 900, 1200, 1800, 3600)
+
+# Einzelne Anweisungen statt executescript(), das eine umgebende Transaktion vorzeitig bestätigen würde
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS training_beitraege (
+        training_id INTEGER PRIMARY KEY,
+        person_id INTEGER NOT NULL,
+        data TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_training_beitraege_person ON training_beitraege(person_id)",
+    """CREATE TABLE IF NOT EXISTS person_zusammenfassung (
+        person_id INTEGER PRIMARY KEY,
+        data TEXT NOT NULL,
+        updated_at TEXT
+    )""",
+)
+
+_schema_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _conn(db_path):
+    conn = get_connection(db_path)
+    with _schema_lock:
+        if db_path not in _initialized_paths:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            _initialized_paths.add(db_path)
+    return conn
+
+
+def _as_number(value, cast=float):
+    try:
+        return cast(value)
+    except (ValueError, TypeError):
+        return 0
+
+
+def read_fit_max_heart_rate(fit_filepath):
+    """
+    Liest die höchste gemessene Herzfrequenz aus einer FIT-Datei (aus den zwischengespeicherten
+    Datensätzen von `read_fit_records`, die Datei wird also nicht eigens geparst).
+
+    Args:
+        fit_filepath (str): Pfad zur FIT-Datei.
+
+    Returns:
+        int: Maximale Herzfrequenz in bpm (0, wenn keine Werte vorhanden sind oder die Datei fehlt).
+    """
+    records = read_fit_records(fit_filepath)
+    if records is None or records["heart_rate"].isna().all():
+        return 0
+    return int(records["heart_rate"].max())
+
+
+def best_efforts(power_values):
+    """
+    Berechnet die mittlere Maximalleistung (MMP) für jedes Zeitfenster aus `MMP_FENSTER_S`
+    über Präfixsummen (ein Durchlauf pro Fenster statt eines Rolling-Mittels).
+
+    Args:
+        power_values (array-like): Leistungswerte in Watt, ein Wert pro Sekunde; NaN wird ignoriert.
+
+    Returns:
+        dict: {Fenster in Sekunden (als str, wie in JSON gespeichert): Leistung in Watt};
+              Fenster, die länger als die Aufzeichnung sind, fehlen.
+    """
+    values = np.asarray(power_values, dtype=float)
+    values = values[~np.isnan(values)]
+    prefix = np.concatenate(([0.0], np.cumsum(values)))
+    return {str(window): int((prefix[window:] - prefix[:-window]).max() / window)
+            for window in MMP_FENSTER_S if window <= len(values)}
+
+
+def read_fit_power_curve(fit_filepath):
+    """
+    Liest die Power Curve (MMP) eines Trainings aus seiner FIT-Datei (siehe `best_efforts`).
+
+    Args:
+        fit_filepath (str): Pfad zur FIT-Datei.
+
+    Returns:
+        dict: {Fenster: Watt}; leer, wenn die Datei fehlt oder keine Leistungsdaten enthält.
+    """
+    records = read_fit_records(fit_filepath)
+    if records is None or records["power"].isna().all():
+        return {}
+    return best_efforts(records["power"])
+
+
+def training_contribution(training, previous=None):
+    """
+    Berechnet den Beitrag eines Trainings zur Zusammenfassung. Das Öffnen der FIT-Datei
+    (für die gemessene Maximalherzfrequenz und die Power Curve) ist der teure Teil und sollte
+    außerhalb einer Schreibtransaktion geschehen.
+
+    Args:
+        training (dict): Das Trainings-Dokument.
+        previous (dict, optional): Bisheriger Beitrag desselben Trainings; ist die FIT-Datei
+                                   unverändert, werden dessen `max_hr` und `mmp` übernommen.
+
+    Returns:
+        dict: Gruppierungsschlüssel (sportart, monat, jahr), Summenfelder, `max_hr`, `mmp`
+              (Power Curve, siehe `best_efforts`) und die FIT-Datei, aus der beide stammen.
+    """
+    date = str(training.get('date') or "")
+    fit_file = training.get('fit_file')
+    if previous is not None and previous.get('fit_file') == fit_file and 'mmp' in previous:
+        max_hr, mmp = previous.get('max_hr', 0), previous['mmp']
+    else:
+        max_hr, mmp = read_fit_max_heart_rate(fit_file), read_fit_power_curve(fit_file)
+    return {
+        'sportart': training.get('sportart') or "Unbekannt",
+        'monat': date[:7] if len(date) >= 7 else "ohne Datum",
+        'jahr': date[:4] if len(date) >= 4 else "ohne Datum",
+        'distanz_km': _as_number(training.get('distanz', 0)),
+        'dauer_min': _as_number(training.get('dauer', 0)),
+        'hm_auf': _as_number(training.get('elevation_gain_pos', 0), int),
+        'hm_ab': _as_number(training.get('elevation_gain_neg', 0), int),
+        'max_hr': max_hr,
+        'mmp': mmp,
+        'fit_file': fit_file,
+    }
+
+
+def _empty_bucket():
+    return {'anzahl': 0, **{field: 0 for field in SUMMENFELDER}, 'max_hr': 0}
+
+
+def _empty_summary():
+    return {'gesamt': _empty_bucket(), **{group: {} for group in GRUPPEN}}
+
+
+def _add_to_bucket(bucket, contribution, sign):
+    bucket['anzahl'] += sign
+    for field in SUMMENFELDER:
+        bucket[field] = round(bucket[field] + sign * contribution[field], RUNDUNG)
+
+
+def _apply_contribution(summary, contribution, sign):
+    """Addiert (sign=+1) oder subtrahiert (sign=-1) einen Beitrag in Gesamt- und Gruppenwerten."""
+    _add_to_bucket(summary['gesamt'], contribution, sign)
+    if sign > 0:
+        summary['gesamt']['max_hr'] = max(summary['gesamt']['max_hr'], contribution['max_hr'])
+    for group, key_field in GRUPPEN.items():
+        key = contribution[key_field]
+        bucket = summary[group].setdefault(key, _empty_bucket())
+        _add_to_bucket(bucket, contribution, sign)
+        if sign > 0:
+            bucket['max_hr'] = max(bucket['max_hr'], contribution['max_hr'])
+        elif bucket['anzahl'] <= 0:
+            del summary[group][key]
+
+
+def _refresh_max_hr(conn, summary, person_id):
+    """
+    Maxima lassen sich nicht abziehen: nach dem Entfernen eines Beitrags werden sie aus den
+    gespeicherten Beiträgen der Person neu bestimmt (ohne FIT-Dateien zu öffnen).
+    """
+    contributions = [json.loads(row[0]) for row in conn.execute(
+        "SELECT data FROM training_beitraege WHERE person_id = ?", (person_id,))]
+    summary['gesamt']['max_hr'] = max((c['max_hr'] for c in contributions), default=0)
+    for group, key_field in GRUPPEN.items():
+        for key, bucket in summary[group].items():
+            bucket['max_hr'] = max((c['max_hr'] for c in contributions if c[key_field] == key), default=0)
+
+
+def _load_summary(conn, person_id):
+    row = conn.execute("SELECT data FROM person_zusammenfassung WHERE person_id = ?", (person_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _save_summary(conn, person_id, summary):
+    conn.execute("INSERT OR REPLACE INTO person_zusammenfassung (person_id, data, updated_at) VALUES (?, ?, ?)",
+                 (person_id, json.dumps(summary, ensure_ascii=False), datetime.now().isoformat(timespec='seconds')))
+
+
+def get_contribution(training_id, db_path=DB_PATH):
+    """
+    Liefert den gespeicherten Beitrag eines Trainings (z.B. als `previous` für `training_contribution`).
+
+    Args:
+        training_id (int): Die doc_id des Trainings.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        dict or None: Der Beitrag oder None, wenn keiner gespeichert ist.
+    """
+    row = _conn(db_path).execute("SELECT data FROM training_beitraege WHERE training_id = ?", (int(training_id),)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _remove_contribution(conn, summary, training_id):
+    """Zieht den gespeicherten Beitrag eines Trainings ab. Liefert die Person oder None."""
+    row = conn.execute("SELECT person_id, data FROM training_beitraege WHERE training_id = ?", (training_id,)).fetchone()
+    if row is None:
+        return None
+    conn.execute("DELETE FROM training_beitraege WHERE training_id = ?", (training_id,))
+    if summary is not None:
+        _apply_contribution(summary, json.loads(row[1]), -1)
+    return row[0]
+
+
+def add_training_to_summary(person_id, training_id, training, contribution=None, db_path=DB_PATH):
+    """
+    Trägt ein neues oder geändertes Training in die Zusammenfassung der Person ein. Ein bereits
+    gespeicherter Beitrag desselben Trainings wird vorher abgezogen. Läuft innerhalb einer
+    umgebenden `transaction()` im selben Commit wie das Training selbst.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        training_id (int): Die doc_id des Trainings.
+        training (dict): Das Trainings-Dokument.
+        contribution (dict, optional): Vorab mit `training_contribution` berechneter Beitrag.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        None
+    """
+    person_id, training_id = int(person_id), int(training_id)
+    if contribution is None:
+        contribution = training_contribution(training)
+    _conn(db_path)
+    with transaction(db_path) as conn:
+        summary = _load_summary(conn, person_id)
+        if summary is None:
+            # Noch keine Zusammenfassung: erst beim nächsten Lesen vollständig aufbauen
+            conn.execute("INSERT OR REPLACE INTO training_beitraege (training_id, person_id, data) VALUES (?, ?, ?)",
+                         (training_id, person_id, json.dumps(contribution)))
+            return
+        previous_owner = _remove_contribution(conn, summary, training_id)
+        conn.execute("INSERT INTO training_beitraege (training_id, person_id, data) VALUES (?, ?, ?)",
+                     (training_id, person_id, json.dumps(contribution)))
+        _apply_contribution(summary, contribution, +1)
+        if previous_owner is not None:
+            _refresh_max_hr(conn, summary, person_id)
+        _save_summary(conn, person_id, summary)
+
+
+def remove_training_from_summary(training_id, db_path=DB_PATH):
+    """
+    Entfernt den Beitrag eines gelöschten Trainings aus der Zusammenfassung seiner Person.
+
+    Args:
+        training_id (int): Die doc_id des Trainings.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        None
+    """
+    _conn(db_path)
+    with transaction(db_path) as conn:
+        row = conn.execute("SELECT person_id FROM training_beitraege WHERE training_id = ?", (int(training_id),)).fetchone()
+        if row is None:
+            return
+        person_id = row[0]
+        summary = _load_summary(conn, person_id)
+        _remove_contribution(conn, summary, int(training_id))
+        if summary is not None:
+            _refresh_max_hr(conn, summary, person_id)
+            _save_summary(conn, person_id, summary)
+
+
+@timed()
+def compute_summary(person_id, db_path=DB_PATH, reuse_contributions=True):
+    """
+    Berechnet die Zusammenfassung einer Person vollständig aus ihren Trainings.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+        reuse_contributions (bool, optional): Gespeicherte Maximalherzfrequenzen wiederverwenden, solange
+                                              die FIT-Datei unverändert ist (sonst werden alle FIT-Dateien gelesen).
+
+    Returns:
+        tuple: (summary, contributions) mit {training_id: Beitrag}.
+    """
+    conn = _conn(db_path)
+    stored = {}
+    if reuse_contributions:
+        stored = {row[0]: json.loads(row[1]) for row in conn.execute(
+            "SELECT training_id, data FROM training_beitraege WHERE person_id = ?", (int(person_id),))}
+    summary = _empty_summary()
+    contributions = {}
+    for training in open_table('trainings', db_path).search_by_person(int(person_id)):
+        contribution = training_contribution(training, previous=stored.get(training.doc_id))
+        contributions[training.doc_id] = contribution
+        _apply_contribution(summary, contribution, +1)
+    return summary, contributions
+
+
+def rebuild_summary(person_id, db_path=DB_PATH, reuse_contributions=True):
+    """
+    Baut die Zusammenfassung einer Person von Grund auf neu und speichert sie.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+        reuse_contributions (bool, optional): Siehe `compute_summary`.
+
+    Returns:
+        dict: Die neue Zusammenfassung.
+    """
+    person_id = int(person_id)
+    summary, contributions = compute_summary(person_id, db_path, reuse_contributions)
+    with transaction(db_path) as conn:
+        conn.execute("DELETE FROM training_beitraege WHERE person_id = ?", (person_id,))
+        conn.executemany("INSERT OR REPLACE INTO training_beitraege (training_id, person_id, data) VALUES (?, ?, ?)",
+                         [(training_id, person_id, json.dumps(c)) for training_id, c in contributions.items()])
+        _save_summary(conn, person_id, summary)
+    return summary
+
+
+@timed()
+def get_summary(person_id, db_path=DB_PATH):
+    """
+    Liefert die gespeicherte Zusammenfassung einer Person; fehlt sie, wird sie einmalig aufgebaut.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        dict: {'gesamt': {...}, 'sportarten': {...}, 'monate': {...}, 'jahre': {...}}, jeweils mit
+              'anzahl', 'distanz_km', 'dauer_min', 'hm_auf', 'hm_ab' und 'max_hr'.
+    """
+    summary = _load_summary(_conn(db_path), int(person_id))
+    if summary is None:
+        summary = rebuild_summary(person_id, db_path)
+    return summary
+
+
+@timed()
+def get_power_curve(person_id, db_path=DB_PATH):
+    """
+    Liefert die akkumulierte Power Curve einer Person als Maximum der gespeicherten Power Curves
+    ihrer Trainings. Es wird keine FIT-Datei gelesen, außer für Beiträge aus der Zeit vor der
+    Power Curve; diese werden einmalig ergänzt und gespeichert.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        dict: {Fenster in Sekunden (int): beste mittlere Leistung in Watt}, nach Fenster sortiert.
+    """
+    conn = _conn(db_path)
+    best = {}
+    upgraded = []
+    for training_id, data in conn.execute(
+            "SELECT training_id, data FROM training_beitraege WHERE person_id = ?", (int(person_id),)).fetchall():
+        contribution = json.loads(data)
+        if 'mmp' not in contribution:
+            contribution['mmp'] = read_fit_power_curve(contribution.get('fit_file'))
+            upgraded.append((json.dumps(contribution), training_id, data))
+        for window, watts in contribution['mmp'].items():
+            best[int(window)] = max(best.get(int(window), 0), watts)
+    if upgraded:
+        with transaction(db_path) as conn:
+            # Nur ersetzen, was inzwischen nicht neu geschrieben wurde
+            conn.executemany("UPDATE training_beitraege SET data = ? WHERE training_id = ? AND data = ?", upgraded)
+    return dict(sorted(best.items()))
+
+
+def _differences(expected, actual, path=""):
+    if isinstance(expected, dict) and isinstance(actual, dict):
+        differences = []
+        for key in sorted(set(expected) | set(actual)):
+            differences += _differences(expected.get(key), actual.get(key), f"{path}/{key}")
+        return differences
+    if isinstance(expected, (int, float)) and isinstance(actual, (int, float)):
+        return [] if abs(expected - actual) < 10 ** -RUNDUNG else [f"{path}: {actual} statt {expected}"]
+    return [] if expected == actual else [f"{path}: {actual} statt {expected}"]
+
+
+def check_summary(person_id, repair=False, db_path=DB_PATH):
+    """
+    Konsistenzprüfung: vergleicht die gespeicherte Zusammenfassung mit einer Neuberechnung
+    aus allen Trainings (inklusive aller FIT-Dateien).
+
+    Args:
+        person_id (int): Die doc_id der Person.
+        repair (bool, optional): Bei Abweichungen die Zusammenfassung neu aufbauen.
+        db_path (str, optional): Pfad zur SQLite-Datei.
+
+    Returns:
+        list: Beschreibungen der Abweichungen (leer, wenn alles übereinstimmt).
+    """
+    stored = _load_summary(_conn(db_path), int(person_id))
+    if stored is None:
+        differences = ["Zusammenfassung fehlt"]
+    else:
+        expected, _ = compute_summary(person_id, db_path, reuse_contributions=False)
+        differences = _differences(expected, stored)
+    if differences and repair:
+        rebuild_summary(person_id, db_path, reuse_contributions=False)
+    return differences
+
+
+if __name__ == "__main__":
+    # Konsistenzprüfung aller Personen: python Module/zusammenfassung.py [--reparieren]
+    repair = "--reparieren" in sys.argv
+    for person in open_table('persons').all():
+        differences = check_summary(person.doc_id, repair=repair)
+        status = "OK" if not differences else f"{len(differences)} Abweichung(en)" + (" – neu aufgebaut" if repair else "")
+        print(f"Person {person.doc_id}: {status}")
+        for difference in differences:
+            print(f"  {difference}")
@@ -0,0 +1,102 @@
+import os
+import re
+import ast
+import sys
+import json
+import glob
+import inspect
+import argparse
+import statistics
+import subprocess
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+# --- Konfiguration & Konstanten ---
+# Streamlit selbst wird vorab importiert und nicht mitgezählt (ist beim Seitenwechsel schon geladen)
+BASELINE = "streamlit"
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def top_level_imports(script_path):
+    """
+    Liest die Import-Anweisungen auf Modulebene eines Skripts (main.py oder einer Seite).
+
+    Args:
+        script_path (str): Pfad zum Skript.
+
+    Returns:
+        str: Die Import-Anweisungen als ausführbarer Quelltext.
+    """
+    with open(script_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return "\n".join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure_imports(script_path):
+    """
+    Importiert die Module eines Skripts in einem frischen Interpreter mit `python -X importtime`
+    (Kaltstart) und summiert die Zeit aller Importe nach `BASELINE`.
+
+    Args:
+        script_path (str): Pfad zum Skript.
+
+    Returns:
+        dict: {'gesamt_ms': Summe, 'module': {Modul der obersten Ebene: ms}}.
+    """
+    code = f"import sys; sys.path.insert(0, {parentdir!r}); import {BASELINE}\n" + top_level_imports(script_path)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=parentdir,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{script_path}: {result.stderr.strip().splitlines()[-1]}")
+    modules = {}
+    after_baseline = False
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if not match or match.group(3):  # nur Module der obersten Ebene (ohne Einrückung)
+            continue
+        name, cumulative_us = match.group(4), int(match.group(2))
+        if after_baseline:
+            modules[name] = modules.get(name, 0) + cumulative_us / 1000
+        elif name == BASELINE:
+            after_baseline = True
+    return {'gesamt_ms': sum(modules.values()), 'module': modules}
+
+
+def run_report(scripts, repetitions):
+    """
+    Misst alle Skripte `repetitions`-mal und bildet jeweils den Median.
+
+    Args:
+        scripts (list): Pfade von main.py und den Seiten.
+        repetitions (int): Anzahl der Messungen pro Skript.
+
+    Returns:
+        dict: {Skript: {'gesamt_ms': Median, 'top': [(Modul, ms), ...]}}.
+    """
+    report = {}
+    for script in scripts:
+        runs = [measure_imports(script) for _ in range(repetitions)]
+        totals = [run['gesamt_ms'] for run in runs]
+        median_run = runs[totals.index(statistics.median_low(totals))]
+        top = sorted(median_run['module'].items(), key=lambda item: item[1], reverse=True)[:5]
+        report[os.path.relpath(script, parentdir)] = {'gesamt_ms': round(median_run['gesamt_ms'], 1),
+                                                      'top': [(name, round(ms, 1)) for name, ms in top]}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importzeiten von main.py und allen Seiten (Kaltstart, python -X importtime).")
+    parser.add_argument("--wiederholungen", type=int, default=3, help="Messungen pro Skript (Median)")
+    parser.add_argument("--ausgabe", default=None, help="Ergebnis zusätzlich als JSON-Datei speichern")
+    args = parser.parse_args()
+
+    scripts = [os.path.join(parentdir, "main.py")] + sorted(glob.glob(os.path.join(parentdir, "pages", "*.py")))
+    report = run_report(scripts, args.wiederholungen)
+    for script, entry in report.items():
+        heaviest = ", ".join(f"{name} {ms:.0f}" for name, ms in entry['top'])
+        print(f"{script:<28} {entry['gesamt_ms']:>8.1f} ms   ({heaviest})")
+    if args.ausgabe:
+        with open(args.ausgabe, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,198 @@
+import os
+import sys
+import json
+import time
+import inspect
+import platform
+import argparse
+import tempfile
+import statistics
+import importlib.util
+from datetime import datetime
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+import streamlit as st
+from Module.datenbank import open_table
+from Module.ekgdata import EKGdata
+from Module.hilfsfunktionenedittraining import parse_gpx_data, parse_fit_data
+from synthetische_daten import (GENERATOR_VERSION, generate_activity, activity_dataframe, write_fit, write_gpx,
+                                write_ekg, create_training_db)
+
+# --- Konfiguration & Konstanten ---
+BASELINE_FILE = os.path.join(currentdir, "baseline_kernfunktionen.json")
+DATA_DIR = os.path.join(tempfile.gettempdir(), "trainingstagebuch_benchmark")
+# Eingabegrößen: "standard" entspricht langen Aufzeichnungen im Betrieb, "klein" ist ein schneller Durchlauf
+UMFAENGE = {
+    'klein': {'ekg_minuten': (5, 15), 'aktivitaet_stunden': (0.5, 1), 'trainings': (500, 2000)},
+    'standard': {'ekg_minuten': (10, 60, 180), 'aktivitaet_stunden': (1, 3, 6), 'trainings': (1000, 5000, 20000)},
+}
+TOLERANZ = 0.25          # Mehr als 25 % langsamer als die Baseline gilt als Regression ...
+RAUSCHGRENZE_MS = 5.0    # ... wenn der Unterschied auch absolut über dieser Grenze liegt
+# Verglichen wird die kürzeste Laufzeit: sie schwankt zwischen zwei Läufen deutlich weniger als der Median
+VERGLEICHSWERT = 'min_ms'
+
+
+def measure(func, repetitions):
+    """
+    Führt `func` mehrfach aus und misst die Laufzeiten.
+
+    Args:
+        func (callable): Die zu messende Funktion ohne Argumente.
+        repetitions (int): Anzahl der Aufrufe.
+
+    Returns:
+        dict: {'median_ms', 'min_ms', 'erster_ms' (erster, ggf. kalter Aufruf), 'wiederholungen'}.
+    """
+    durations = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return {'median_ms': round(statistics.median(durations), 2), 'min_ms': round(min(durations), 2),
+            'erster_ms': round(durations[0], 2), 'wiederholungen': repetitions}
+
+
+def _cached_file(name, writer):
+    """Erzeugt eine Testdatei nur, wenn sie im Datenverzeichnis noch fehlt (die Generatoren sind deterministisch)."""
+    path = os.path.join(DATA_DIR, f"v{GENERATOR_VERSION}_{name}")
+    if not os.path.exists(path):
+        writer(path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def _load_page(file_name):
+    """Importiert eine Seite als Modul, ohne ihr `main()` auszuführen."""
+    path = os.path.join(parentdir, "pages", file_name)
+    spec = importlib.util.spec_from_file_location(f"seite_{os.path.splitext(file_name)[0]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_benchmarks(umfang, repetitions):
+    """
+    Misst die Kernfunktionen über alle Eingabegrößen des Umfangs.
+
+    Args:
+        umfang (str): Schlüssel aus `UMFAENGE`.
+        repetitions (int): Aufrufe pro Messung (Median).
+
+    Returns:
+        dict: {'Funktion [Größe]': Messwerte aus `measure`}.
+    """
+    sizes = UMFAENGE[umfang]
+    trainingsliste = _load_page("Trainingsliste.py")
+    dashboard = _load_page("dashboard.py")
+    results = {}
+
+    def record(name, func, count=repetitions):
+        results[name] = measure(func, count)
+        print(f"{name:<52} {results[name]['min_ms']:>10.1f} ms (Median {results[name]['median_ms']:.1f} ms)", flush=True)
+
+    for minutes in sizes['ekg_minuten']:
+        path = _cached_file(f"ekg_{minutes:g}min.txt", lambda target: write_ekg(target, minutes))
+        ekg_dict = {'id': 1, 'date': "2025-06-01", 'result_link': path}
+        record(f"EKGdata laden [{minutes:g} min]", lambda: EKGdata(ekg_dict))
+        ekg = EKGdata(ekg_dict)
+        record(f"EKGdata.find_peaks [{minutes:g} min]", ekg.find_peaks)
+        record(f"EKGdata.estimate_heart_rate [{minutes:g} min]", ekg.estimate_heart_rate)
+
+    for hours in sizes['aktivitaet_stunden']:
+        activity = generate_activity(hours)
+        fit_path = _cached_file(f"aktivitaet_{hours:g}h.fit", lambda target: write_fit(target, activity))
+        gpx_path = _cached_file(f"aktivitaet_{hours:g}h.gpx", lambda target: write_gpx(target, activity))
+        record(f"parse_fit_data [{hours:g} h]", lambda: parse_fit_data(fit_path))
+        record(f"parse_gpx_data [{hours:g} h]", lambda: parse_gpx_data(gpx_path))
+        fit_df = activity_dataframe(activity)
+        record(f"create_power_curve [{hours:g} h]", lambda: trainingsliste.create_power_curve(fit_df))
+
+    for count in sizes['trainings']:
+        # Datenbanken direkt am Zielort anlegen (WAL-Dateien und Verbindungen hängen am Dateinamen)
+        db_path = os.path.join(DATA_DIR, f"v{GENERATOR_VERSION}_trainings_{count}.db")
+        if not os.path.exists(db_path) or len(open_table('trainings', db_path=db_path)) != count:
+            create_training_db(db_path, count)
+        dashboard.db = open_table('trainings', db_path=db_path)
+        person_id = open_table('persons', db_path=db_path).all()[0].doc_id
+        st.session_state["person_doc_id"] = person_id
+        record(f"get_trainings_for_current_user [{count} Trainings]", dashboard.get_trainings_for_current_user)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance=TOLERANZ):
+    """
+    Vergleicht die Laufzeiten (`VERGLEICHSWERT`) mit einer gespeicherten Baseline.
+
+    Args:
+        results (dict): Ergebnis von `run_benchmarks`.
+        baseline (dict): Die 'ergebnisse' einer früheren Messung.
+        tolerance (float, optional): Erlaubte relative Verlangsamung.
+
+    Returns:
+        tuple: (Zeilen [(Name, Baseline-ms, ms, Änderung in %, Status)], Namen der Regressionen).
+    """
+    rows, regressions = [], []
+    for name, entry in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            rows.append((name, None, entry[VERGLEICHSWERT], None, "neu"))
+            continue
+        old, new = previous[VERGLEICHSWERT], entry[VERGLEICHSWERT]
+        change = (new - old) / old * 100 if old else 0.0
+        status = "ok"
+        if new > old * (1 + tolerance) and new - old > RAUSCHGRENZE_MS:
+            status = "LANGSAMER"
+            regressions.append(name)
+        elif old > new * (1 + tolerance) and old - new > RAUSCHGRENZE_MS:
+            status = "schneller"
+        rows.append((name, old, new, change, status))
+    return rows, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Laufzeiten der Kernfunktionen mit synthetischen Daten (EKG, FIT, GPX, Datenbank) messen und mit einer Baseline vergleichen.")
+    parser.add_argument("--umfang", choices=sorted(UMFAENGE), default="standard", help="Eingabegrößen")
+    parser.add_argument("--wiederholungen", type=int, default=3, help="Aufrufe pro Messung (Median)")
+    parser.add_argument("--ausgabe", default=None, help="Ergebnis als JSON-Datei speichern")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline-Datei für den Vergleich")
+    parser.add_argument("--baseline-schreiben", action="store_true", help="Ergebnis als neue Baseline speichern")
+    parser.add_argument("--toleranz", type=float, default=TOLERANZ, help="Erlaubte Verlangsamung (0.25 = 25 %%)")
+    parser.add_argument("--daten", default=DATA_DIR, help="Verzeichnis für die erzeugten Testdaten (wird wiederverwendet)")
+    args = parser.parse_args()
+
+    DATA_DIR = os.path.abspath(args.daten)
+    baseline_path = os.path.abspath(args.baseline)
+    output_path = os.path.abspath(args.ausgabe) if args.ausgabe else None
+    os.makedirs(DATA_DIR, exist_ok=True)
+    # Seiten öffnen beim Import die Standard-Datenbank im Arbeitsverzeichnis: nicht die echte verwenden
+    os.chdir(DATA_DIR)
+
+    results = run_benchmarks(args.umfang, args.wiederholungen)
+    report = {'meta': {'zeitpunkt': datetime.now().isoformat(timespec="seconds"), 'umfang': args.umfang,
+                       'wiederholungen': args.wiederholungen, 'python': platform.python_version(),
+                       'plattform': platform.platform(), 'prozessor': platform.processor() or platform.machine(),
+                       'generator_version': GENERATOR_VERSION},
+              'ergebnisse': results}
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    regressions = []
+    if os.path.exists(baseline_path) and not args.baseline_schreiben:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nVergleich mit {args.baseline} ({baseline['meta']['zeitpunkt']}, {baseline['meta']['prozessor']}):")
+        rows, regressions = compare_with_baseline(results, baseline['ergebnisse'], args.toleranz)
+        for name, old, new, change, status in rows:
+            old_text = f"{old:>10.1f}" if old is not None else f"{'-':>10}"
+            change_text = f"{change:>+7.0f} %" if change is not None else f"{'':>9}"
+            print(f"{name:<52} {old_text} -> {new:>10.1f} ms {change_text}  {status}")
+        print(f"{len(regressions)} Regression(en)." if regressions else "Keine Regressionen.")
+    if args.baseline_schreiben:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Baseline gespeichert: {baseline_path}")
+    sys.exit(1 if regressions else 0)
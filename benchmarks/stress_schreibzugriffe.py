@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import inspect
+import argparse
+import tempfile
+import multiprocessing
+import yaml
+from yaml.loader import SafeLoader
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.datenbank import open_table, transaction, VersionConflictError
+from Module.dateisperre import LockedTinyDB, update_yaml_file
+
+# --- Konfiguration & Konstanten ---
+DB_FILE = "stress.db"
+TINYDB_FILE = "stress_tinydb.json"
+YAML_FILE = "stress_config.yaml"
+
+
+def _writer(workdir, person_id, worker_id, iterations):
+    """
+    Ein Schreibprozess: führt pro Iteration alle geschützten Schreibpfade der App einmal aus.
+
+    Returns:
+        int: Anzahl der Versionskonflikte, die per Wiederholung aufgelöst wurden.
+    """
+    os.chdir(workdir)
+    db_path = os.path.join(workdir, DB_FILE)
+    persons = open_table('dbperson.json', db_path=db_path)
+    trainings = open_table('dbtests.json', db_path=db_path)
+    eintraege = LockedTinyDB(os.path.join(workdir, TINYDB_FILE)).table('eintraege')
+    conflicts = 0
+
+    for i in range(iterations):
+        # 1. Training einfügen und an die Person anhängen (wie add_training_to_db)
+        with transaction(db_path):
+            training_id = trainings.insert({'name': f"w{worker_id}-{i}", 'date': "2026-01-01", 'sportart': "Laufen"})
+            persons.update(lambda person: person['ekg_tests'].append(training_id), doc_ids=[person_id])
+
+        # 2. Optimistischer Zähler: bei Konflikt neu lesen und wiederholen
+        while True:
+            person = persons.get(doc_id=person_id)
+            try:
+                persons.update({'zaehler': person['zaehler'] + 1}, doc_ids=[person_id], expected_version=person.version)
+                break
+            except VersionConflictError:
+                conflicts += 1
+
+        # 3. TinyDB-Datei (Routenindex, Segmente)
+        eintraege.insert({'worker': worker_id, 'i': i})
+
+        # 4. config.yaml
+        update_yaml_file(YAML_FILE, lambda data: data.__setitem__('zaehler', data.get('zaehler', 0) + 1))
+    return conflicts
+
+
+def run_stress_test(writers, iterations):
+    """
+    Startet `writers` parallele Prozesse mit je `iterations` Schreibvorgängen pro Pfad in einem
+    temporären Verzeichnis und prüft anschließend, dass keine Änderung verloren gegangen ist.
+
+    Args:
+        writers (int): Anzahl paralleler Schreibprozesse.
+        iterations (int): Schreibvorgänge pro Prozess und Pfad.
+
+    Returns:
+        list: Beschreibungen der gefundenen Fehler (leer, wenn alles konsistent ist).
+    """
+    expected = writers * iterations
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        # Im leeren Verzeichnis arbeiten, damit keine echten JSON-Datenbanken migriert werden
+        os.chdir(workdir)
+        db_path = os.path.join(workdir, DB_FILE)
+        person_id = open_table('dbperson.json', db_path=db_path).insert({'firstname': "Stress", 'lastname': "Test",
+                                                                         'ekg_tests': [], 'zaehler': 0})
+
+        # "spawn": jeder Prozess baut eigene SQLite-Verbindungen auf
+        context = multiprocessing.get_context("spawn")
+        start = time.perf_counter()
+        with context.Pool(writers) as pool:
+            conflicts = pool.starmap(_writer, [(workdir, person_id, w, iterations) for w in range(writers)])
+        elapsed = time.perf_counter() - start
+
+        person = open_table('dbperson.json', db_path=db_path).get(doc_id=person_id)
+        training_ids = {t.doc_id for t in open_table('dbtests.json', db_path=db_path).all()}
+        eintraege = LockedTinyDB(os.path.join(workdir, TINYDB_FILE)).table('eintraege').all()
+        with open(os.path.join(workdir, YAML_FILE), "r") as f:
+            yaml_counter = (yaml.load(f, Loader=SafeLoader) or {}).get('zaehler', 0)
+
+        errors = []
+        if len(training_ids) != expected:
+            errors.append(f"Trainings: {len(training_ids)} statt {expected}")
+        if len(person['ekg_tests']) != expected or set(person['ekg_tests']) != training_ids:
+            errors.append(f"Verknüpfungen: {len(person['ekg_tests'])} statt {expected}")
+        if person['zaehler'] != expected:
+            errors.append(f"Versionierter Zähler: {person['zaehler']} statt {expected}")
+        if len({(e['worker'], e['i']) for e in eintraege}) != expected or len(eintraege) != expected:
+            errors.append(f"TinyDB-Einträge: {len(eintraege)} statt {expected}")
+        if yaml_counter != expected:
+            errors.append(f"YAML-Zähler: {yaml_counter} statt {expected}")
+        os.chdir(cwd)
+
+    print(f"{writers} Prozesse x {iterations} Iterationen in {elapsed:.1f} s, "
+          f"{sum(conflicts)} Versionskonflikte per Wiederholung aufgelöst.")
+    return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stresstest: parallele Schreibprozesse dürfen keine Änderungen verlieren.")
+    parser.add_argument("--writer", type=int, default=8, help="Anzahl paralleler Schreibprozesse")
+    parser.add_argument("--iterationen", type=int, default=50, help="Schreibvorgänge pro Prozess")
+    args = parser.parse_args()
+
+    errors = run_stress_test(args.writer, args.iterationen)
+    for error in errors:
+        print(f"VERLOREN: {error}")
+    if errors:
+        sys.exit(1)
+    print("Keine Änderungen verloren.")
@@ -0,0 +1,257 @@
+import os
+import sys
+import zlib
+import struct
+import inspect
+import argparse
+import numpy as np
+import pandas as pd
+
+currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir) # Stellt sicher, dass das Projekt-Root im Python-Pfad ist
+
+from Module.datenbank import open_table, transaction
+
+# --- Konfiguration & Konstanten ---
+# Wird bei jeder Änderung an den Generatoren erhöht, damit zwischengespeicherte Dateien neu entstehen
+GENERATOR_VERSION = 1
+EKG_SAMPLE_RATE = 500         # Hz, wie die Aufzeichnungen in data/ekg
+START_TIME = np.datetime64("2025-06-01T08:00:00")
+START_LAT, START_LON = 47.2692, 11.4041
+ERDRADIUS_M = 6371000.0
+FIT_EPOCH_S = 631065600       # 1989-12-31T00:00:00Z in Unix-Sekunden
+SPORTARTEN = ["Laufen", "Radfahren", "Schwimmen", "Wandern", "Krafttraining"]
+
+
+def _seed(*values):
+    """Fester Seed aus den Parametern (nicht `hash()`, das pro Prozess zufällig ist): gleiche Größe -> gleiche Daten."""
+    return zlib.crc32(repr((GENERATOR_VERSION,) + values).encode())
+
+
+def generate_ekg(minutes, seed=0):
+    """
+    Erzeugt ein synthetisches EKG mit 500 Hz im Format der Dateien in data/ekg: Grundlinie um
+    300 mV mit Atmung und Rauschen, QRS-Komplexe und T-Wellen. Die Herzfrequenz steigt wie bei
+    einer Belastung von etwa 65 auf 150 BPM und fällt wieder ab.
+
+    Args:
+        minutes (float): Dauer der Aufzeichnung in Minuten.
+        seed (int, optional): Zusätzlicher Seed.
+
+    Returns:
+        pandas.DataFrame: Spalten 0 (Messwerte in mV, ganzzahlig) und 1 (Zeit in ms).
+    """
+    rng = np.random.default_rng(_seed("ekg", minutes, seed))
+    n = int(minutes * 60 * EKG_SAMPLE_RATE)
+    t = np.arange(n) / EKG_SAMPLE_RATE
+    signal = 300 + 4 * np.sin(2 * np.pi * t / 4.0) + rng.normal(0, 1.5, n)
+
+    # Schlagzeitpunkte: Herzfrequenz folgt einem Belastungsprofil, RR-Intervalle leicht variabel
+    duration_s = n / EKG_SAMPLE_RATE
+    beats = []
+    position = 0.3
+    while position < duration_s - 0.5:
+        bpm = 65 + 85 * np.sin(np.pi * position / duration_s) ** 2
+        beats.append(position)
+        position += 60.0 / bpm * rng.normal(1.0, 0.03)
+    beat_samples = (np.array(beats) * EKG_SAMPLE_RATE).astype(int)
+
+    # Schlagvorlage (Q, R, S, T) einmal berechnen und an alle Schlagzeitpunkte addieren
+    offsets = np.arange(-40, 160)
+    dt = offsets / EKG_SAMPLE_RATE
+    template = (-10 * np.exp(-((dt + 0.02) / 0.006) ** 2) + 110 * np.exp(-(dt / 0.02) ** 2)
+                - 15 * np.exp(-((dt - 0.022) / 0.007) ** 2) + 12 * np.exp(-((dt - 0.22) / 0.04) ** 2))
+    index = beat_samples[:, None] + offsets[None, :]
+    valid = (index >= 0) & (index < n)
+    np.add.at(signal, index[valid], np.broadcast_to(template, index.shape)[valid])
+
+    time_ms = 13666 + np.arange(n) * (1000 // EKG_SAMPLE_RATE)
+    return pd.DataFrame({0: np.round(signal).astype(int), 1: time_ms})
+
+
+def generate_activity(hours, seed=0):
+    """
+    Erzeugt eine Radfahrt mit einem Datensatz pro Sekunde: Position (Schleifen um Innsbruck),
+    Höhe, Geschwindigkeit, kumulierte Distanz, Herzfrequenz, Trittfrequenz und Leistung mit Intervallen.
+
+    Args:
+        hours (float): Dauer in Stunden.
+        seed (int, optional): Zusätzlicher Seed.
+
+    Returns:
+        dict: Arrays 'time' (datetime64), 'latitude', 'longitude', 'altitude', 'speed' (m/s),
+              'distance' (m), 'heart_rate', 'cadence' und 'power'.
+    """
+    rng = np.random.default_rng(_seed("aktivitaet", hours, seed))
+    n = int(hours * 3600)
+    t = np.arange(n, dtype=float)
+    phase = rng.uniform(0, 2 * np.pi, 6)
+
+    speed = np.clip(8.0 + 1.2 * np.sin(2 * np.pi * t / 900 + phase[0]) + 0.6 * np.sin(2 * np.pi * t / 170 + phase[1])
+                    + rng.normal(0, 0.2, n), 0.5, None)
+    distance = np.cumsum(speed)
+    heading = 2 * np.pi * t / 5000 + 0.8 * np.sin(2 * np.pi * t / 1300 + phase[2])
+    latitude = START_LAT + np.degrees(np.cumsum(speed * np.sin(heading)) / ERDRADIUS_M)
+    longitude = START_LON + np.degrees(np.cumsum(speed * np.cos(heading)) / (ERDRADIUS_M * np.cos(np.radians(START_LAT))))
+    altitude = 600 + 150 * np.sin(2 * np.pi * distance / 12000 + phase[3]) + 40 * np.sin(2 * np.pi * distance / 2500)
+
+    intervals = ((t % 1200) < 300) * 120.0  # alle 20 Minuten 5 Minuten hart
+    power = np.clip(210 + 60 * np.sin(2 * np.pi * t / 720 + phase[4]) + intervals + rng.normal(0, 25, n), 0, None)
+    heart_rate = np.clip(130 + 20 * np.sin(2 * np.pi * t / 1500 + phase[5]) + intervals / 8 + rng.normal(0, 2, n), 60, 195)
+    cadence = np.clip(85 + rng.normal(0, 4, n), 0, None)
+
+    return {'time': START_TIME + t.astype('timedelta64[s]'), 'latitude': latitude, 'longitude': longitude,
+            'altitude': altitude, 'speed': speed, 'distance': distance, 'heart_rate': np.round(heart_rate),
+            'cadence': np.round(cadence), 'power': np.round(power)}
+
+
+def activity_dataframe(activity):
+    """Die Aktivität als DataFrame wie aus `load_fit_data` (Spalten 'time', 'power', ...)."""
+    return pd.DataFrame({'time': activity['time'], 'velocity': activity['speed'], 'heart_rate': activity['heart_rate'],
+                         'distance': activity['distance'], 'cadence': activity['cadence'],
+                         'power': activity['power'], 'latitude': activity['latitude'],
+                         'longitude': activity['longitude'], 'altitude': activity['altitude']})
+
+
+# --- FIT-Kodierung (nur die Nachrichten, die die App liest: file_id, record, session) ---
+_CRC_TABLE = (0x0000, 0xCC01, 0xD801, 0x1400, 0xF001, 0x3C00, 0x2800, 0xE401,
+              0xA001, 0x6C00, 0x7800, 0xB401, 0x5000, 0x9C01, 0x8801, 0x4400)
+# Felder der record-Nachricht: (Feldnummer, Basistyp, numpy-Typ)
+_RECORD_FIELDS = [(253, 0x86, '<u4'), (0, 0x85, '<i4'), (1, 0x85, '<i4'), (2, 0x84, '<u2'), (3, 0x02, 'u1'),
+                  (4, 0x02, 'u1'), (5, 0x86, '<u4'), (6, 0x84, '<u2'), (7, 0x84, '<u2')]
+
+
+def _fit_crc(data, crc=0):
+    for byte in data:
+        tmp = _CRC_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_TABLE[byte & 0xF]
+        tmp = _CRC_TABLE[crc & 0xF]
+        crc = ((crc >> 4) & 0x0FFF) ^ tmp ^ _CRC_TABLE[(byte >> 4) & 0xF]
+    return crc
+
+
+def _fit_definition(local_type, global_number, fields):
+    sizes = {0x00: 1, 0x02: 1, 0x84: 2, 0x85: 4, 0x86: 4}
+    body = struct.pack('<BBBHB', 0x40 | local_type, 0, 0, global_number, len(fields))
+    return body + b''.join(struct.pack('BBB', number, sizes[base_type], base_type) for number, base_type in fields)
+
+
+def write_fit(path, activity):
+    """
+    Schreibt eine Aktivität als FIT-Datei (Protokoll 1.0, Little Endian, mit Prüfsummen), die
+    fitparse wie eine Geräteaufzeichnung liest.
+
+    Args:
+        path (str): Zieldatei.
+        activity (dict): Ergebnis von `generate_activity`.
+    """
+    timestamps = (activity['time'].astype('datetime64[s]').astype(np.int64) - FIT_EPOCH_S).astype(np.uint32)
+    semicircles = 2**31 / 180.0
+    records = np.zeros(len(timestamps), dtype=[('header', 'u1')] + [(f"f{number}", dtype) for number, _, dtype in _RECORD_FIELDS])
+    records['header'] = 0x01  # lokaler Typ 1 (Definition unten)
+    records['f253'] = timestamps
+    records['f0'] = np.round(activity['latitude'] * semicircles)
+    records['f1'] = np.round(activity['longitude'] * semicircles)
+    records['f2'] = np.round((activity['altitude'] + 500) * 5)
+    records['f3'] = activity['heart_rate']
+    records['f4'] = activity['cadence']
+    records['f5'] = np.round(activity['distance'] * 100)
+    records['f6'] = np.round(activity['speed'] * 1000)
+    records['f7'] = activity['power']
+
+    start, end = int(timestamps[0]), int(timestamps[-1])
+    elapsed_ms = (end - start + 1) * 1000
+    data = b''.join([
+        _fit_definition(0, 0, [(0, 0x00), (1, 0x84), (4, 0x86)]),
+        struct.pack('<BBHI', 0x00, 4, 255, start),                     # file_id: Aktivität
+        _fit_definition(1, 20, [(number, base_type) for number, base_type, _ in _RECORD_FIELDS]),
+        records.tobytes(),                                             # record
+        _fit_definition(2, 18, [(253, 0x86), (2, 0x86), (5, 0x00), (7, 0x86), (8, 0x86), (9, 0x86)]),
+        struct.pack('<BIIBIII', 0x02, end, start, 2, elapsed_ms, elapsed_ms,
+                    int(round(activity['distance'][-1] * 100))),       # session: Radfahren
+    ])
+    header = struct.pack('<BBHI4s', 14, 0x10, 2132, len(data), b'.FIT')
+    header += struct.pack('<H', _fit_crc(header))
+    with open(path, 'wb') as f:
+        f.write(header + data + struct.pack('<H', _fit_crc(header + data)))
+
+
+def write_gpx(path, activity):
+    """
+    Schreibt die Trackpunkte einer Aktivität als GPX 1.1 (ein Punkt pro Sekunde mit Höhe und Zeit).
+
+    Args:
+        path (str): Zieldatei.
+        activity (dict): Ergebnis von `generate_activity`.
+    """
+    times = np.datetime_as_string(activity['time'].astype('datetime64[s]'))
+    points = "\n".join(f'      <trkpt lat="{lat:.7f}" lon="{lon:.7f}"><ele>{ele:.1f}</ele><time>{time}Z</time></trkpt>'
+                       for lat, lon, ele, time in zip(activity['latitude'], activity['longitude'], activity['altitude'], times))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gpx version="1.1" creator="Trainingstagebuch Benchmark" xmlns="http://www.topografix.com/GPX/1/1">\n'
+                '  <trk>\n    <name>Synthetische Radfahrt</name>\n    <trkseg>\n'
+                f'{points}\n    </trkseg>\n  </trk>\n</gpx>\n')
+
+
+def write_ekg(path, minutes, seed=0):
+    """Schreibt ein EKG aus `generate_ekg` im Tab-getrennten Format von data/ekg."""
+    generate_ekg(minutes, seed).to_csv(path, sep='\t', header=False, index=False)
+
+
+def create_training_db(db_path, trainings, persons=4, seed=0):
+    """
+    Legt eine Datenbank mit `trainings` Trainings an, reihum auf `persons` Personen verteilt.
+    Die Trainings haben die Felder der App (ohne Dateien), Datumswerte über mehrere Jahre.
+
+    Args:
+        db_path (str): Pfad der SQLite-Datei (wird neu angelegt).
+        trainings (int): Anzahl Trainings.
+        persons (int, optional): Anzahl Personen.
+        seed (int, optional): Zusätzlicher Seed.
+
+    Returns:
+        list: Die doc_ids der Personen.
+    """
+    rng = np.random.default_rng(_seed("datenbank", trainings, persons, seed))
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_path + suffix):
+            os.remove(db_path + suffix)
+    days = rng.integers(0, 5 * 365, trainings)
+    dates = np.datetime_as_string(np.datetime64("2021-01-01") + days.astype('timedelta64[D]'))
+    documents = [{
+        'name': f"Training {i + 1}", 'date': str(dates[i]), 'sportart': SPORTARTEN[i % len(SPORTARTEN)],
+        'dauer': int(rng.integers(20, 240)), 'distanz': round(float(rng.uniform(2, 120)), 2),
+        'puls': int(rng.integers(100, 170)), 'kalorien': 0, 'anstrengung': 'acceptable',
+        'star_rating': int(rng.integers(1, 6)), 'description': "", 'image': None, 'gpx_file': None,
+        'ekg_file': None, 'fit_file': None, 'avg_speed_kmh': round(float(rng.uniform(8, 35)), 2),
+        'elevation_gain_pos': int(rng.integers(0, 2000)), 'elevation_gain_neg': int(rng.integers(0, 2000)),
+    } for i in range(trainings)]
+
+    training_table = open_table('trainings', db_path=db_path)
+    person_table = open_table('persons', db_path=db_path)
+    with transaction(db_path):
+        training_ids = training_table.insert_multiple(documents)
+        return [person_table.insert({'firstname': f"Person{p + 1}", 'lastname': "Benchmark", 'date_of_birth': 1990,
+                                     'gender': 'female', 'picture_path': None, 'maximalpuls': 190,
+                                     'ekg_tests': training_ids[p::persons]})
+                for p in range(persons)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetische Testdateien (EKG, FIT, GPX) für Benchmarks und manuelle Tests erzeugen.")
+    parser.add_argument("ziel", help="Zielverzeichnis")
+    parser.add_argument("--ekg-minuten", type=float, default=60, help="Dauer des EKGs in Minuten")
+    parser.add_argument("--stunden", type=float, default=3, help="Dauer der FIT-/GPX-Aktivität in Stunden")
+    args = parser.parse_args()
+
+    os.makedirs(args.ziel, exist_ok=True)
+    activity = generate_activity(args.stunden)
+    files = {f"ekg_{args.ekg_minuten:g}min.txt": lambda path: write_ekg(path, args.ekg_minuten),
+             f"aktivitaet_{args.stunden:g}h.fit": lambda path: write_fit(path, activity),
+             f"aktivitaet_{args.stunden:g}h.gpx": lambda path: write_gpx(path, activity)}
+    for name, writer in files.items():
+        path = os.path.join(args.ziel, name)
+        writer(path)
+        print(f"{path} ({os.path.getsize(path) / 2**20:.1f} MB)")
@@ -2,6 +2,7 @@ import streamlit as st
 import yaml
 from yaml.loader import SafeLoader
 from tinydb import TinyDB, Query
+from Module.warteschlange import start_worker
 
 # --- Initial Page Setup (before any other Streamlit commands) ---
 # Sidebar standardmäßig einklappen
@@ -125,11 +126,14 @@ else:
         st.info("Sie wurden abgemeldet.")
         st.rerun()
 
-    
+    # Nach einem Serverneustart unterbrochene Verarbeitungsaufträge fortsetzen
+    start_worker()
+
     sidebar_pages = [
         st.Page("pages/dashboard.py", title="Lesitungsübersicht", icon="📊"),
         st.Page("pages/Trainingsliste.py", title="Trainingstagebuch", icon="🧪"),
         st.Page("pages/add workout.py", title="Workout hinzufügen", icon="🏋️"),
+        st.Page("pages/segmente.py", title="Segmente", icon="🏁"),
         st.Page("pages/Profil.py", title="Profil", icon="👤")
         
     ]
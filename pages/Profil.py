@@ -3,11 +3,10 @@ import streamlit as st
 import os
 import sys
 import inspect
-from tinydb import TinyDB, Query
+from tinydb import Query
 from datetime import datetime
 import yaml
 from yaml.loader import SafeLoader
-from yaml.dumper import Dumper
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parentdir = os.path.dirname(currentdir)
@@ -16,12 +15,18 @@ sys.path.insert(0, parentdir)
 
 
 
-from Module.utils import normalize_path_slashes
+from Module.utils import normalize_path_slashes, lazy_import
 
 from Module.Personenklasse import Person
+from Module.datenbank import open_table, VersionConflictError
+from Module.dateisperre import update_yaml_file
+from Module.bildvarianten import create_renditions, rendition_path
 
 
-db = TinyDB('dbperson.json')
+# pyarrow & Co. erst beim Öffnen des Export-Bereichs laden
+datenexport = lazy_import("Module.datenexport")
+
+db = open_table('dbperson.json')
 
 try:
     with open('config.yaml') as file:
@@ -37,21 +42,21 @@ except yaml.YAMLError as exc:
 
 
 
-def save_config(config_data):
+def save_config(mutate):
     """
-    Speichert die gegebenen Konfigurationsdaten in der 'config.yaml'-Datei.
+    Ändert die 'config.yaml'-Datei. Die Datei wird unter Sperre frisch gelesen, von `mutate`
+    verändert und atomar zurückgeschrieben, damit gleichzeitige Änderungen anderer Sessions
+    (z.B. neu angelegte Profile) nicht überschrieben werden.
 
     Args:
-        config_data (dict): Ein Dictionary, das die zu speichernden Konfigurationsdaten enthält.
-                            Dieses Dictionary wird im YAML-Format in die Datei geschrieben.
+        mutate (callable): Funktion, die das geladene Konfigurations-Dictionary direkt verändert.
 
     Returns:
         bool: True, wenn die Konfigurationsdaten erfolgreich gespeichert wurden.
               False, wenn ein Fehler beim Speichern aufgetreten ist.
     """
     try:
-        with open('config.yaml', 'w') as file:
-            yaml.dump(config_data, file, default_flow_style=False, Dumper=Dumper)
+        update_yaml_file('config.yaml', mutate)
         return True
     except Exception as e:
         st.error(f"Fehler beim Speichern der 'config.yaml' Datei: {e}")
@@ -59,6 +64,52 @@ def save_config(config_data):
 
 
 
+def display_export_ui(person_id):
+    """
+    Exportiert alle Trainings der Person als spaltenorientiertes Archiv zum Herunterladen und
+    stellt ein solches Archiv wieder her (die Trainings werden dieser Person hinzugefügt).
+
+    Args:
+        person_id (int): Die doc_id der angezeigten Person.
+
+    Returns:
+        None
+    """
+    with st.expander("Trainingsdaten exportieren / wiederherstellen"):
+        # Der Inhalt läuft auch bei zugeklapptem Expander: pyarrow erst nach dem Einschalten laden
+        if not st.toggle("Export und Wiederherstellung anzeigen", key="export_panel_open"):
+            return
+        col_files, col_compression = st.columns(2)
+        with col_files:
+            include_files = st.checkbox("Originaldateien beilegen", value=True, key="export_include_files")
+        with col_compression:
+            compression = st.selectbox("Kompression", datenexport.COMPRESSIONS, key="export_compression")
+        if st.button("Export erstellen", key="export_button"):
+            try:
+                with st.spinner("Trainings werden exportiert..."):
+                    st.session_state.export_result = datenexport.export_history(person_id, include_files=include_files,
+                                                                    compression=compression)
+            except Exception as e:
+                st.error(f"Fehler beim Export: {e}")
+        result = st.session_state.get("export_result")
+        if result and os.path.exists(result['pfad']):
+            st.success(f"{result['trainings']} Training(e), {result['messpunkte']} Messpunkte und "
+                       f"{result['ekg_werte']} EKG-Werte exportiert ({result['bytes'] / 1e6:.1f} MB).")
+            with open(result['pfad'], 'rb') as f:
+                st.download_button("Export herunterladen", f, file_name=os.path.basename(result['pfad']),
+                                   mime="application/zip", key="export_download")
+
+        st.markdown("---")
+        archive = st.file_uploader("Export wiederherstellen", type=["zip"], key="restore_uploader")
+        if archive is not None and st.button("Wiederherstellen", key="restore_button"):
+            try:
+                with st.spinner("Trainings werden wiederhergestellt..."):
+                    restored = datenexport.restore_history(archive, person_id)
+                st.success(f"{len(restored['trainings'])} Training(e) in {restored['dauer_s']} s wiederhergestellt.")
+            except Exception as e:
+                st.error(f"Fehler beim Wiederherstellen: {e}")
+
+
 # --- Streamlit App starts here ---
 
 if "person_doc_id" not in st.session_state or st.session_state["person_doc_id"] is None:
@@ -77,6 +128,14 @@ except ValueError:
     st.error("Ungültige Nutzer-ID im Session State. Bitte wählen Sie eine gültige ID.")
     st.stop()
 
+# Optimistische Sperre: gespeichert wird nur, wenn die Person seit dem letzten Anzeigen
+# (vorheriger Durchlauf) nicht in einer anderen Sitzung geändert wurde.
+version_key = f"person_version_{st.session_state.current_user_id}"
+displayed_version = st.session_state.get(version_key, user_data.version)
+st.session_state[version_key] = user_data.version
+VERSION_CONFLICT_MESSAGE = ("Die Personendaten wurden zwischenzeitlich in einer anderen Sitzung geändert. "
+                            "Es wird jetzt der aktuelle Stand angezeigt, bitte die Änderung erneut speichern.")
+
 # --- Create Person object ---
 Nutzer = Person(
     doc_id=int(st.session_state.current_user_id),
@@ -94,11 +153,11 @@ bild_col, personendaten_col, daten_ändern = st.columns([1,1,1], gap="small")
 
 with bild_col:
     if Nutzer.picture_path and os.path.exists(Nutzer.picture_path):
-        st.image(Nutzer.picture_path, caption="Aktuelles Profilbild", use_container_width=True)
+        st.image(rendition_path(Nutzer.picture_path, 'card'), caption="Aktuelles Profilbild", use_container_width=True)
     else:
         default_image_path = os.path.join(parentdir, "data", "pictures", "default.jpg")
         if os.path.exists(default_image_path):
-            st.image(default_image_path, caption="Kein Bild gefunden", use_container_width=True)
+            st.image(rendition_path(default_image_path, 'card'), caption="Kein Bild gefunden", use_container_width=True)
         else:
             st.warning(f"Standardbild '{default_image_path}' nicht gefunden. Bitte überprüfen Sie den Pfad.")
             st.image("https://via.placeholder.com/150", caption="Kein Bild verfügbar", use_container_width=True)
@@ -112,6 +171,7 @@ with bild_col:
         
         with open(new_picture_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
+        create_renditions(new_picture_path)
         
         Nutzer.picture_path = normalize_path_slashes(new_picture_path) 
         
@@ -179,16 +239,15 @@ with personendaten_col:
                             "picture_path": Nutzer.picture_path,
                             "maximalpuls": Nutzer.maximal_hr,
                         },
-                        doc_ids=[int(st.session_state.current_user_id)]
+                        doc_ids=[int(st.session_state.current_user_id)],
+                        expected_version=displayed_version
                     )
 
                     if current_username_in_config:
-                        updated_config_for_name = config.copy()
-                        updated_usernames_for_name = updated_config_for_name.get('credentials', {}).get('usernames', {}).copy()
-                        updated_usernames_for_name[current_username_in_config]['name'] = f"{new_firstname} {new_lastname}"
-                        updated_config_for_name['credentials']['usernames'] = updated_usernames_for_name
+                        def set_name(config_data):
+                            config_data['credentials']['usernames'][current_username_in_config]['name'] = f"{new_firstname} {new_lastname}"
 
-                        if save_config(updated_config_for_name):
+                        if save_config(set_name):
                             st.success("Allgemeine Personen-Informationen und Name in config.yaml erfolgreich gespeichert!")
                         else:
                             st.error("Fehler beim Speichern des Namens in config.yaml.")
@@ -196,6 +255,8 @@ with personendaten_col:
                         st.warning("Kein Login-Eintrag für diesen Nutzer in 'config.yaml' gefunden. Name in config.yaml wurde nicht aktualisiert.")
                     
                     st.rerun()
+                except VersionConflictError:
+                    st.error(VERSION_CONFLICT_MESSAGE)
                 except Exception as e:
                     st.error(f"Ein unerwarteter Fehler beim Speichern der allgemeinen Informationen ist aufgetreten: {e}")
         st.markdown("---")
@@ -225,10 +286,13 @@ with personendaten_col:
             try:
                 db.update(
                     {"maximalpuls": new_maximalpuls},
-                    doc_ids=[int(st.session_state.current_user_id)]
+                    doc_ids=[int(st.session_state.current_user_id)],
+                    expected_version=displayed_version
                 )
                 st.success("Maximalpuls erfolgreich gespeichert!")
                 st.rerun()
+            except VersionConflictError:
+                st.error(VERSION_CONFLICT_MESSAGE)
             except Exception as e:
                 st.error(f"Fehler beim Speichern des Maximalpulses: {e}")
     admin_button_placeholder = st.empty()
@@ -292,28 +356,19 @@ with daten_ändern:
                     if not username_changed and not password_changed:
                         st.warning("Keine Änderungen an Benutzername oder Passwort vorgenommen.")
                     elif (username_changed or password_changed):
-                        updated_config = config.copy() 
-                        updated_usernames = updated_config.get('credentials', {}).get('usernames', {}).copy()
-
-                        if username_changed:
-                            updated_usernames[new_username] = user_config_entry.copy()
-                            updated_usernames[new_username]['name'] = f"{Nutzer.firstname} {Nutzer.lastname}"
-                            
+                        def change_login(config_data):
+                            usernames = config_data['credentials']['usernames']
+                            entry = usernames.pop(current_username_in_config) if username_changed \
+                                else usernames[current_username_in_config]
+                            entry['name'] = f"{Nutzer.firstname} {Nutzer.lastname}"
                             if password_changed:
-                                updated_usernames[new_username]['password'] = new_password
-                            
-                            del updated_usernames[current_username_in_config]
-                            
-                            st.session_state["username"] = new_username
-                            st.session_state["name"] = updated_usernames[new_username].get("name", new_username)
-                            
-                        elif password_changed:
-                            updated_usernames[current_username_in_config]['password'] = new_password
-                            updated_usernames[current_username_in_config]['name'] = f"{Nutzer.firstname} {Nutzer.lastname}"
+                                entry['password'] = new_password
+                            usernames[new_username if username_changed else current_username_in_config] = entry
 
-                        updated_config['credentials']['usernames'] = updated_usernames
-
-                        if save_config(updated_config):
+                        if save_config(change_login):
+                            if username_changed:
+                                st.session_state["username"] = new_username
+                                st.session_state["name"] = f"{Nutzer.firstname} {Nutzer.lastname}"
                             st.success("Login-Informationen erfolgreich aktualisiert!")
                             st.rerun()
                         else:
@@ -321,5 +376,8 @@ with daten_ändern:
     else:
         st.warning("Kein Login-Eintrag für diesen Nutzer in 'config.yaml' gefunden. Benutzername und Passwort können nicht geändert werden.")
 
+st.markdown("---")
+display_export_ui(int(st.session_state.current_user_id))
+
 if __name__ == "__main__":
     st.stop()
\ No newline at end of file
@@ -1,29 +1,59 @@
 
 # File: pages/Trainingsliste.py
 import streamlit as st
-import pandas as pd
-from datetime import datetime, timedelta
-import folium
-import gpxpy
-import gpxpy.gpx
-from streamlit_folium import folium_static
+import streamlit.components.v1 as components
 import os
 import sys
-import plotly.express as px
-import plotly.graph_objects as go
-import numpy as np
-import fitparse
-from tinydb import TinyDB, Query
+from tinydb import Query
 
 project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, project_root)
 
-from Module.ekgdata import EKGdata
+from Module.utils import lazy_import
+from Module.datenbank import open_table, transaction, TABLES
+from Module.dateiablage import release_files
+from Module.warteschlange import pending_jobs, retry_job, start_worker, PROCESSING_FIELD
+from Module.zusammenfassung import remove_training_from_summary, get_summary
+from Module.ladecache import cached_load
+from Module.trackdaten import downsample_lttb, read_fit_records
+from Module.bildvarianten import rendition_path
+from Module.laufzeitprofil import timed, span, profiled_rerun
+
+# Erst beim Aufklappen eines Trainings bzw. beim Löschen gebraucht: beim ersten Zugriff laden
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+gpxpy = lazy_import("gpxpy")
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
+plotly_subplots = lazy_import("plotly.subplots")
+ekgdata = lazy_import("Module.ekgdata")
+streckenerkennung = lazy_import("Module.streckenerkennung")
+heatmap = lazy_import("Module.heatmap")
+segmente = lazy_import("Module.segmente")
+kartencache = lazy_import("Module.kartencache")
 
 
 IMAGE_DIR = "images"
 DATA_DIR = "data"
 UPLOAD_DIR = "uploaded_files"
+TRAININGS_PER_PAGE = 20
+SEARCH_LIMIT = 200
+CHART_POINTS = 1500  # Zielpunktzahl pro Kanal in den FIT-Zeitreihen (etwa eine Bildschirmbreite)
+FIT_CHART_ROW_HEIGHT = 220
+# Kanäle der FIT-Zeitreihen: (Checkbox, Spalte, Achsentitel)
+FIT_CHART_CHANNELS = [
+    ("Herzfrequenz", 'heart_rate', 'Herzfrequenz (bpm)'),
+    ("Leistung", 'power', 'Leistung (Watt)'),
+    ("Geschwindigkeit", 'velocity', 'Geschwindigkeit (m/s)'),
+    ("Trittfrequenz", 'cadence', 'Trittfrequenz (rpm)'),
+]
+PROCESSING_POLL_S = 3  # Abfrageintervall, solange Trainings im Hintergrund verarbeitet werden
+SORT_OPTIONS = {
+    "Datum (neueste zuerst)": ('date', True),
+    "Datum (älteste zuerst)": ('date', False),
+    "Distanz (längste zuerst)": ('distanz', True),
+    "Bewertung (beste zuerst)": ('star_rating', True),
+}
 
 def initialize_directories():
     """
@@ -44,13 +74,14 @@ def initialize_directories():
     os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 
-db = TinyDB('dbtests.json')
-dp = TinyDB('dbperson.json')
+db = open_table('dbtests.json')
+dp = open_table('dbperson.json')
 Person = Query()
 Test = Query()
 
 
 
+@timed()
 def load_gpx_data(gpx_filepath):
     """
     Lädt und parst eine GPX-Datei vom angegebenen Pfad.
@@ -64,7 +95,8 @@ def load_gpx_data(gpx_filepath):
                                Gibt `None` zurück, wenn der Pfad leer ist, die Datei nicht existiert,
                                die Datei nicht gefunden wurde, ein Fehler beim Parsen auftritt
                                oder ein anderer unerwarteter Fehler während des Ladevorgangs auftritt.
-                               Fehlermeldungen werden über `st.error` (falls Streamlit verfügbar ist) ausgegeben.
+                               Fehler werden nur protokolliert: das Ergebnis wird sitzungsübergreifend
+                               zwischengespeichert, die Meldung in der Oberfläche zeigt der Aufrufer.
     """
     abs_filepath = gpx_filepath
     if not abs_filepath or not os.path.exists(abs_filepath):
@@ -74,13 +106,13 @@ def load_gpx_data(gpx_filepath):
             gpx = gpxpy.parse(gpx_file)
             return gpx
     except FileNotFoundError:
-        st.error(f"Fehler: GPX-Datei {repr(gpx_filepath)} wurde nicht gefunden.")
+        print(f"Fehler: GPX-Datei {repr(gpx_filepath)} wurde nicht gefunden.")
         return None
     except gpxpy.gpx.GPXException as e:
-        st.error(f"Fehler beim Parsen der GPX-Datei {repr(gpx_filepath)}: {e}.")
+        print(f"Fehler beim Parsen der GPX-Datei {repr(gpx_filepath)}: {e}.")
         return None
     except Exception as e:
-        st.error(f"Ein unerwarteter Fehler ist aufgetreten beim Laden von {repr(gpx_filepath)}: {e}")
+        print(f"Ein unerwarteter Fehler ist aufgetreten beim Laden von {repr(gpx_filepath)}: {e}")
         return None
 
 def load_ekg_data(ekg_filepath):
@@ -110,11 +142,11 @@ def load_ekg_data(ekg_filepath):
         elif file_extension.lower() == '.csv':
             df = pd.read_csv(abs_filepath, header=None, names=['Messwerte in mV', 'Zeit in ms'])
         else:
-            st.error(f"Fehler: Dateiformat {file_extension} wird nicht unterstützt. Bitte verwenden Sie .txt oder .csv.")
+            print(f"Fehler: Dateiformat {file_extension} wird nicht unterstützt. Bitte verwenden Sie .txt oder .csv.")
             return None
 
         if df.empty:
-            st.warning(f"Warnung: Die Datei {abs_filepath} wurde geladen, ist aber leer.")
+            print(f"Warnung: Die Datei {abs_filepath} wurde geladen, ist aber leer.")
             return None
 
         ekg_dict_for_class = {
@@ -123,47 +155,46 @@ def load_ekg_data(ekg_filepath):
             "result_link": abs_filepath
         }
         
-        ekg_obj = EKGdata(ekg_dict_for_class)
+        ekg_obj = ekgdata.EKGdata(ekg_dict_for_class)
         
         if ekg_obj.df is None or ekg_obj.df.empty:
-            st.error(f"Fehler: EKGdata-Klasse konnte die Daten aus {repr(abs_filepath)} nicht laden oder parsen.")
+            print(f"Fehler: EKGdata-Klasse konnte die Daten aus {repr(abs_filepath)} nicht laden oder parsen.")
             return None
         
         return ekg_obj
         
     except pd.errors.EmptyDataError:
-        st.warning(f"Warnung: Die Datei {abs_filepath} ist leer oder enthält keine Daten zum Parsen.")
+        print(f"Warnung: Die Datei {abs_filepath} ist leer oder enthält keine Daten zum Parsen.")
         return None
     except Exception as e:
-        st.error(f"Fehler beim Laden oder Verarbeiten der EKG-Datei {repr(abs_filepath)}: {e}")
+        print(f"Fehler beim Laden oder Verarbeiten der EKG-Datei {repr(abs_filepath)}: {e}")
         return None
 
-def display_ekg_data_ui(ekg_obj, training_id_for_key):
+@st.fragment
+def display_ekg_data_ui(ekg_filepath, training_id_for_key):
     """
     Zeigt das EKG-Diagramm mit interaktiven Funktionen (Zeitbereichs-Slider) in einer Streamlit-Anwendung an.
-    Die Funktion visualisiert EKG-Messwerte und optional die berechnete Herzfrequenz.
+    Die Funktion visualisiert EKG-Messwerte und optional die berechnete Herzfrequenz. Läuft als Fragment:
+    Ein Verschieben des Sliders führt nur dieses Panel erneut aus und filtert die zwischengespeicherten Daten.
 
     Args:
-        ekg_obj (EKGdata or None): Ein EKGdata-Objekt, das die EKG-Daten enthält.
-                                   Wenn None oder das enthaltene DataFrame leer ist, wird kein Diagramm angezeigt.
+        ekg_filepath (str): Pfad zur EKG-Datei.
         training_id_for_key (int or str): Eine eindeutige ID, die für die Generierung von Streamlit-Widget-Schlüsseln
                                           verwendet wird, um Konflikte zu vermeiden, wenn mehrere Diagramme auf einer Seite sind.
 
     Returns:
         None: Die Funktion rendert UI-Komponenten direkt in der Streamlit-Anwendung.
     """
-    if ekg_obj is None or ekg_obj.df.empty:
+    ekg_data = get_ekg_panel_data(ekg_filepath)
+    if ekg_data is None:
         st.markdown("Keine EKG-Daten zum Anzeigen vorhanden.")
         return
+    ekg_df, heart_rate_df_full = ekg_data['df'], ekg_data['heart_rate']
 
     st.subheader("EKG-Analyse")
     
-    
-    t0 = ekg_obj.df["Zeit in ms"].iloc[0]
-    ekg_obj.df["Zeit in s"] = (ekg_obj.df["Zeit in ms"] - t0) / 1000
-    
-    min_time = ekg_obj.df["Zeit in s"].min()
-    max_time = ekg_obj.df["Zeit in s"].max()
+    min_time = ekg_df["Zeit in s"].min()
+    max_time = ekg_df["Zeit in s"].max()
 
     
     default_end_time = min(max_time, min_time + 10) if max_time > min_time else max_time
@@ -179,7 +210,7 @@ def display_ekg_data_ui(ekg_obj, training_id_for_key):
 
     start_time, end_time = time_range
 
-    filtered_df = ekg_obj.df[(ekg_obj.df["Zeit in s"] >= start_time) & (ekg_obj.df["Zeit in s"] <= end_time)]
+    filtered_df = ekg_df[(ekg_df["Zeit in s"] >= start_time) & (ekg_df["Zeit in s"] <= end_time)]
 
     if filtered_df.empty:
         st.warning("Keine Daten im ausgewählten Zeitbereich gefunden.")
@@ -202,29 +233,7 @@ def display_ekg_data_ui(ekg_obj, training_id_for_key):
     fig.update_xaxes(title="Zeit (s)")
     fig.update_yaxes(title="Messwerte (mV)")
 
-   
-    all_peaks = ekg_obj.find_peaks(respacing_factor=5)
-    
-    
-    peak_times_all = ekg_obj.df.loc[all_peaks, "Zeit in s"]
-    peak_values_all = ekg_obj.df.loc[all_peaks, "Messwerte in mV"]
-
-    
-    peaks_in_view_indices = peak_times_all[
-        (peak_times_all >= start_time) & (peak_times_all <= end_time)
-    ].index.tolist()
-
-    if peaks_in_view_indices:
-        
-        peak_times_in_view = ekg_obj.df.loc[peaks_in_view_indices, "Zeit in s"]
-        peak_values_in_view = ekg_obj.df.loc[peaks_in_view_indices, "Messwerte in mV"]
-
-
-    heart_rate_df_full = None
-    try:
-        heart_rate_df_full = ekg_obj.estimate_heart_rate()
-        
-        
+    if heart_rate_df_full is not None:
         heart_rate_df_in_view = heart_rate_df_full[
             (heart_rate_df_full["Zeit in s"] >= start_time) & 
             (heart_rate_df_full["Zeit in s"] <= end_time)
@@ -251,13 +260,13 @@ def display_ekg_data_ui(ekg_obj, training_id_for_key):
                     showgrid=False
                 )
             )
-    except ValueError as e:
-        st.info(f"Herzfrequenz konnte nicht für diesen Zeitbereich berechnet werden: {e}")
-    except Exception as e:
-        st.warning(f"Fehler beim Laden der Herzfrequenzdaten: {e}")
+    elif ekg_data['heart_rate_error']:
+        level, message = ekg_data['heart_rate_error']
+        getattr(st, level)(message)
 
 
-    st.plotly_chart(fig, use_container_width=True, key=f"ekg_chart_{training_id_for_key}")
+    with span("plotly: EKG"):
+        st.plotly_chart(fig, use_container_width=True, key=f"ekg_chart_{training_id_for_key}")
 
     
     if heart_rate_df_full is not None and not heart_rate_df_full.empty:
@@ -266,16 +275,15 @@ def display_ekg_data_ui(ekg_obj, training_id_for_key):
     else:
         st.info("Für dieses Training sind keine Herzfrequenzdaten zur Berechnung des Durchschnitts verfügbar.")
 
+@timed()
 def load_fit_data(fit_filepath):
     """
-    Lädt und parst eine FIT-Datei, extrahiert relevante Trainingsdaten und konvertiert
-    diese in ein Pandas DataFrame. Dabei werden spezifische Felder wie Zeit, Geschwindigkeit,
-    Herzfrequenz, Distanz, Trittfrequenz, Leistung sowie GPS-Koordinaten (Längen- und Breitengrad)
-    berücksichtigt. Fehlende Datenpunkte werden mit der vorhergehenden und nachfolgenden gültigen
+    Stellt die Trainingsdaten einer FIT-Datei für die Analyse-Panels zusammen: Zeit, Geschwindigkeit,
+    Herzfrequenz, Distanz, Trittfrequenz, Leistung sowie GPS-Koordinaten (Längen- und Breitengrad).
+    Gelesen wird die Datei über `read_fit_records` (`Module.trackdaten`, gemeinsamer Ladecache).
+    Fehlende Datenpunkte werden mit der vorhergehenden und nachfolgenden gültigen
     Messung aufgefüllt.
 
-    Während des Lade- und Verarbeitungsvorgangs wird ein Streamlit-Spinner angezeigt.
-
     Args:
         fit_filepath (str): Der absolute oder relative Pfad zur FIT-Datei.
 
@@ -284,92 +292,65 @@ def load_fit_data(fit_filepath):
                                   Trainingsdaten enthält. Die Spalten sind: 'time', 'velocity',
                                   'heart_rate', 'distance', 'cadence', 'power', 'latitude', 'longitude'.
                                   Gibt `None` zurück, wenn der angegebene Pfad ungültig ist, die Datei
-                                  nicht existiert, ein Fehler beim Parsen der FIT-Datei auftritt oder
-                                  ein anderer unerwarteter Fehler während des Vorgangs auftritt.
-                                  Fehlermeldungen werden über `st.error` ausgegeben.
+                                  nicht existiert oder nicht geparst werden kann.
+                                  Spinner und Fehlermeldung zeigt der Aufrufer.
     """
-    abs_filepath = fit_filepath
-    if not abs_filepath or not os.path.exists(abs_filepath):
+    records = read_fit_records(fit_filepath)
+    if records is None:
         return None
-    
-    
-    with st.spinner(f"Lade und verarbeite FIT-Daten ..."):
-        try:
-            fitfile = fitparse.FitFile(abs_filepath)
-
-            time_data = []
-            velocity_data = []
-            heartrate_data = []
-            distance_data = []
-            cadence_data = []
-            power_data = []
-            latitude_data = []
-            longitude_data = []
-
-            for record in fitfile.get_messages('record'):
-                
-                timestamp = None
-                speed_val = None
-                hr_val = None
-                dist_val = None
-                cadence_val = None
-                power_val = None
-                lat_val = None
-                lon_val = None
+    df = records[["time", "velocity", "heart_rate", "distance", "cadence", "power", "latitude", "longitude"]]
+    return df.ffill().bfill()
 
-                
-                record_values = {data.name: data.value for data in record}
 
-                
-                timestamp = record_values.get("timestamp")
-                speed_val = record_values.get("speed")
-                hr_val = record_values.get("heart_rate")
-                dist_val = record_values.get("distance")
-                cadence_val = record_values.get("cadence")
-                power_val = record_values.get("power")
-                
-                
-                lat_semicircles = record_values.get("position_lat")
-                lon_semicircles = record_values.get("position_long")
+# --- Zwischengespeicherte Eingaben der Analyse-Panels ---
+# Geladen wird über den gemeinsamen Ladecache (`Module.ladecache`, Schlüssel: Inhalts-Hash bzw. Pfad,
+# Größe und Änderungszeit). Die Panels laufen als Fragmente und werden bei jeder Widget-Interaktion
+# erneut ausgeführt, ohne die Datei erneut zu parsen; andere Sitzungen nutzen dieselben Objekte.
 
-                if lat_semicircles is not None:
-                    lat_val = lat_semicircles * (180.0 / 2**31)
-                if lon_semicircles is not None:
-                    lon_val = lon_semicircles * (180.0 / 2**31)
+def get_gpx_panel_data(gpx_filepath):
+    """Das geparste GPX-Objekt (siehe `load_gpx_data`); wird geteilt und darf nicht verändert werden."""
+    return cached_load('gpx_panel', gpx_filepath, load_gpx_data)
 
-                
-                time_data.append(timestamp)
-                velocity_data.append(speed_val)
-                heartrate_data.append(hr_val)
-                distance_data.append(dist_val)
-                cadence_data.append(cadence_val)
-                power_data.append(power_val)
-                latitude_data.append(lat_val)
-                longitude_data.append(lon_val)
-
-            df = pd.DataFrame({
-                "time": time_data,
-                "velocity": velocity_data,
-                "heart_rate": heartrate_data,
-                "distance": distance_data,
-                "cadence": cadence_data,
-                "power": power_data,
-                "latitude": latitude_data,
-                "longitude": longitude_data
-            })
-            
-            df = df.fillna(method='ffill').fillna(method='bfill')
-            return df
+def get_fit_panel_data(fit_filepath):
+    """Das FIT-DataFrame (siehe `load_fit_data`; die Datensätze liegen bereits im Ladecache)."""
+    return load_fit_data(fit_filepath)
 
-        except FileNotFoundError:
-            st.error(f"Fehler: FIT-Datei {repr(fit_filepath)} wurde nicht gefunden.")
-            return None
-        except fitparse.FitParseError as e:
-            st.error(f"Fehler beim Parsen der FIT-Datei {repr(fit_filepath)}: {e}.")
-            return None
-        except Exception as e:
-            st.error(f"Ein unerwarteter Fehler ist aufgetreten beim Laden von {repr(fit_filepath)}: {e}")
-            return None
+def get_power_curve_data(fit_filepath):
+    """Die Power Curve einer FIT-Datei (siehe `create_power_curve`)."""
+    def build_power_curve(path):
+        fit_df = get_fit_panel_data(path)
+        return create_power_curve(fit_df) if fit_df is not None else pd.DataFrame()
+    return cached_load('power_curve', fit_filepath, build_power_curve)
+
+def get_ekg_panel_data(ekg_filepath):
+    """
+    Lädt eine EKG-Datei und berechnet einmalig Zeitachse und Herzfrequenzverlauf für den EKG-Viewer.
+
+    Args:
+        ekg_filepath (str): Pfad zur EKG-Datei.
+
+    Returns:
+        dict or None: {'df': Messwerte mit Spalte 'Zeit in s', 'heart_rate': DataFrame oder None,
+                       'heart_rate_error': (Stufe, Meldung) oder None}; None, wenn die Datei nicht geladen werden konnte.
+    """
+    return cached_load('ekg_panel', ekg_filepath, build_ekg_panel_data)
+
+@timed()
+def build_ekg_panel_data(ekg_filepath):
+    """Lädt die EKG-Datei für `get_ekg_panel_data` (ohne Cache)."""
+    ekg_obj = load_ekg_data(ekg_filepath)
+    if ekg_obj is None or ekg_obj.df.empty:
+        return None
+    t0 = ekg_obj.df["Zeit in ms"].iloc[0]
+    ekg_obj.df["Zeit in s"] = (ekg_obj.df["Zeit in ms"] - t0) / 1000
+    heart_rate_df, heart_rate_error = None, None
+    try:
+        heart_rate_df = ekg_obj.estimate_heart_rate()
+    except ValueError as e:
+        heart_rate_error = ("info", f"Herzfrequenz konnte nicht für diesen Zeitbereich berechnet werden: {e}")
+    except Exception as e:
+        heart_rate_error = ("warning", f"Fehler beim Laden der Herzfrequenzdaten: {e}")
+    return {'df': ekg_obj.df, 'heart_rate': heart_rate_df, 'heart_rate_error': heart_rate_error}
 
 
 # --- Power Curve Funktionen ---
@@ -404,6 +385,7 @@ def find_best_effort(df, window_size, power_col="power"):
     max_value = df[power_col].rolling(window=window_size).mean()
     return int(max_value.max()) if not max_value.empty and not pd.isna(max_value.max()) else None
 
+@timed()
 def create_power_curve(df, power_col="power"):
     """
     Erstellt eine Power-Kurve aus den bereitgestellten Trainingsdaten.
@@ -445,11 +427,10 @@ def create_power_curve(df, power_col="power"):
         return pd.DataFrame() 
 
     
-    with st.spinner("Berechne Power Curve..."):
-        for size in valid_window_sizes:
-            best_effort = find_best_effort(df, size, power_col)
-            if best_effort is not None:
-                best_efforts[size] = best_effort
+    for size in valid_window_sizes:
+        best_effort = find_best_effort(df, size, power_col)
+        if best_effort is not None:
+            best_efforts[size] = best_effort
     
     if not best_efforts:
         return pd.DataFrame() 
@@ -514,6 +495,24 @@ def plot_power_curve(power_curve_df):
 
 # --- UI-Komponenten als Funktionen ---
 
+def render_track_map(segments, color, height=500):
+    """
+    Zeigt die Karte eines Tracks an. Das HTML kommt aus dem Kartencache (pro Track-Hash und
+    Vereinfachungsstufe), damit es bei Reruns nicht neu erzeugt wird. Da das HTML identisch
+    bleibt, lädt der Browser den Karten-iframe bei einem Rerun auch nicht neu.
+
+    Args:
+        segments (list): Liste von (lat, lon)-Tupeln aus numpy.ndarray, eines pro Tracksegment.
+        color (str): Linienfarbe des Tracks.
+        height (int, optional): Höhe der Karte in Pixeln.
+
+    Returns:
+        None: Die Funktion rendert die Karte direkt in der Streamlit-Anwendung.
+    """
+    with span("Karte: Track"):
+        components.html(kartencache.get_track_map_html(segments, color), height=height + 10, width=700)
+
+
 def display_gpx_on_map_ui(gpx_object, training_id_for_key):
     """
     Zeigt einen GPX-Track auf einer interaktiven Folium-Karte in der Streamlit-Benutzeroberfläche an.
@@ -547,29 +546,14 @@ def display_gpx_on_map_ui(gpx_object, training_id_for_key):
         st.warning("GPX-Track hat keine Punkte für die Karte.")
         return
 
-    first_point = None
-    for track in gpx_object.tracks:
-        if track.segments and track.segments[0].points:
-            first_point = track.segments[0].points[0]
-            break
-    
-    if not first_point:
-        st.warning("Konnte keinen Startpunkt für die Karte finden.")
-        return
-
-    m = folium.Map(location=[first_point.latitude, first_point.longitude], zoom_start=13)
-
+    segments = []
     for track in gpx_object.tracks:
         for segment in track.segments:
-            points = [(point.latitude, point.longitude) for point in segment.points]
-            if points:
-                folium.PolyLine(points, color="red", weight=2.5, opacity=1).add_to(m)
-
-    bounds = gpx_object.get_bounds()
-    if bounds:
-        m.fit_bounds([[bounds.min_latitude, bounds.min_longitude], [bounds.max_latitude, bounds.max_longitude]])
+            if segment.points:
+                segments.append((np.array([point.latitude for point in segment.points]),
+                                 np.array([point.longitude for point in segment.points])))
 
-    folium_static(m)
+    render_track_map(segments, color="red")
 
 
 def display_fit_map_ui(fit_df, training_id_for_key):
@@ -605,19 +589,8 @@ def display_fit_map_ui(fit_df, training_id_for_key):
         st.warning("Zu wenige GPS-Punkte in der FIT-Datei, um eine Strecke zu zeichnen.")
         return
 
-    first_point = track_points.iloc[0]
-    m = folium.Map(location=[first_point['latitude'], first_point['longitude']], zoom_start=13)
-
-    points = [(row['latitude'], row['longitude']) for index, row in track_points.iterrows()]
-    
-    folium.PolyLine(points, color="blue", weight=2.5, opacity=1).add_to(m)
-
-    # Versuche, die Karte an die Grenzen der Strecke anzupassen
-    min_lat, max_lat = track_points['latitude'].min(), track_points['latitude'].max()
-    min_lon, max_lon = track_points['longitude'].min(), track_points['longitude'].max()
-    m.fit_bounds([[min_lat, min_lon], [max_lat, max_lon]])
-
-    folium_static(m) 
+    segments = [(track_points['latitude'].to_numpy(dtype=float), track_points['longitude'].to_numpy(dtype=float))]
+    render_track_map(segments, color="blue")
 
 
 def display_elevation_profile_ui(gpx_object, training_id_for_key):
@@ -710,22 +683,109 @@ def display_elevation_profile_ui(gpx_object, training_id_for_key):
         zerolinecolor='LightGrey'
     )
 
-    st.plotly_chart(fig, use_container_width=True, key=f"elevation_profile_{training_id_for_key}")
+    with span("plotly: Höhenprofil"):
+        st.plotly_chart(fig, use_container_width=True, key=f"elevation_profile_{training_id_for_key}")
+
+def create_fit_channels_figure(fit_df, channels, x_range=None, max_points=CHART_POINTS):
+    """
+    Erstellt ein Diagramm mit einer Zeile pro Messkanal und gemeinsamer Zeitachse. Jeder Kanal wird mit
+    Largest-Triangle-Three-Buckets auf höchstens `max_points` Punkte (plus Minimum und Maximum) ausgedünnt
+    und per WebGL (`Scattergl`) gezeichnet. Mit `x_range` wird nur dieser Zeitbereich ausgedünnt, beim
+    Heranzoomen erscheinen so wieder alle Details.
+
+    Args:
+        fit_df (pandas.DataFrame): FIT-Daten mit Spalte 'time' (datetime) und den Kanälen.
+        channels (list): (Bezeichnung, Spalte, Achsentitel)-Tupel der anzuzeigenden Kanäle.
+        x_range (tuple, optional): (Start, Ende) als pandas.Timestamp.
+        max_points (int, optional): Zielpunktzahl pro Kanal.
+
+    Returns:
+        tuple: (plotly.graph_objects.Figure, Anzahl der gezeichneten Punkte über alle Kanäle).
+    """
+    if x_range is not None:
+        fit_df = fit_df[(fit_df['time'] >= x_range[0]) & (fit_df['time'] <= x_range[1])]
+    fig = plotly_subplots.make_subplots(rows=len(channels), cols=1, shared_xaxes=True, vertical_spacing=0.06,
+                        subplot_titles=[label for label, _, _ in channels])
+    drawn_points = 0
+    for row, (label, column, axis_title) in enumerate(channels, start=1):
+        channel_df = fit_df[['time', column]].dropna()
+        times = channel_df['time'].to_numpy()
+        values = channel_df[column].to_numpy(dtype=float)
+        keep = downsample_lttb(times.astype('datetime64[ns]').astype(np.int64), values, max_points)
+        drawn_points += len(keep)
+        fig.add_trace(go.Scattergl(x=times[keep], y=values[keep], mode='lines', name=label), row=row, col=1)
+        fig.update_yaxes(title_text=axis_title, row=row, col=1)
+    fig.update_layout(height=FIT_CHART_ROW_HEIGHT * len(channels) + 60, showlegend=False,
+                      hovermode="x unified", dragmode="select", selectdirection="h",
+                      margin=dict(l=10, r=10, t=40, b=10))
+    return fig, drawn_points
+
+def parse_selected_range(event):
+    """
+    Liest den per Rechteck markierten Zeitbereich aus dem Auswahl-Ereignis von `st.plotly_chart`.
+
+    Args:
+        event: Rückgabe von `st.plotly_chart(..., on_select="rerun")`.
 
-def display_fit_data_ui(fit_df, training_id_for_key):
+    Returns:
+        tuple or None: (Start, Ende) als pandas.Timestamp oder None ohne Auswahl.
+    """
+    boxes = event.selection.get('box', []) if event else []
+    if not boxes or len(boxes[0].get('x', [])) != 2:
+        return None
+    start, end = sorted(pd.Timestamp(value) for value in boxes[0]['x'])
+    return (start, end) if start < end else None
+
+def display_fit_channels_ui(fit_df, channels, training_id_for_key):
+    """
+    Zeigt die ausgewählten FIT-Kanäle in einem gemeinsamen, ausgedünnten Diagramm an
+    (siehe `create_fit_channels_figure`). Ein mit der Maus markierter Zeitbereich wird in voller
+    Auflösung nachgeladen; "Gesamte Aufzeichnung" kehrt zur Übersicht zurück.
+
+    Args:
+        fit_df (pandas.DataFrame): FIT-Daten.
+        channels (list): (Bezeichnung, Spalte, Achsentitel)-Tupel der anzuzeigenden Kanäle.
+        training_id_for_key (int or str): Eindeutige ID für die Widget-Schlüssel.
+
+    Returns:
+        None
+    """
+    zoom = st.session_state.setdefault(f"fit_chart_zoom_{training_id_for_key}", {'range': None, 'version': 0})
+    with st.spinner("Erstelle Diagramme..."), span("FIT-Kanäle: Diagramm erstellen"):
+        fig, drawn_points = create_fit_channels_figure(fit_df, channels, zoom['range'])
+    with span("plotly: FIT-Kanäle"):
+        event = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="box",
+                                key=f"fit_channels_chart_{training_id_for_key}_{zoom['version']}")
+    selected_range = parse_selected_range(event)
+    if selected_range is not None:
+        # Neuer Schlüssel: das nachgeladene Diagramm beginnt ohne Markierung
+        zoom['range'], zoom['version'] = selected_range, zoom['version'] + 1
+        st.rerun(scope="fragment")
+
+    caption = f"{drawn_points} von {len(fit_df) * len(channels)} Messpunkten dargestellt. Zeitbereich markieren zum Vergrößern."
+    if zoom['range'] is None:
+        st.caption(caption)
+        return
+    caption_col, reset_col = st.columns([3, 1])
+    caption_col.caption(caption)
+    if reset_col.button("Gesamte Aufzeichnung", key=f"fit_chart_reset_{training_id_for_key}"):
+        zoom['range'], zoom['version'] = None, zoom['version'] + 1
+        st.rerun(scope="fragment")
+
+@st.fragment
+def display_fit_data_ui(fit_filepath, training_id_for_key):
     """
     Zeigt verschiedene Diagramme und Analysen basierend auf FIT-Trainingsdaten in einer Streamlit-Anwendung an.
     Dazu gehören interaktive Diagramme für Herzfrequenz, Leistung, Geschwindigkeit, Trittfrequenz und eine Power Curve,
     sowie eine Karte des Trainings-Tracks, falls GPS-Daten vorhanden sind.
 
     Die Funktion überprüft das Vorhandensein relevanter Daten in der FIT-Datei und bietet dem Benutzer Checkboxen an,
-    um auszuwählen, welche Diagramme angezeigt werden sollen.
+    um auszuwählen, welche Diagramme angezeigt werden sollen. Läuft als Fragment: Ein Umschalten der Checkboxen
+    führt nur dieses Panel erneut aus; FIT-Daten und Power Curve kommen aus dem Cache.
 
     Args:
-        fit_df (pandas.DataFrame or None): Ein Pandas DataFrame, das die aus einer FIT-Datei geladenen Trainingsdaten enthält.
-                                           Es wird erwartet, dass es Spalten wie 'time', 'heart_rate', 'power',
-                                           'velocity', 'cadence', 'latitude', 'longitude' enthält.
-                                           Wenn None oder leer, werden keine Daten angezeigt.
+        fit_filepath (str): Pfad zur FIT-Datei. Das daraus geladene DataFrame enthält Spalten wie 'time',
+                            'heart_rate', 'power', 'velocity', 'cadence', 'latitude', 'longitude'.
         training_id_for_key (int or str): Eine eindeutige ID, die für die Generierung der Streamlit-Widget-Schlüssel
                                           verwendet wird, um Konflikte zu vermeiden, wenn mehrere Trainings
                                           auf derselben Seite angezeigt werden.
@@ -735,6 +795,7 @@ def display_fit_data_ui(fit_df, training_id_for_key):
               Sie gibt Warnungen oder Informationen aus, wenn bestimmte Daten nicht verfügbar sind
               oder Fehler bei der Datenverarbeitung auftreten.
     """
+    fit_df = get_fit_panel_data(fit_filepath)
     if fit_df is None or fit_df.empty:
         st.markdown("Keine FIT-Daten zum Anzeigen vorhanden.")
         return
@@ -806,12 +867,14 @@ def display_fit_data_ui(fit_df, training_id_for_key):
         if has_power_data:
             st.markdown("### Power Curve")
             
-            power_curve_df = create_power_curve(fit_df)
+            with st.spinner("Berechne Power Curve..."):
+                power_curve_df = get_power_curve_data(fit_filepath)
             if not power_curve_df.empty:
                 
                 with st.spinner("Erstelle Power Curve Diagramm..."):
                     fig_power_curve = plot_power_curve(power_curve_df)
-                    st.plotly_chart(fig_power_curve, use_container_width=True, key=f"power_curve_{training_id_for_key}")
+                    with span("plotly: Power Curve"):
+                        st.plotly_chart(fig_power_curve, use_container_width=True, key=f"power_curve_{training_id_for_key}")
             else:
                 st.info("Konnte Power Curve nicht erstellen, möglicherweise nicht genügend Leistungsdaten.")
         else: 
@@ -820,45 +883,16 @@ def display_fit_data_ui(fit_df, training_id_for_key):
         pass
 
 
-    if "Herzfrequenz" in checkbox_states and checkbox_states["Herzfrequenz"]:
-        if 'heart_rate' in fit_df.columns and fit_df['heart_rate'].dropna().any():
-            with st.spinner("Erstelle Herzfrequenzdiagramm..."):
-                fig_hr = px.line(fit_df, x='time', y='heart_rate', title='Herzfrequenz über die Zeit',
-                                 labels={'time': 'Zeit', 'heart_rate': 'Herzfrequenz (bpm)'})
-                fig_hr.update_layout(hovermode="x unified")
-                st.plotly_chart(fig_hr, use_container_width=True, key=f"hr_chart_{training_id_for_key}")
-        else:
-            st.info("Keine Herzfrequenzdaten in der FIT-Datei gefunden.")
-    
-    if "Leistung" in checkbox_states and checkbox_states["Leistung"]:
-        if has_power_data:
-            with st.spinner("Erstelle Leistungsdiagramm..."):
-                fig_power = px.line(fit_df, x='time', y='power', title='Leistung über die Zeit',
-                                     labels={'time': 'Zeit', 'power': 'Leistung (Watt)'})
-                fig_power.update_layout(hovermode="x unified")
-                st.plotly_chart(fig_power, use_container_width=True, key=f"power_chart_{training_id_for_key}")
+    selected_channels = []
+    for label, column, axis_title in FIT_CHART_CHANNELS:
+        if not checkbox_states.get(label):
+            continue
+        if column in fit_df.columns and fit_df[column].dropna().any():
+            selected_channels.append((label, column, axis_title))
         else:
-            st.info("Keine Leistungsdaten in der FIT-Datei gefunden.")
-
-    if "Geschwindigkeit" in checkbox_states and checkbox_states["Geschwindigkeit"]:
-        if 'velocity' in fit_df.columns and fit_df['velocity'].dropna().any():
-            with st.spinner("Erstelle Geschwindigkeitsdiagramm..."):
-                fig_vel = px.line(fit_df, x='time', y='velocity', title='Geschwindigkeit über die Zeit',
-                                     labels={'time': 'Zeit', 'velocity': 'Geschwindigkeit (m/s)'})
-                fig_vel.update_layout(hovermode="x unified")
-                st.plotly_chart(fig_vel, use_container_width=True, key=f"velocity_chart_{training_id_for_key}")
-        else:
-            st.info("Keine Geschwindigkeitsdaten in der FIT-Datei gefunden.")
-
-    if "Trittfrequenz" in checkbox_states and checkbox_states["Trittfrequenz"]:
-        if 'cadence' in fit_df.columns and fit_df['cadence'].dropna().any():
-            with st.spinner("Erstelle Trittfrequenzdiagramm..."):
-                fig_cad = px.line(fit_df, x='time', y='cadence', title='Trittfrequenz über die Zeit',
-                                     labels={'time': 'Zeit', 'cadence': 'Trittfrequenz (rpm)'})
-                fig_cad.update_layout(hovermode="x unified")
-                st.plotly_chart(fig_cad, use_container_width=True, key=f"cadence_chart_{training_id_for_key}")
-        else:
-            st.info("Keine Trittfrequenzdaten in der FIT-Datei gefunden.")
+            st.info(f"Keine Daten für {label} in der FIT-Datei gefunden.")
+    if selected_channels:
+        display_fit_channels_ui(fit_df, selected_channels, training_id_for_key)
 
 
 # --- Callback-Funktionen ---
@@ -893,6 +927,8 @@ def delete_training_from_db(training_id, person_id):
     1. Löscht den Trainingsdatensatz direkt aus der Trainingsdatenbank (`db`).
     2. Sucht den entsprechenden Personendatensatz in der Personendatenbank (`dp`)
        und entfernt die `training_id` aus deren `ekg_tests`-Liste.
+    3. Zieht den Beitrag des Trainings von der Zusammenfassung der Person ab.
+    4. Löscht nach dem Commit die Dateien des Trainings, sofern kein anderes Training mehr darauf verweist.
 
     Args:
         training_id (int or str): Die eindeutige ID des zu löschenden Trainings.
@@ -905,30 +941,107 @@ def delete_training_from_db(training_id, person_id):
               direkt in der Streamlit-Benutzeroberfläche an (`st.success`, `st.warning`, `st.error`).
     """
     try:
-        db.remove(doc_ids=[training_id])
-        st.success(f"Training mit ID {training_id} erfolgreich aus der Trainingsdatenbank gelöscht.")
-
-        person_doc = dp.get(doc_id=int(person_id))
-        if person_doc:
-            current_ekg_tests = person_doc.get('ekg_tests', [])
-            if training_id in current_ekg_tests:
-                current_ekg_tests.remove(training_id)
-                dp.update({'ekg_tests': current_ekg_tests}, doc_ids=[int(person_id)])
-                st.success(f"Training ID {training_id} erfolgreich aus der Personendatenbank für Person {person_id} entfernt.")
+        old_training = db.get(doc_id=training_id) or {}
+        # Training und Verknüpfung werden gemeinsam geschrieben (ein Commit)
+        with transaction():
+            db.remove(doc_ids=[training_id])
+            st.success(f"Training mit ID {training_id} erfolgreich aus der Trainingsdatenbank gelöscht.")
+
+            person_doc = dp.get(doc_id=int(person_id))
+            if person_doc:
+                current_ekg_tests = person_doc.get('ekg_tests', [])
+                if training_id in current_ekg_tests:
+                    current_ekg_tests.remove(training_id)
+                    dp.update({'ekg_tests': current_ekg_tests}, doc_ids=[int(person_id)])
+                    st.success(f"Training ID {training_id} erfolgreich aus der Personendatenbank für Person {person_id} entfernt.")
+                else:
+                    st.warning(f"Training ID {training_id} wurde nicht in der EKG-Testliste für Person {person_id} gefunden.")
             else:
-                st.warning(f"Training ID {training_id} wurde nicht in der EKG-Testliste für Person {person_id} gefunden.")
-        else:
-            st.error(f"Fehler: Person mit ID {person_id} nicht in der Personendatenbank gefunden.")
+                st.error(f"Fehler: Person mit ID {person_id} nicht in der Personendatenbank gefunden.")
+            remove_training_from_summary(training_id)
+
+        streckenerkennung.get_routen_index().remove_training(training_id)
+        heatmap.PersonalHeatmap(person_id).remove_training(training_id)
+        segmente.remove_training_efforts(training_id)
+        release_files(old_training.get(field) for field in TABLES['trainings']['file_fields'])
     except Exception as e:
         st.error(f"Fehler beim Löschen des Trainings: {e}")
 
 # --- UI für Details und Liste ---
 
+@st.fragment
+def display_training_files_ui(training_data, training_id_str):
+    """
+    Lädt GPX-, FIT- und EKG-Datei eines Trainings und zeigt Karten, Höhenprofil und Diagramme an.
+    Läuft als Fragment, FIT- und EKG-Panel sind wiederum eigene Fragmente: Interaktionen mit deren
+    Widgets führen nur das jeweilige Panel erneut aus, nicht die ganze Trainingsliste.
+
+    Args:
+        training_data (dict or tinydb.database.Document): Das Trainings-Dokument.
+        training_id_str (str): Die ID des Trainings als String (für eindeutige Widget-Schlüssel).
+
+    Returns:
+        None
+    """
+    gpx_file_path_from_db = training_data.get('gpx_file')
+    # Spinner für GPX-Daten
+    with st.spinner("Lade GPX-Daten..."):
+        gpx_data = get_gpx_panel_data(gpx_file_path_from_db)
+    if gpx_data:
+        st.markdown("### GPX-Track auf Karte")
+        # Spinner für die Kartendarstellung
+        with st.spinner("Rendere GPX-Karte..."):
+            display_gpx_on_map_ui(gpx_data, training_id_str)
+        st.markdown("### Höhenprofil")
+        # Spinner für das Höhenprofil
+        with st.spinner("Erstelle Höhenprofil..."):
+            display_elevation_profile_ui(gpx_data, training_id_str)
+    else:
+        if gpx_file_path_from_db and gpx_file_path_from_db != "-":
+            st.warning(f"GPX-Datei {repr(gpx_file_path_from_db)} konnte nicht geladen oder geparst werden.")
+        else:
+            st.markdown("Keine GPX-Datei verlinkt.")
+
+    fit_file_path_from_db = training_data.get('fit_file')
+    with st.spinner("Lade FIT-Daten..."):
+        fit_data_df = get_fit_panel_data(fit_file_path_from_db)
+    if fit_data_df is not None and not fit_data_df.empty:
+        st.markdown("---")
+        st.markdown("### FIT-Dateianalyse")
+        display_fit_data_ui(fit_file_path_from_db, training_id_str)
+    else:
+        if fit_file_path_from_db and fit_file_path_from_db != "-":
+            st.warning(f"FIT-Datei {repr(fit_file_path_from_db)} konnte nicht geladen oder geparst werden.")
+        else:
+            st.markdown("Keine FIT-Datei verlinkt.")
+
+    ekg_file_path_from_db = training_data.get('ekg_file')
+    with st.spinner("Lade EKG-Daten..."):
+        ekg_data = get_ekg_panel_data(ekg_file_path_from_db)
+    if ekg_data:
+        st.markdown("---")
+        display_ekg_data_ui(ekg_file_path_from_db, training_id_str)
+    else:
+        if ekg_file_path_from_db and ekg_file_path_from_db != "-":
+            st.warning(f"EKG-Datei {repr(ekg_file_path_from_db)} konnte nicht geladen werden.")
+        # This 'else' block ensures that "Keine weiteren Dateien verlinkt." is only shown if no other file types were found
+        elif not (gpx_file_path_from_db and gpx_file_path_from_db != "-") and \
+             not (fit_file_path_from_db and fit_file_path_from_db != "-"):
+            st.markdown("Keine weiteren Dateien verlinkt.")
+
+def remember_expanded_training(training_id, details_key):
+    """Merkt sich das zuletzt geöffnete Training, damit es beim Zurückkehren zur Liste wieder aufgeklappt ist."""
+    if st.session_state.get(details_key):
+        st.session_state.last_expanded_training_id = training_id
+
 def display_training_details_ui(training_data, on_delete_callback, on_edit_callback, expanded=False):
     """
     Displays the detailed information of a single training session within a Streamlit expander.
     It includes general training metrics, an associated image (if available), and visual analyses
     from linked GPX, FIT, and EKG files. Users can also choose to edit or delete the training.
+    Streamlit runs the body of collapsed expanders too, so the details sit behind a per-entry
+    toggle (`training_details_<id>` in the session state): until it is switched on only the title
+    (built from stored fields) and the processing status are rendered, and no linked files are loaded.
 
     Args:
         training_data (dict or tinydb.database.Document): A dictionary-like object containing
@@ -955,12 +1068,41 @@ def display_training_details_ui(training_data, on_delete_callback, on_edit_callb
     """
     training_id_str = str(training_data.doc_id) if hasattr(training_data, 'doc_id') else str(training_data.get('id', 'no_id'))
     
+    # Zusammenfassung im Titel nur aus gespeicherten Feldern; geschlossene Einträge laden keine Dateien
     expander_title = f"**{training_data['name']}** - {training_data['date']} ({training_data['sportart']})"
+    if isinstance(training_data.get('distanz'), (int, float)) and training_data['distanz'] > 0:
+        expander_title += f" · {training_data['distanz']} km"
+    if isinstance(training_data.get('dauer'), (int, float)) and training_data['dauer'] > 0:
+        expander_title += f" · {int(training_data['dauer']) // 60}:{int(training_data['dauer']) % 60:02d} h"
+    processing_state = training_data.get(PROCESSING_FIELD)
+    if processing_state == 'ausstehend':
+        expander_title += " ⏳ wird verarbeitet"
+    elif processing_state == 'fehler':
+        expander_title += " ⚠️ Verarbeitung fehlgeschlagen"
     
+    details_key = f"training_details_{training_id_str}"
+    if expanded and details_key not in st.session_state:
+        st.session_state[details_key] = True
     with st.expander(expander_title, expanded=expanded):
+        if processing_state == 'ausstehend':
+            st.info("Dieses Training wird im Hintergrund ausgewertet (Zusammenfassung, Strecken, Heatmap, Segmente).")
+        elif processing_state == 'fehler':
+            job = pending_jobs(st.session_state.current_user_id).get(training_data.doc_id, {})
+            st.warning(f"Die Verarbeitung ist fehlgeschlagen: {job.get('fehler') or 'unbekannter Fehler'}")
+            if st.button("Verarbeitung wiederholen 🔄", key=f"retry_btn_{training_id_str}"):
+                if retry_job(training_data.doc_id):
+                    start_worker()
+                st.rerun()
+        if not st.toggle("Details anzeigen", key=details_key, on_change=remember_expanded_training,
+                         args=(training_data.doc_id, details_key)):
+            return
         st.markdown(f"<span style='font-size:30px; font-weight:bold'>{training_data['name']}</span>", unsafe_allow_html=True)
         st.markdown(f"**Datum:** {training_data['date']}")
         st.markdown(f"**Sportart:** {training_data['sportart']}")
+
+        previous_same_route = streckenerkennung.get_routen_index().count_previous_matches(training_id_str) if training_id_str.isdigit() else 0
+        if previous_same_route > 0:
+            st.markdown(f"🔁 **Gleiche Strecke wie {previous_same_route} vorherige{'s' if previous_same_route == 1 else ''} Training{'s' if previous_same_route != 1 else ''}**")
         
         duration_minutes = training_data.get('dauer')
         if duration_minutes is not None:
@@ -1007,56 +1149,13 @@ def display_training_details_ui(training_data, on_delete_callback, on_edit_callb
         image_path_from_db = training_data.get('image')
         local_image_path = image_path_from_db
         if local_image_path and os.path.exists(local_image_path):
-            st.image(local_image_path, caption=f"", use_container_width=True)
+            st.image(rendition_path(local_image_path, 'card'), caption=f"", use_container_width=True)
         elif image_path_from_db and image_path_from_db != "-":
             st.warning(f"Bilddatei {repr(image_path_from_db)} konnte nicht gefunden werden.")
 
         st.markdown("---")
-        gpx_file_path_from_db = training_data.get('gpx_file')
-        # Spinner für GPX-Daten
-        with st.spinner("Lade GPX-Daten..."):
-            gpx_data = load_gpx_data(gpx_file_path_from_db)
-        if gpx_data:
-            st.markdown("### GPX-Track auf Karte")
-            # Spinner für die Kartendarstellung
-            with st.spinner("Rendere GPX-Karte..."):
-                display_gpx_on_map_ui(gpx_data, training_id_str)
-            st.markdown("### Höhenprofil")
-            # Spinner für das Höhenprofil
-            with st.spinner("Erstelle Höhenprofil..."):
-                display_elevation_profile_ui(gpx_data, training_id_str)
-        else:
-            if gpx_file_path_from_db and gpx_file_path_from_db != "-":
-                st.warning(f"GPX-Datei {repr(gpx_file_path_from_db)} konnte nicht geladen oder geparst werden.")
-            else:
-                st.markdown("Keine GPX-Datei verlinkt.")
-
-        fit_file_path_from_db = training_data.get('fit_file')
-        # Spinner für FIT-Daten ist bereits in load_fit_data()
-        fit_data_df = load_fit_data(fit_file_path_from_db)
-        if fit_data_df is not None and not fit_data_df.empty:
-            st.markdown("---")
-            st.markdown("### FIT-Dateianalyse")
-            display_fit_data_ui(fit_data_df, training_id_str)
-        else:
-            if fit_file_path_from_db and fit_file_path_from_db != "-":
-                st.warning(f"FIT-Datei {repr(fit_file_path_from_db)} konnte nicht geladen oder geparst werden.")
-            else:
-                st.markdown("Keine FIT-Datei verlinkt.")
-
-        ekg_file_path_from_db = training_data.get('ekg_file')
-        with st.spinner("Lade EKG-Daten..."):
-            ekg_obj = load_ekg_data(ekg_file_path_from_db)
-        if ekg_obj:
-            st.markdown("---")
-            display_ekg_data_ui(ekg_obj, training_id_str)
-        else:
-            if ekg_file_path_from_db and ekg_file_path_from_db != "-":
-                st.warning(f"EKG-Datei {repr(ekg_file_path_from_db)} konnte nicht geladen werden.")
-            # This 'else' block ensures that "Keine weiteren Dateien verlinkt." is only shown if no other file types were found
-            elif not (gpx_file_path_from_db and gpx_file_path_from_db != "-") and \
-                 not (fit_file_path_from_db and fit_file_path_from_db != "-"):
-                st.markdown("Keine weiteren Dateien verlinkt.")
+        # Dateien laden und Diagramme bauen: nur für das geöffnete Training, in einem eigenen Fragment
+        display_training_files_ui(training_data, training_id_str)
 
         st.markdown("---")
 
@@ -1070,18 +1169,113 @@ def display_training_details_ui(training_data, on_delete_callback, on_edit_callb
                 st.success(f"Training '{training_data['name']}' vom {training_data['date']} wurde gelöscht.")
                 st.rerun()
 
-def display_training_list_ui(trainings):
+def display_training_filter_ui(person_id):
     """
-    Zeigt eine Liste aller Trainings für die aktuell ausgewählte Person an.
+    Zeigt Filter und Sortierung der Trainingsliste an. Die Auswahl wird unverändert an die
+    Datenbank weitergegeben, die über ihre Indizes filtert und sortiert.
+
+    Args:
+        person_id (int): Die doc_id der aktuellen Person (für die Auswahl der Sportarten).
+
+    Returns:
+        tuple: (Filterliste für `query_page`, Sortierspalte, absteigend).
+    """
+    sportarten = sorted(name for name in get_summary(person_id)['sportarten'] if name != "Unbekannt")
+    with st.expander("Filter & Sortierung"):
+        search_text = st.text_input("Suche in Name, Beschreibung und Sportart", key="filter_suche")
+        col_sport, col_date = st.columns(2)
+        with col_sport:
+            selected_sports = st.multiselect("Sportart", sportarten, key="filter_sportart")
+        with col_date:
+            date_range = st.date_input("Zeitraum", value=(), key="filter_zeitraum")
+        col_dist, col_rating, col_sort = st.columns(3)
+        with col_dist:
+            min_distance = st.number_input("Mindestdistanz (km)", min_value=0.0, step=1.0, key="filter_distanz")
+        with col_rating:
+            min_rating = st.select_slider("Mindestbewertung", options=[0, 1, 2, 3, 4, 5], key="filter_bewertung",
+                                          format_func=lambda stars: '⭐' * stars if stars else "alle")
+        with col_sort:
+            sort_label = st.selectbox("Sortierung", list(SORT_OPTIONS), key="filter_sortierung")
+
+    filters = []
+    if search_text.strip():
+        # Die Volltextsuche liefert die passenden IDs, Sortierung und Blättern übernimmt wieder die Abfrage
+        filters.append(('doc_id', 'in', db.search_text_ids(search_text, limit=SEARCH_LIMIT, person_id=person_id)))
+    if selected_sports:
+        filters.append(('sportart', 'in', selected_sports))
+    if len(date_range) >= 1:
+        filters.append(('date', '>=', date_range[0].isoformat()))
+    if len(date_range) == 2:
+        filters.append(('date', '<=', date_range[1].isoformat()))
+    if min_distance > 0:
+        filters.append(('distanz', '>=', min_distance))
+    if min_rating > 0:
+        filters.append(('star_rating', '>=', min_rating))
+    order_by, descending = SORT_OPTIONS[sort_label]
+    return filters, order_by, descending
+
+def get_training_page(person_id, filters, order_by, descending):
+    """
+    Lädt die aktuelle Seite der Trainingsliste über Cursor-Pagination. Die Cursor der bereits
+    besuchten Seiten liegen im Session State, damit auch "Zurück" keine Seiten überspringen muss.
+    Ändern sich Person, Filter oder Sortierung, beginnt die Liste wieder auf der ersten Seite.
+
+    Args:
+        person_id (int): Die doc_id der aktuellen Person.
+        filters (list): Filter wie von `display_training_filter_ui` geliefert.
+        order_by (str): Sortierspalte.
+        descending (bool): Absteigend sortieren.
+
+    Returns:
+        tuple: (Trainings der Seite, Cursor der nächsten Seite oder None, Seitennummer ab 0).
+    """
+    signature = repr((person_id, filters, order_by, descending))
+    if st.session_state.get('training_page_signature') != signature:
+        st.session_state.training_page_signature = signature
+        st.session_state.training_page_cursors = [None]
+    cursors = st.session_state.training_page_cursors
+    trainings, next_cursor = db.query_page(TRAININGS_PER_PAGE, cursor=cursors[-1], order_by=order_by,
+                                           descending=descending, filters=filters, person_id=person_id)
+    return trainings, next_cursor, len(cursors) - 1
+
+def display_pagination_ui(next_cursor, page_index):
+    """
+    Zeigt die Schaltflächen zum Blättern zwischen den Seiten der Trainingsliste an.
+
+    Args:
+        next_cursor (tuple or None): Cursor der nächsten Seite; None auf der letzten Seite.
+        page_index (int): Nummer der aktuellen Seite ab 0.
+
+    Returns:
+        None
+    """
+    if page_index == 0 and next_cursor is None:
+        return
+    col_back, col_page, col_next = st.columns([1, 2, 1])
+    with col_back:
+        if st.button("◀ Zurück", disabled=page_index == 0, key="training_page_back"):
+            st.session_state.training_page_cursors.pop()
+            st.rerun()
+    with col_page:
+        st.markdown(f"Seite {page_index + 1}")
+    with col_next:
+        if st.button("Weiter ▶", disabled=next_cursor is None, key="training_page_next"):
+            st.session_state.training_page_cursors.append(next_cursor)
+            st.rerun()
+
+def display_training_list_ui(trainings, filtered=False, first_page=True):
+    """
+    Zeigt eine Seite der Trainingsliste für die aktuell ausgewählte Person an.
     Jedes Training wird in einem aufklappbaren Expander dargestellt, der detaillierte Informationen
-    und Optionen zum Bearbeiten oder Löschen des Trainings bietet. Die Liste ist nach Datum absteigend sortiert,
-    und das neueste Training wird standardmäßig aufgeklappt angezeigt.
+    und Optionen zum Bearbeiten oder Löschen des Trainings bietet. Die Reihenfolge kommt bereits
+    sortiert aus der Datenbank; beim ersten Aufruf wird der oberste Eintrag der ersten Seite aufgeklappt.
 
     Args:
-        trainings (list): Eine Liste von Trainings-Dokumenten (z.B. TinyDB-Dokumente),
-                          wobei jedes Dokument ein Wörterbuch mit Trainingsdetails wie
-                          'name', 'date', 'sportart', 'dauer', etc. ist und idealerweise
-                          ein `doc_id`-Attribut für die eindeutige Identifizierung hat.
+        trainings (list): Die Trainings-Dokumente der aktuellen Seite, wobei jedes Dokument ein
+                          Wörterbuch mit Trainingsdetails wie 'name', 'date', 'sportart', 'dauer', etc.
+                          ist und ein `doc_id`-Attribut für die eindeutige Identifizierung hat.
+        filtered (bool, optional): Ob Filter aktiv sind (für die Meldung bei leerer Liste).
+        first_page (bool, optional): Ob die erste Seite angezeigt wird.
 
     Returns:
         None: Die Funktion rendert die Trainingsliste direkt in der Streamlit-Benutzeroberfläche.
@@ -1089,58 +1283,42 @@ def display_training_list_ui(trainings):
               angezeigt und ein Button zum Hinzufügen von Trainings angeboten.
     """
     if not trainings:
+        if filtered:
+            st.info("Keine Trainings entsprechen den gewählten Filtern.")
+            return
         st.info("Es sind noch keine Trainings für diese Person vorhanden. Füge Trainings hinzu, damit sie hier angezeigt werden! ")
         if st.button("Trainings hinzufügen"):
             st.switch_page("pages/add workout.py")
         return
 
-    sorted_trainings = sorted(
-        trainings,
-        key=lambda x: datetime.strptime(x['date'], "%Y-%m-%d"),
-        reverse=True
-    )
-
     if 'last_expanded_training_id' not in st.session_state:
         st.session_state.last_expanded_training_id = None
 
-    if sorted_trainings and st.session_state.get('initial_expand_done', False) == False:
-        st.session_state.last_expanded_training_id = sorted_trainings[0].doc_id
+    if first_page and st.session_state.get('initial_expand_done', False) == False:
+        st.session_state.last_expanded_training_id = trainings[0].doc_id
         st.session_state.initial_expand_done = True
 
-    for i, training in enumerate(sorted_trainings):
+    for training in trainings:
         is_expanded = (training.doc_id == st.session_state.last_expanded_training_id)
         display_training_details_ui(training, delete_training_from_db, set_training_to_edit, expanded=is_expanded)
 
-# --- Datenbank-Operationen ---
-
-def get_trainings_for_current_user():
+@st.fragment(run_every=PROCESSING_POLL_S)
+def display_processing_status_ui(person_id, active_count):
     """
-    Loads all training records associated with the currently selected user from the TinyDB.
+    Fragt regelmäßig ab, ob Trainings der Person noch im Hintergrund verarbeitet werden, und lädt die
+    Liste neu, sobald ein Auftrag abgeschlossen ist. Nur dieser Abschnitt wird dafür erneut ausgeführt.
 
-    This function retrieves the `current_user_id` from Streamlit's session state,
-    then fetches the corresponding person's data from the person database (`dp`).
-    It uses the list of `ekg_tests` (which are essentially training IDs) linked to that person
-    to filter and retrieve only the relevant training records from the main training database (`db`).
+    Args:
+        person_id (int): Die ID der Person.
+        active_count (int): Anzahl der offenen Aufträge beim letzten vollständigen Laden der Seite.
 
     Returns:
-        list: A list of TinyDB Document objects, where each object represents a training
-              record belonging to the current user. Returns an empty list if no user
-              is selected, the user data is not found, or the user has no linked trainings.
+        None
     """
-
-    if "current_user_id" not in st.session_state:
-        return []
-    
-    person_doc_id = int(st.session_state["current_user_id"])
-    person_data = dp.get(doc_id=person_doc_id)
-
-    if person_data and 'ekg_tests' in person_data:
-        ekg_test_ids = person_data['ekg_tests']
-        all_trainings = db.all()
-        # Stellen Sie sicher, dass doc_id in den Trainingsdaten vorhanden ist, bevor Sie darauf zugreifen
-        user_trainings = [t for t in all_trainings if hasattr(t, 'doc_id') and t.doc_id in ekg_test_ids]
-        return user_trainings
-    return []
+    open_count = sum(1 for job in pending_jobs(person_id).values() if job['status'] != 'fehler')
+    if open_count != active_count:
+        st.rerun(scope="app")
+    st.caption(f"⏳ {open_count} Training(e) werden im Hintergrund verarbeitet...")
 
 # --- Hauptanwendung ---
 def main():
@@ -1162,8 +1340,16 @@ def main():
         st.session_state.initial_expand_done = False
 
     st.subheader("Deine Trainingsübersicht")
-    trainings_for_user = get_trainings_for_current_user()
-    display_training_list_ui(trainings_for_user)
+    person_id = int(st.session_state["current_user_id"])
+    filters, order_by, descending = display_training_filter_ui(person_id)
+    trainings, next_cursor, page_index = get_training_page(person_id, filters, order_by, descending)
+    active_count = sum(1 for job in pending_jobs(person_id).values() if job['status'] != 'fehler')
+    if active_count:
+        start_worker()
+        display_processing_status_ui(person_id, active_count)
+    display_training_list_ui(trainings, filtered=bool(filters), first_page=page_index == 0)
+    display_pagination_ui(next_cursor, page_index)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with profiled_rerun("Trainingsliste"):
+        main()
\ No newline at end of file
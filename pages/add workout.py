@@ -1,7 +1,7 @@
 
 import streamlit as st
 from datetime import datetime
-from tinydb import TinyDB, Query
+from tinydb import Query
 import os
 import sys
 
@@ -11,10 +11,15 @@ if script_dir not in sys.path:
 
 
 from Module.hilfsfunktionenedittraining import display_workout_form, save_uploaded_file, parse_gpx_data, parse_fit_data, format_duration
+from Module.datenbank import open_table, transaction, TABLES
+from Module.dateiablage import release_files
+from Module.zusammenfassung import training_contribution, add_training_to_summary, get_contribution
+from Module.massenimport import import_trainings
+from Module.warteschlange import enqueue_training, start_worker
 
 # --- Datenbank-Initialisierung ---
-db = TinyDB('dbtests.json')
-dp = TinyDB('dbperson.json')
+db = open_table('dbtests.json')
+dp = open_table('dbperson.json')
 Person = Query()
 Test = Query()
 
@@ -22,6 +27,8 @@ Test = Query()
 def add_training_to_db(training_data, person_id):
     """
     Fügt ein neues Training zur 'dbtests'-Datenbank hinzu und verknüpft es mit einer Person in der 'dbperson'-Datenbank.
+    Das Auswerten der Dateien, die Zusammenfassung, Streckenerkennung, Heatmap und Segmente laufen
+    anschließend im Hintergrund; bis dahin erscheint das Training in der Liste als "wird verarbeitet".
 
     Args:
         training_data (dict): Ein Dictionary, das die Daten des neuen Trainings enthält.
@@ -33,40 +40,66 @@ def add_training_to_db(training_data, person_id):
               andernfalls False.
     """
     try:
-        # Füge das Training zu dbtests hinzu
-        doc_id = db.insert(training_data)
-        st.success(f"Training '{training_data['name']}' erfolgreich hinzugefügt mit ID: {doc_id}")
-
-        # Verknüpfe die Training-ID mit der Person in dbperson
-        person_doc = dp.get(doc_id=int(person_id))
-        if person_doc:
-            current_ekg_tests = person_doc.get('ekg_tests', [])
-            current_ekg_tests.append(doc_id)
-            dp.update({'ekg_tests': current_ekg_tests}, doc_ids=[int(person_id)])
-            st.success(f"Training erfolgreich mit Person {person_id} verknüpft.")
-        else:
-            st.error(f"Fehler: Person mit ID {person_id} nicht in der Personendatenbank gefunden.")
+        # Training, Verknüpfung und Verarbeitungsauftrag werden gemeinsam geschrieben (ein Commit)
+        with transaction():
+            # Füge das Training zu dbtests hinzu
+            doc_id = db.insert(training_data)
+            st.success(f"Training '{training_data['name']}' erfolgreich hinzugefügt mit ID: {doc_id}")
+
+            # Verknüpfe die Training-ID mit der Person in dbperson
+            # Anhängen als Funktion: Lesen und Schreiben der Liste geschehen atomar unter der Schreibsperre
+            if dp.update(lambda person: person.setdefault('ekg_tests', []).append(doc_id), doc_ids=[int(person_id)]):
+                st.success(f"Training erfolgreich mit Person {person_id} verknüpft.")
+                enqueue_training(doc_id, person_id)
+            else:
+                st.error(f"Fehler: Person mit ID {person_id} nicht in der Personendatenbank gefunden.")
+
+        start_worker()
         return True
     except Exception as e:
         st.error(f"Fehler beim Hinzufügen des Trainings: {e}")
         return False
 
-def update_training_in_db(updated_training_data, training_doc_id):
+def update_training_in_db(updated_training_data, training_doc_id, person_id=None):
     """
-    Aktualisiert ein bestehendes Training in der 'dbtests'-Datenbank.
+    Aktualisiert ein bestehendes Training in der 'dbtests'-Datenbank samt der Zusammenfassung der Person.
+    Haben sich GPX-/FIT-Datei oder Datum geändert, werden Zusammenfassung, Strecken-Fingerprint, Heatmap und
+    Segment-Befahrungen im Hintergrund neu erstellt.
+    Ersetzte Dateien werden aus der Dateiablage gelöscht, sobald kein Training mehr auf sie verweist; läuft die
+    Neuberechnung im Hintergrund, gibt sie erst der Auftrag frei (die Heatmap braucht die alte Datei zum Abziehen).
 
     Args:
         updated_training_data (dict): Ein Dictionary, das die zu aktualisierenden Trainingsdaten enthält.
                                       Die Schlüssel müssen den Feldern in der Datenbank entsprechen.
         training_doc_id (int): Die Dokumenten-ID des Trainings, das aktualisiert werden soll.
+        person_id (int, optional): Die ID der Person, der das Training gehört (für die Streckenerkennung).
 
     Returns:
         bool: True, wenn das Training erfolgreich aktualisiert wurde,
               andernfalls False.
     """
     try:
-        db.update(updated_training_data, doc_ids=[training_doc_id])
+        old_training = db.get(doc_id=training_doc_id) or {}
+        track_changed = any(old_training.get(key) != updated_training_data.get(key) for key in ('gpx_file', 'fit_file', 'date'))
+        replaced_files = [old_training.get(field) for field in TABLES['trainings']['file_fields']
+                          if field in updated_training_data and old_training.get(field) != updated_training_data[field]]
+        if track_changed and person_id is not None:
+            # Neue Dateien: Auswerten und abgeleitete Daten im Hintergrund (ersetzt die bisherigen Beiträge)
+            with transaction():
+                db.update(updated_training_data, doc_ids=[training_doc_id])
+                enqueue_training(training_doc_id, person_id, release_paths=replaced_files)
+            start_worker()
+            replaced_files = []
+        else:
+            contribution = training_contribution({**old_training, **updated_training_data},
+                                                 previous=get_contribution(training_doc_id))
+            with transaction():
+                db.update(updated_training_data, doc_ids=[training_doc_id])
+                if person_id is not None:
+                    add_training_to_summary(person_id, training_doc_id, {**old_training, **updated_training_data}, contribution)
         st.success(f"Training '{updated_training_data['name']}' erfolgreich aktualisiert.")
+
+        release_files(replaced_files)
         return True
     except Exception as e:
         st.error(f"Fehler beim Aktualisieren des Trainings: {e}")
@@ -85,6 +118,34 @@ def get_training_by_id(training_id):
     """
     return db.get(doc_id=training_id)
 
+def display_bulk_import_ui(person_id):
+    """
+    Importiert ein ZIP-Archiv mit FIT-, GPX- und EKG-Dateien auf einmal und zeigt für jede Datei
+    den Status (importiert, Duplikat, übersprungen, Fehler) sowie den Durchsatz an.
+
+    Args:
+        person_id (int): Die ID der Person, der die Trainings zugeordnet werden.
+
+    Returns:
+        None
+    """
+    with st.expander("Mehrere Trainings importieren (ZIP-Archiv)"):
+        archive = st.file_uploader("ZIP-Archiv mit FIT-, GPX- und EKG-Dateien", type=["zip"], key="bulk_import_uploader")
+        if archive is None or not st.button("Import starten", key="bulk_import_button"):
+            return
+        progress_bar = st.progress(0.0, text="Dateien werden ausgewertet...")
+        try:
+            report = import_trainings(archive, person_id, progress=lambda done, total: progress_bar.progress(
+                done / total, text=f"{done} von {total} Dateien ausgewertet"))
+        except Exception as e:
+            st.error(f"Fehler beim Import: {e}")
+            return
+        progress_bar.empty()
+        st.success(f"{report['importiert']} Training(e) importiert in {report['dauer_s']} s "
+                   f"({report['dateien_pro_s']} Dateien/s, {report['mb_pro_s']} MB/s).")
+        st.dataframe(report['dateien'], hide_index=True, use_container_width=True)
+        st.session_state.initial_expand_done = False # Reset for trainingsliste
+
 # --- Hauptanwendung ---
 def main():
     st.title("Workout hinzufügen / bearbeiten 🏃‍♀️")
@@ -112,7 +173,7 @@ def main():
                 st.session_state.initial_expand_done = False # Reset for trainingsliste
                 st.switch_page("pages/trainingsliste.py") # Go back to the list
             elif submitted_data:
-                if update_training_in_db(submitted_data, editing_training_id):
+                if update_training_in_db(submitted_data, editing_training_id, current_user_id):
                     st.session_state.editing_training_id = None # End edit mode
                     st.session_state.last_loaded_id_check = None # Reset for workout_form_utils (important!)
                     st.session_state.initial_expand_done = False # Reset for trainingsliste
@@ -125,6 +186,7 @@ def main():
             st.switch_page("pages/trainingsliste.py") # Go back to the list to fix error
     else:
         st.subheader("Neues Workout hinzufügen")
+        display_bulk_import_ui(current_user_id)
         # Show the form in add mode
         submitted_data = display_workout_form(form_key_suffix="add")
 
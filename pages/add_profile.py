@@ -5,10 +5,8 @@ import os
 import sys
 import inspect
 import yaml
-from tinydb import TinyDB
 from datetime import datetime
 from yaml.loader import SafeLoader
-from yaml import Dumper
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parentdir = os.path.dirname(currentdir)
@@ -16,11 +14,14 @@ sys.path.insert(0, parentdir)
 
 
 from Module.utils import normalize_path_slashes
+from Module.datenbank import open_table
+from Module.dateisperre import update_yaml_file
+from Module.bildvarianten import rendition_path
 
 
 
 
-db = TinyDB('dbperson.json')
+db = open_table('dbperson.json')
 
 
 
@@ -65,10 +66,7 @@ def write_to_config_yaml(new_username, new_user_details, add_to_whitelist=False,
         bool: `True`, wenn das Schreiben in die Konfigurationsdatei erfolgreich war.
               `False`, wenn ein Fehler aufgetreten ist (z.B. Dateizugriffsfehler).
     """
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            config_data = yaml.load(f, Loader=SafeLoader)
-        
+    def add_user(config_data):
         if 'credentials' not in config_data:
             config_data['credentials'] = {}
         if 'usernames' not in config_data['credentials']:
@@ -87,9 +85,10 @@ def write_to_config_yaml(new_username, new_user_details, add_to_whitelist=False,
                 config_data['permissions']['can_add_profile_doc_ids'].append(new_doc_id)
                 
                 config_data['permissions']['can_add_profile_doc_ids'].sort()
-        
-        with open(CONFIG_FILE, 'w') as f:
-            yaml.dump(config_data, f, Dumper=Dumper, default_flow_style=False, sort_keys=False)
+
+    try:
+        # Unter Sperre frisch lesen und atomar schreiben, damit parallele Änderungen erhalten bleiben
+        update_yaml_file(CONFIG_FILE, add_user)
         return True
     except Exception as e:
         st.error(f"Fehler beim Schreiben in die '{CONFIG_FILE}': {e}")
@@ -158,7 +157,7 @@ with st.form("add_profile_form"):
                 f.write(uploaded_file.getbuffer())
             st.success(f"Bild erfolgreich hochgeladen: {unique_filename}")
             picture_path_to_save = normalize_path_slashes(new_picture_path_full) 
-            st.image(picture_path_to_save, caption="Vorschau hochgeladenes Bild", use_container_width=True)
+            st.image(rendition_path(picture_path_to_save, 'card'), caption="Vorschau hochgeladenes Bild", use_container_width=True)
         except Exception as e:
             st.error(f"Fehler beim Speichern des Bildes: {e}")
             st.warning("Es wird ein Standardbild verwendet.")
@@ -1,10 +1,12 @@
 
 import streamlit as st
-from tinydb import TinyDB, Query
+from tinydb import Query
 import os
 
-# Initialize TinyDB
-db = TinyDB('dbperson.json')
+from Module.datenbank import open_table
+
+# Personendatenbank öffnen
+db = open_table('dbperson.json')
 
 Person = Query()
 
@@ -69,12 +71,8 @@ def person_anschauen_page():
             if person_by_id:
                 found_persons.append(person_by_id) # Eine Person gefunden über ID
         except ValueError:
-            # Wenn keine ID, dann Suche nach Name (Groß-/Kleinschreibung ignorierend, Teiltreffer)
-            search_query_lower = search_query.lower()
-            for p in all_persons:
-                full_name = f"{p.get('firstname', '')} {p.get('lastname', '')}".lower()
-                if search_query_lower in full_name:
-                    found_persons.append(p) # Füge alle passenden Personen hinzu
+            # Wenn keine ID, dann Volltextsuche nach Name (Teilwörter, Präfixe und Tippfehler)
+            found_persons = db.search_text(search_query)
             
         if found_persons:
             st.write("Mehrere Personen gefunden:")
@@ -0,0 +1,168 @@
+import streamlit as st
+import pandas as pd
+import folium
+from streamlit_folium import folium_static
+import os
+import sys
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, project_root)
+
+from Module.datenbank import open_table
+from Module.trackdaten import load_track_for_training, cumulative_distance_m
+from Module.segmente import (create_segment, delete_segment, get_all_segments, get_leaderboard,
+                             match_segment_against_trainings, format_elapsed)
+from Module.laufzeitprofil import span, profiled_rerun
+
+# --- Datenbank-Initialisierung ---
+db = open_table('dbtests.json')
+dp = open_table('dbperson.json')
+
+
+def get_person_name(person_id):
+    """
+    Liefert den Anzeigenamen einer Person für die Bestenliste.
+
+    Args:
+        person_id (int): Die doc_id der Person.
+
+    Returns:
+        str: "Vorname Nachname" oder "Unbekannt".
+    """
+    person = dp.get(doc_id=int(person_id))
+    if person:
+        return f"{person.get('firstname', '')} {person.get('lastname', '')}".strip()
+    return "Unbekannt"
+
+
+def display_create_segment_ui(person_id):
+    """
+    Zeigt das Formular zum Anlegen eines Segments aus einem eigenen Training an.
+    Der Abschnitt wird über einen Kilometerbereich auf dem Track gewählt.
+
+    Args:
+        person_id (int): Die doc_id der angemeldeten bzw. betrachteten Person.
+
+    Returns:
+        None
+    """
+    trainings = [t for t in db.search_by_person(person_id) if (t.get('gpx_file') not in (None, "", "-")) or (t.get('fit_file') not in (None, "", "-"))]
+    if not trainings:
+        st.info("Für Segmente wird ein Training mit GPX- oder FIT-Datei benötigt.")
+        return
+
+    labels = {t.doc_id: f"{t.get('date', '')} – {t.get('name', 'Unbenannt')}" for t in trainings}
+    training_id = st.selectbox("Training als Vorlage", options=list(labels), format_func=labels.get)
+    track_df = load_track_for_training(db.get(doc_id=training_id))
+    if track_df is None:
+        st.warning("Für dieses Training konnte kein GPS-Track geladen werden.")
+        return
+
+    lat = track_df['latitude'].to_numpy(dtype=float)
+    lon = track_df['longitude'].to_numpy(dtype=float)
+    dist_km = cumulative_distance_m(lat, lon) / 1000.0
+    total_km = float(round(dist_km[-1], 2))
+    start_km, end_km = st.slider("Abschnitt (km)", 0.0, total_km, (0.0, min(1.0, total_km)), step=0.05)
+    mask = (dist_km >= start_km) & (dist_km <= end_km)
+
+    with span("folium: Segmentauswahl"):
+        m = folium.Map(location=[lat.mean(), lon.mean()], zoom_start=13)
+        folium.PolyLine(list(zip(lat, lon)), color="gray", weight=3, opacity=0.6).add_to(m)
+        if mask.sum() >= 2:
+            folium.PolyLine(list(zip(lat[mask], lon[mask])), color="orange", weight=6).add_to(m)
+        folium_static(m, height=350)
+
+    with st.form("segment_form"):
+        name = st.text_input("Name des Segments")
+        corridor_m = st.number_input("Korridorbreite (m, je Seite)", min_value=10, max_value=150, value=40, step=5)
+        submitted = st.form_submit_button("Segment anlegen")
+    if submitted:
+        if not name:
+            st.error("Bitte einen Namen für das Segment angeben.")
+        elif mask.sum() < 2:
+            st.error("Der gewählte Abschnitt ist zu kurz.")
+        else:
+            segment_id = create_segment(name, lat[mask], lon[mask], person_id, corridor_m)
+            with st.spinner("Suche Befahrungen in allen Trainings..."):
+                count = match_segment_against_trainings(segment_id)
+            st.success(f"Segment '{name}' angelegt, {count} Befahrung(en) gefunden.")
+
+
+def display_leaderboard_ui(segment, person_id):
+    """
+    Zeigt die Gesamtwertung und die persönliche Bestenliste eines Segments an.
+
+    Args:
+        segment (tinydb.table.Document): Das Segment-Dokument.
+        person_id (int): Die doc_id der angemeldeten bzw. betrachteten Person.
+
+    Returns:
+        None
+    """
+    st.caption(f"Länge: {segment['length_m'] / 1000:.2f} km · Angelegt am {segment.get('created_at', '-')}")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Gesamtwertung**")
+        efforts = get_leaderboard(segment.doc_id)
+        if efforts:
+            st.dataframe(pd.DataFrame([{
+                "Rang": rank,
+                "Athlet": get_person_name(e['person_id']),
+                "Zeit": format_elapsed(e['elapsed_s']),
+                "Datum": e.get('date', '-'),
+            } for rank, e in enumerate(efforts, start=1)]), hide_index=True, use_container_width=True)
+        else:
+            st.info("Noch keine Befahrungen.")
+    with col2:
+        st.markdown("**Deine Bestzeiten**")
+        efforts = get_leaderboard(segment.doc_id, person_id=person_id)
+        if efforts:
+            st.dataframe(pd.DataFrame([{
+                "Rang": rank,
+                "Zeit": format_elapsed(e['elapsed_s']),
+                "Datum": e.get('date', '-'),
+                "Tempo (km/h)": round(e['distance_m'] / e['elapsed_s'] * 3.6, 1),
+            } for rank, e in enumerate(efforts, start=1)]), hide_index=True, use_container_width=True)
+        else:
+            st.info("Du hast dieses Segment noch nicht absolviert.")
+
+    if segment.get('created_by') == int(person_id) or st.session_state.get("admin"):
+        col_a, col_b = st.columns(2)
+        if col_a.button("Neu abgleichen", key=f"rematch_{segment.doc_id}"):
+            with st.spinner("Gleiche Segment mit allen Trainings ab..."):
+                count = match_segment_against_trainings(segment.doc_id)
+            st.success(f"{count} Befahrung(en) gefunden.")
+            st.rerun()
+        if col_b.button("Segment löschen", key=f"delete_segment_{segment.doc_id}"):
+            delete_segment(segment.doc_id)
+            st.rerun()
+
+
+# --- Hauptanwendung ---
+def main():
+    st.title("Segmente & Bestenlisten 🏁")
+    st.markdown("---")
+
+    if "current_user_id" not in st.session_state:
+        st.warning("Bitte warten, die Seite baut sich auf.")
+        st.stop()
+
+    person_id = int(st.session_state.current_user_id)
+
+    with st.expander("➕ Neues Segment anlegen"):
+        # Der Inhalt läuft auch bei zugeklapptem Expander: Track und Karte erst nach dem Einschalten laden
+        if st.toggle("Segment-Editor anzeigen", key="segment_editor_open"):
+            display_create_segment_ui(person_id)
+
+    segments = get_all_segments()
+    if not segments:
+        st.info("Es wurden noch keine Segmente angelegt.")
+        return
+    for segment in sorted(segments, key=lambda s: s['name'].lower()):
+        with st.expander(f"🏁 {segment['name']}"):
+            display_leaderboard_ui(segment, person_id)
+
+
+if __name__ == "__main__":
+    with profiled_rerun("Segmente"):
+        main()